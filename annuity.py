@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+
+# NumPy's power and log ufuncs, applied to scalars. Their SIMD loops can differ in the last bit from Python's
+# ** and math.log, and numpy_financial goes through them, so the kernels do too to give identical results.
+_power = np.power
+_log = np.log
+
+
+def pmt(rate, n_periods, balance):
+    """
+    Level payment that pays balance off over n_periods at period rate rate, equal to
+    numpy_financial.pmt(rate, n_periods, -balance) without its array overhead.
+
+    Returns a NumPy float like numpy_financial does, so schedules round the payment the same way.
+    """
+    if rate == 0:
+        return np.float64(balance / n_periods)
+    growth = _power(1 + rate, n_periods)
+    return balance * growth / ((growth - 1) / rate)
+
+
+def pmt_array(rates, n_periods, balances):
+    """
+    pmt over arrays (or broadcastable mixes of arrays and scalars) of rates, terms and balances.
+    """
+    growth = (1 + rates) ** n_periods
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annuity = np.where(rates == 0, n_periods, (growth - 1) / rates)
+    return balances * growth / annuity
+
+
+def nper(rate, payment, balance):
+    """
+    Number of level payments (fractional) that pay balance off at period rate rate, equal to
+    numpy_financial.nper(rate, -payment, balance) for non-zero rates.
+
+    At a zero rate this is balance / payment, where numpy_financial returns its negative. A payment that
+    never clears the balance gives inf or NaN, with NumPy's floating point warnings.
+    """
+    if rate == 0:
+        return np.float64(balance) / payment
+    z = np.float64(-payment) / rate
+    return _log(z / (balance + z)) / _log(1 + rate)
+
+
+def nper_array(rates, payments, balances):
+    """
+    nper over arrays (or broadcastable mixes of arrays and scalars) of rates, payments and balances.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = -payments / rates
+        return np.where(rates == 0, balances / payments, np.log(z / (balances + z)) / np.log(1 + rates))
+
+
+def balance_after(balance, rate, payment, n_periods):
+    """
+    Balance after n_periods level payments: B * (1 + r)^n - PMT * ((1 + r)^n - 1) / r.
+    """
+    if rate == 0:
+        return balance - payment * n_periods
+    try:
+        growth = (1 + rate) ** n_periods
+    except OverflowError:
+        # B * (1 + r)^n - PMT * ((1 + r)^n - 1) / r diverges on the side of PMT / r the balance starts on,
+        # as the period loop's running balance does
+        drift = balance - payment / rate
+        return drift * math.inf if drift else balance
+    return balance * growth - payment * (growth - 1) / rate
+
+
+def balance_after_array(balances, rates, payments, n_periods):
+    """
+    balance_after over arrays of balances, rates and payments.
+    """
+    growth = (1 + rates) ** n_periods
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annuity = np.where(rates == 0, n_periods, (growth - 1) / rates)
+    return balances * growth - payments * annuity
+
+
+def cumulative_interest(balance, rate, payment, n_periods):
+    """
+    Interest paid over n_periods level payments: everything paid minus the principal it cleared.
+    """
+    return n_periods * payment - (balance - balance_after(balance, rate, payment, n_periods))
+
+
+def cumulative_interest_array(balances, rates, payments, n_periods):
+    """
+    cumulative_interest over arrays of balances, rates and payments.
+    """
+    return n_periods * payments - (balances - balance_after_array(balances, rates, payments, n_periods))
@@ -0,0 +1,254 @@
+"""
+Batch runner that amortizes a whole loan book into a partitioned Parquet dataset.
+
+    python batch.py loans.csv --output schedules [--chunk-size 1000] [--workers 8] [--partition-by "Loan ID" Year]
+    python batch.py loans.parquet --output schedules --workers 1 --overwrite
+
+The loan book has one loan per row with the fields of LoanCalculator.calculate_portfolio ('loan_id', 'type',
+'loan_amount', 'interest_rate', 'loan_term' or 'repayment_amount', 'first_payment_date', ...); in a CSV the
+'adjustment_df', 'adjustment_rules' and 'interest_table' fields are JSON strings. Files ending in .parquet are
+read as Parquet, anything else as CSV. Every loan needs its own 'interest_rate'; there is no default rate.
+
+The book is read --chunk-size loans at a time, so memory is bounded by one chunk's schedules, and each chunk is
+amortized in a SchedulePool of --workers processes (in this process with one worker or CPU) and written to
+--output as a Hive-partitioned Parquet dataset with compact column types.
+
+A chunk that fails is split in halves that are retried, recursively down to the single loans that fail. Failed
+loans, including those without an interest rate, are left out of the dataset, listed in _failures.csv under
+--output and make the run exit with status 1. Totals and throughput are printed at the end.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from model import LoanCalculator
+from process_pool import SchedulePool
+
+# Loan book fields given as JSON strings in a CSV
+JSON_FIELDS = ["adjustment_df", "adjustment_rules", "interest_table"]
+
+# CSV field types, fixed so every chunk reads them the same way whatever values it happens to hold
+CSV_DTYPES = {"loan_id": str, "loan_amount": np.float64, "interest_rate": np.float64, "loan_term": np.float64,
+              "repayment_amount": np.float64, "type": str, "first_payment_date": str, "payment_frequency": str,
+              "interest_type": str, "loan_term_mode": str, **{field: str for field in JSON_FIELDS}}
+
+MONEY_COLUMNS = ["Interest Rate", "Interest Due", "Principal Paid", "Payment Due", "Balance Adjustment", "Balance"]
+
+# Schema of the written dataset: every chunk is cast to it, so the files of a run always agree
+SCHEDULE_SCHEMA = pa.schema([
+    ("Loan ID", pa.dictionary(pa.int32(), pa.string())),
+    ("No.", pa.int32()),
+    ("Period", pa.date32()),
+    ("Year", pa.int16()),
+    *[(column, pa.float64()) for column in MONEY_COLUMNS],
+    ("Remark", pa.dictionary(pa.int32(), pa.string())),
+])
+
+DEFAULT_PARTITION_BY = ["Loan ID", "Year"]
+
+# A chunk of loans split by loan and year easily exceeds pyarrow's default limit of 1024 partitions per write
+MAX_PARTITIONS = 1 << 30
+
+
+def read_loan_book(path, chunk_size):
+    """
+    Yield the loan book at path as DataFrames of up to chunk_size loans, indexed by their row number in the
+    book so loans without a 'loan_id' are labelled by it.
+    """
+    if path.endswith(".parquet"):
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        chunks = pd.read_csv(path, chunksize=chunk_size, dtype=CSV_DTYPES)
+
+    offset = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        for field in JSON_FIELDS:
+            if field in chunk.columns:
+                chunk[field] = chunk[field].map(lambda value: json.loads(value) if isinstance(value, str) else value)
+        yield chunk
+
+
+def schedule_table(schedule_df):
+    """
+    Portfolio schedule DataFrame as an Arrow table in SCHEDULE_SCHEMA: dates as date32, small integers narrowed,
+    loan ids and remarks dictionary-encoded. Amounts and rates stay float64 so no value changes.
+    """
+    columns = [
+        pa.array(schedule_df["Loan ID"].astype(str).to_numpy(), pa.string()).dictionary_encode(),
+        pa.array(schedule_df["No."].to_numpy(dtype=np.int32)),
+        pa.array(schedule_df["Period"].to_numpy(dtype="datetime64[D]")),
+        pa.array(schedule_df["Year"].to_numpy(dtype=np.int16)),
+        *[pa.array(schedule_df[column].to_numpy(dtype=np.float64)) for column in MONEY_COLUMNS],
+        pa.array(schedule_df["Remark"].to_numpy(dtype=object), pa.string()).dictionary_encode(),
+    ]
+    return pa.Table.from_arrays(columns, schema=SCHEDULE_SCHEMA)
+
+
+def loan_label(chunk, position):
+    """
+    Loan id of the loan at position in chunk, or its row number in the book when it has none.
+    """
+    if "loan_id" in chunk.columns and pd.notna(chunk["loan_id"].iloc[position]):
+        return str(chunk["loan_id"].iloc[position])
+    return str(chunk.index[position])
+
+
+def split_missing_rates(chunk):
+    """
+    The loans of chunk that have an interest rate, and the (loan id, error) of those that do not: amortizing
+    them at some default rate would silently write a wrong schedule.
+    """
+    missing = chunk["interest_rate"].isna().to_numpy() if "interest_rate" in chunk.columns \
+        else np.ones(len(chunk), dtype=bool)
+    failures = [(loan_label(chunk, position), "Loan has no 'interest_rate'.")
+                for position in np.flatnonzero(missing).tolist()]
+    return chunk[~missing], failures
+
+
+def amortize_chunk(calculator, pool, chunk):
+    """
+    Schedules of a chunk of loans, and the (loan id, error) of the loans that failed.
+
+    A chunk that fails is split in halves that are computed again, down to the single loans that fail, so a
+    few bad loans cost a few extra passes over the chunk rather than a loan-by-loan run.
+    """
+    try:
+        if pool is not None:
+            return pool.calculate_portfolio(calculator, chunk), []
+        return calculator.calculate_portfolio(chunk), []
+    except Exception as e:
+        if len(chunk) == 1:
+            return None, [(loan_label(chunk, 0), str(e))]
+
+    frames = []
+    failures = []
+    middle = len(chunk) // 2
+    for half in (chunk.iloc[:middle], chunk.iloc[middle:]):
+        schedule_df, half_failures = amortize_chunk(calculator, pool, half)
+        if schedule_df is not None:
+            frames.append(schedule_df)
+        failures.extend(half_failures)
+    return (pd.concat(frames, ignore_index=True) if frames else None), failures
+
+
+def write_chunk(table, output, partition_by, chunk_number):
+    """
+    Add a chunk's schedules to the dataset at output, in files named after the chunk so chunks never
+    overwrite each other.
+    """
+    ds.write_dataset(table, output, format="parquet", partitioning=partition_by or None, partitioning_flavor="hive",
+                     basename_template=f"chunk-{chunk_number:06d}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore", max_partitions=MAX_PARTITIONS,
+                     file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"))
+
+
+def run(loan_book, output, chunk_size=1000, workers=None, partition_by=DEFAULT_PARTITION_BY, progress=sys.stderr):
+    """
+    Amortize every loan of loan_book into the dataset at output. Returns the run's stats as a dict: loans,
+    failed, rows, chunks, seconds, loans_per_second, rows_per_second, output_bytes, peak_memory_mb and failures,
+    the (loan id, error) of every failed loan.
+    """
+    unknown = [column for column in partition_by if column not in SCHEDULE_SCHEMA.names]
+    if unknown:
+        raise ValueError(f"Unknown partition columns {unknown}; choose from {SCHEDULE_SCHEMA.names}.")
+
+    # Every loan that is amortized has its own 'interest_rate', so the calculator's rate is never used
+    calculator = LoanCalculator(0)
+    workers = workers or os.cpu_count() or 1
+    pool = SchedulePool(max_workers=workers) if workers > 1 else None
+    stats = {"loans": 0, "failed": 0, "rows": 0, "chunks": 0}
+    failures = []
+    start = time.perf_counter()
+    try:
+        for chunk_number, chunk in enumerate(read_loan_book(loan_book, chunk_size)):
+            chunk_start = time.perf_counter()
+            rated, chunk_failures = split_missing_rates(chunk)
+            schedule_df = None
+            if len(rated):
+                schedule_df, rated_failures = amortize_chunk(calculator, pool, rated)
+                chunk_failures.extend(rated_failures)
+            if schedule_df is not None:
+                write_chunk(schedule_table(schedule_df), output, partition_by, chunk_number)
+
+            rows = len(schedule_df) if schedule_df is not None else 0
+            stats["loans"] += len(chunk)
+            stats["failed"] += len(chunk_failures)
+            stats["rows"] += rows
+            stats["chunks"] += 1
+            failures.extend(chunk_failures)
+            if progress is not None:
+                print(f"chunk {chunk_number}: {len(chunk)} loans, {len(chunk_failures)} failed, {rows} rows in "
+                      f"{time.perf_counter() - chunk_start:.2f}s ({stats['loans']} loans so far)", file=progress)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if failures:
+        os.makedirs(output, exist_ok=True)
+        pd.DataFrame(failures, columns=["loan_id", "error"]).to_csv(os.path.join(output, "_failures.csv"),
+                                                                     index=False)
+
+    seconds = time.perf_counter() - start
+    stats["seconds"] = seconds
+    stats["loans_per_second"] = stats["loans"] / seconds if seconds else 0
+    stats["rows_per_second"] = stats["rows"] / seconds if seconds else 0
+    stats["output_bytes"] = sum(os.path.getsize(os.path.join(directory, name))
+                                for directory, _, names in os.walk(output) for name in names)
+    # ru_maxrss is in kilobytes on Linux
+    stats["peak_memory_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    stats["failures"] = failures
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Amortize a loan book into a partitioned Parquet dataset.")
+    parser.add_argument("loan_book", help="loan book CSV, or Parquet when it ends in .parquet")
+    parser.add_argument("--output", required=True, help="directory of the Parquet dataset")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="loans read and computed at a time")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (defaults to the number of CPUs; 1 computes in this process)")
+    parser.add_argument("--partition-by", nargs="*", default=DEFAULT_PARTITION_BY,
+                        help="schedule columns to partition the dataset by (none for a flat dataset)")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing output directory")
+    parser.add_argument("--quiet", action="store_true", help="print only the final stats")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if os.path.isdir(args.output) and os.listdir(args.output):
+        if not args.overwrite:
+            parser.error(f"{args.output} is not empty; pass --overwrite to replace it")
+        shutil.rmtree(args.output)
+
+    try:
+        stats = run(args.loan_book, args.output, chunk_size=args.chunk_size, workers=args.workers,
+                    partition_by=args.partition_by, progress=None if args.quiet else sys.stderr)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    print(f"loans: {stats['loans']} ({stats['failed']} failed) in {stats['chunks']} chunks")
+    print(f"rows: {stats['rows']}")
+    print(f"time: {stats['seconds']:.2f}s, {stats['loans_per_second']:.1f} loans/s, "
+          f"{stats['rows_per_second']:.0f} rows/s")
+    print(f"output: {args.output} ({stats['output_bytes'] / 1e6:.1f} MB), peak memory {stats['peak_memory_mb']:.0f} MB")
+    if stats["failures"]:
+        print(f"failed loans are listed in {os.path.join(args.output, '_failures.csv')}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Benchmark suite for the LoanCalculator engines and the Flask endpoint.
+
+    python benchmark.py run --output results.json [--quick] [--repeat 5] [--filter monthly]
+    python benchmark.py compare baseline.json results.json [--threshold 0.10]
+    python benchmark.py imports --output imports.json [--repeat 5] [--budget-ms 1500]
+
+run times every case of the parameter grid (payment frequency, loan term, number of adjustments, Fixed vs
+Variable rate table, By Loan Term vs By Repayment Amount), once through LoanCalculator.calculate_amortization
+and once through the /calculate_amortization_schedule request path via Flask's test client, and saves the
+timings as JSON. compare prints the per-case change between two runs and exits with status 1 when any case
+got slower by more than the threshold. imports measures the cold import time of the compute entry points
+with python -X importtime in fresh interpreters and saves it in the same format, so compare flags import
+regressions too; it exits with status 1 when an entry point imports a module that should stay lazy (plotly)
+or takes longer than --budget-ms.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import numpy_financial as npf
+import pandas as pd
+
+# Benchmark the computation, not the response cache or a resume from the warm-up call's checkpoints
+os.environ.setdefault("SCHEDULE_CACHE_SIZE", "0")
+os.environ.setdefault("CHECKPOINT_CACHE_SIZE", "0")
+
+from model import LoanCalculator
+from payment_calendar import PERIODS_PER_YEAR
+
+FREQUENCIES = ["weekly", "fortnightly", "monthly"]
+LOAN_TERMS = [5, 15, 30, 40]
+ADJUSTMENT_COUNTS = [0, 20, 200, 2000]
+INTEREST_TYPES = ["Fixed", "Variable"]
+TYPES = ["By Loan Term", "By Repayment Amount"]
+PATHS = ["direct", "flask"]
+
+# Modules timed by the imports command, and modules none of them may import up front
+IMPORT_ENTRY_POINTS = ["model", "monte_carlo", "rate_path", "process_pool", "flask_app"]
+LAZY_MODULES = ["plotly"]
+
+# Smaller grid for a quick check
+QUICK_GRID = {"frequency": ["weekly", "monthly"], "loan_term": [5, 30], "adjustments": [0, 200]}
+
+LOAN_AMOUNT = 500000
+INTEREST_RATE = 5.5
+FIRST_PAYMENT_DATE = "2025-01-15"
+
+
+def case_payload(type, payment_frequency, loan_term, n_adjustments, interest_type):
+    """
+    /calculate_amortization_schedule payload of one benchmark case. Adjustments are small extra repayments
+    spread over the term with a fixed seed, so every run times the same inputs.
+    """
+    periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+    payload = {
+        "type": type,
+        "loan_amount": LOAN_AMOUNT,
+        "interest_rate": INTEREST_RATE,
+        "first_payment_date": FIRST_PAYMENT_DATE,
+        "payment_frequency": payment_frequency,
+        "interest_type": interest_type,
+        "loan_term_mode": "fixed" if type == "By Loan Term" else "adjusted",
+        "adjustment_df": None,
+        "interest_table": None,
+        "sliced_date": None,
+    }
+
+    if type == "By Loan Term":
+        payload["loan_term"] = loan_term
+    else:
+        # The repayment that pays the loan off over the same term
+        payment = npf.pmt(rate=INTEREST_RATE / 100 / periods_per_year, nper=loan_term * periods_per_year,
+                          pv=-LOAN_AMOUNT)
+        payload["repayment_amount"] = float(np.ceil(payment))
+
+    if n_adjustments:
+        rng = np.random.default_rng(n_adjustments)
+        offsets = np.sort(rng.integers(0, loan_term * 365, n_adjustments))
+        event_dates = pd.Timestamp(FIRST_PAYMENT_DATE) + pd.to_timedelta(offsets, unit="D")
+        amounts = -np.round(rng.uniform(1, 100000 / n_adjustments, n_adjustments), 2)
+        payload["adjustment_df"] = [{"Event Date": date.strftime("%Y-%m-%d"), "Adjustment Amount": float(amount)}
+                                    for date, amount in zip(event_dates, amounts)]
+
+    if interest_type == "Variable":
+        stage_length = max(loan_term * periods_per_year // 4, 1)
+        payload["interest_table"] = {
+            "Interest Rate": {"0": INTEREST_RATE, "1": 6.25, "2": 4.75, "3": 5.0},
+            "Length Period before next Adjustment": {"0": stage_length, "1": stage_length, "2": stage_length,
+                                                     "3": stage_length},
+        }
+
+    return payload
+
+
+def direct_call(payload):
+    """
+    The calculate_amortization call the API makes for payload.
+    """
+    adjustment_df = None
+    if payload["adjustment_df"]:
+        adjustment_df = pd.DataFrame(payload["adjustment_df"])
+        adjustment_df["Event Date"] = pd.to_datetime(adjustment_df["Event Date"])
+
+    kwargs = {
+        "loan_amount": payload["loan_amount"],
+        "first_payment_date": payload["first_payment_date"],
+        "adjustment_df": adjustment_df,
+        "loan_term_mode": payload["loan_term_mode"],
+        "payment_frequency": payload["payment_frequency"],
+        "interest_type": payload["interest_type"],
+        "variable_interest_configuration": payload["interest_table"],
+    }
+    if payload["type"] == "By Loan Term":
+        kwargs["loan_term"] = payload["loan_term"]
+    else:
+        kwargs["repayment_amount"] = payload["repayment_amount"]
+
+    calculator = LoanCalculator(payload["interest_rate"])
+    return lambda: calculator.calculate_amortization(type=payload["type"], **{
+        name: value.copy() if isinstance(value, pd.DataFrame) else value for name, value in kwargs.items()
+    })
+
+
+def flask_call(client, payload):
+    """
+    A full /calculate_amortization_schedule request through the test client.
+    """
+    def call():
+        response = client.post("/calculate_amortization_schedule", json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(response.get_json().get("error"))
+        return response.get_data()
+    return call
+
+
+def iter_cases(quick=False):
+    grid = {
+        "frequency": FREQUENCIES,
+        "loan_term": LOAN_TERMS,
+        "adjustments": ADJUSTMENT_COUNTS,
+    }
+    if quick:
+        grid.update(QUICK_GRID)
+
+    for path, type, frequency, loan_term, n_adjustments, interest_type in itertools.product(
+            PATHS, TYPES, grid["frequency"], grid["loan_term"], grid["adjustments"], INTEREST_TYPES):
+        name = f"{path}/{type}/{frequency}/{loan_term}y/{n_adjustments}adj/{interest_type}"
+        params = {"path": path, "type": type, "payment_frequency": frequency, "loan_term": loan_term,
+                  "adjustments": n_adjustments, "interest_type": interest_type}
+        yield name, params
+
+
+def time_call(call, repeat):
+    """
+    Wall-clock milliseconds of repeat calls, after one warm-up call.
+    """
+    call()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def import_times(module):
+    """
+    (cumulative import time of module in ms, names of every module it imported) in a fresh interpreter,
+    parsed from python -X importtime.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env={**os.environ, "SCHEDULE_WORKERS": "0"})
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    cumulative_us = None
+    imported = []
+    for line in completed.stderr.splitlines():
+        # 'import time:  self [us] | cumulative | imported package'
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.append(name.strip())
+        if name.strip() == module and not name.startswith("  "):
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, imported
+
+
+def imports(output, repeat=5, budget_ms=None):
+    """
+    Time the import of every entry point; returns the entry points that broke the budget or a lazy import.
+    """
+    results = {}
+    failures = []
+    for module in IMPORT_ENTRY_POINTS:
+        name = f"import/{module}"
+        timings = []
+        for _ in range(repeat):
+            milliseconds, imported = import_times(module)
+            timings.append(milliseconds)
+        eager = sorted({lazy for lazy in LAZY_MODULES for imported_name in imported
+                        if imported_name == lazy or imported_name.startswith(lazy + ".")})
+
+        results[name] = {
+            "params": {"path": "import", "module": module},
+            "repeat": repeat,
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+            "max_ms": max(timings),
+            "eager_imports": eager,
+        }
+        over_budget = budget_ms is not None and results[name]["median_ms"] > budget_ms
+        flag = " ".join(["OVER BUDGET"] * over_budget + [f"imports {lazy}" for lazy in eager])
+        if flag:
+            failures.append(name)
+        print(f"{name:70s} {results[name]['median_ms']:10.3f} ms {flag}")
+
+    with open(output, "w") as results_file:
+        json.dump({"environment": environment(), "results": results}, results_file, indent=2)
+    print(f"Saved {len(results)} entry points to {output}")
+    return failures
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def run(output, quick=False, repeat=5, name_filter=None):
+    from flask_app import app
+
+    client = app.test_client()
+    results = {}
+    for name, params in iter_cases(quick):
+        if name_filter and name_filter not in name:
+            continue
+
+        payload = case_payload(params["type"], params["payment_frequency"], params["loan_term"],
+                               params["adjustments"], params["interest_type"])
+        call = direct_call(payload) if params["path"] == "direct" else flask_call(client, payload)
+        try:
+            timings = time_call(call, repeat)
+        except Exception as e:
+            results[name] = {"params": params, "error": str(e)}
+            print(f"{name:70s} error: {e}")
+            continue
+
+        results[name] = {
+            "params": params,
+            "repeat": repeat,
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+            "max_ms": max(timings),
+        }
+        print(f"{name:70s} {results[name]['median_ms']:10.3f} ms")
+
+    with open(output, "w") as results_file:
+        json.dump({"environment": environment(), "results": results}, results_file, indent=2)
+    print(f"Saved {len(results)} cases to {output}")
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Print the median change of every case present in both runs; returns the names of the regressions.
+    """
+    with open(baseline) as baseline_file:
+        baseline_results = json.load(baseline_file)["results"]
+    with open(current) as current_file:
+        current_results = json.load(current_file)["results"]
+
+    regressions = []
+    for name in sorted(set(baseline_results) & set(current_results)):
+        before = baseline_results[name].get("median_ms")
+        after = current_results[name].get("median_ms")
+        if before is None or after is None:
+            print(f"{name:70s} skipped (error in one of the runs)")
+            continue
+
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "faster"
+        print(f"{name:70s} {before:10.3f} -> {after:10.3f} ms {change:+8.1%} {flag}")
+
+    only = set(baseline_results) ^ set(current_results)
+    if only:
+        print(f"{len(only)} cases are only in one of the runs")
+    print(f"{len(regressions)} regressions beyond {threshold:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the loan calculator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="time the benchmark grid and save the results as JSON")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--quick", action="store_true", help="time a reduced grid")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--filter", dest="name_filter", help="only time cases whose name contains this")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative slowdown flagged as a regression (default 0.10)")
+
+    imports_parser = commands.add_parser("imports", help="time the imports of the compute entry points")
+    imports_parser.add_argument("--output", default="import_times.json")
+    imports_parser.add_argument("--repeat", type=int, default=5)
+    imports_parser.add_argument("--budget-ms", type=float, help="fail when an entry point takes longer to import")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args.output, quick=args.quick, repeat=args.repeat, name_filter=args.name_filter)
+        return 0
+    if args.command == "imports":
+        return 1 if imports(args.output, repeat=args.repeat, budget_ms=args.budget_ms) else 0
+    return 1 if compare(args.baseline, args.current, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+
+# Period walkers record their state at the start of every CHECKPOINT_INTERVAL-th period
+CHECKPOINT_INTERVAL = 12
+
+# Number of distinct loans whose last period loop is kept for resuming; CHECKPOINT_CACHE_SIZE=0 disables resuming
+CHECKPOINT_CACHE_SIZE = int(os.environ.get("CHECKPOINT_CACHE_SIZE", 64))
+
+
+class ScheduleRun:
+    """
+    A finished period loop kept for resuming later runs of the same loan with different adjustments.
+
+    period_adjustments: the per-period balance adjustments the loop ran with (None for none)
+    rows: (values, kinds, original) arrays of the schedule rows it produced (see _ScheduleColumns.rows)
+    states: walker state at the start of each checkpointed period, keyed by that period
+    """
+
+    def __init__(self, period_adjustments, rows, states):
+        self.period_adjustments = period_adjustments
+        self.rows = rows
+        self.states = states
+        self.checkpoint_periods = sorted(states)
+
+    def resume_point(self, period_adjustments):
+        """
+        Latest checkpointed period at or before the first period whose adjustment differs from this run's,
+        or None when no checkpoint comes early enough.
+
+        Adjustments only count as equal with the same type too, since int and float values are rounded
+        differently in the schedule.
+        """
+        first_change = _first_changed_period(self.period_adjustments, period_adjustments)
+        index = bisect.bisect_right(self.checkpoint_periods, first_change)
+        return self.checkpoint_periods[index - 1] if index else None
+
+
+class CheckpointCache:
+    """
+    Bounded, thread-safe LRU cache of ScheduleRun objects keyed by every loan input except its adjustments.
+
+    max_size: maximum number of loans kept (0 disables the cache)
+    """
+
+    def __init__(self, max_size=CHECKPOINT_CACHE_SIZE):
+        self.max_size = max_size
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            run = self._runs.get(key)
+            if run is None:
+                self.misses += 1
+                return None
+            self._runs.move_to_end(key)
+            self.hits += 1
+            return run
+
+    def put(self, key, run):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._runs[key] = run
+            self._runs.move_to_end(key)
+            while len(self._runs) > self.max_size:
+                self._runs.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._runs.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._runs), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+def _first_changed_period(old_adjustments, new_adjustments):
+    """
+    First 1-based period whose adjustment differs between two per-period adjustment lists (one past the
+    end when none does).
+    """
+    if old_adjustments is None or new_adjustments is None:
+        if old_adjustments is None and new_adjustments is None:
+            return float("inf")
+        return 1
+
+    for index, (old, new) in enumerate(zip(old_adjustments, new_adjustments)):
+        if old != new or type(old) is not type(new):
+            return index + 1
+    if len(old_adjustments) != len(new_adjustments):
+        return min(len(old_adjustments), len(new_adjustments)) + 1
+    return float("inf")
+
+
+# Shared by every LoanCalculator, like the payment calendar cache
+schedule_checkpoints = CheckpointCache()
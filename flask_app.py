@@ -1,93 +1,472 @@
-from flask import Flask, request, jsonify
-from model import LoanCalculator
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from model import LoanCalculator, expand_compact_schedule, minimum_repayment, rate_axis, sensitivity_grid
+from payment_calendar import get_payment_calendar
+from schedule_cache import ScheduleCache, request_cache_key
+from process_pool import SchedulePool
+from checkpoints import schedule_checkpoints
+from instrumentation import span, tracing
+from wire_format import JSON_MIMETYPE, SCHEDULE_MIMETYPES, encode_schedule
+from metrics import (REGISTRY, Counter, Histogram, GaugeCallback, LATENCY_BUCKETS, SIZE_BUCKETS,
+                     PERIOD_BUCKETS)
 import pandas as pd
+import functools
+import itertools
+import json
+import logging
+import os
+import time
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# Requests sent with 'X-Trace: 1' get per-stage timings in a Server-Timing header, and in TRACE_FILE if set
+TRACE_FILE = os.environ.get('TRACE_FILE')
+
+# Identical payloads are answered from memory; SCHEDULE_CACHE_SIZE=0 disables the cache
+schedule_cache = ScheduleCache(max_size=int(os.environ.get('SCHEDULE_CACHE_SIZE', 256)),
+                               ttl_seconds=float(os.environ.get('SCHEDULE_CACHE_TTL', 600)))
+
+# SCHEDULE_WORKERS > 0 computes loop-bound schedules in a pool of worker processes instead of the request thread
+SCHEDULE_WORKERS = int(os.environ.get('SCHEDULE_WORKERS', 0))
+schedule_pool = SchedulePool(max_workers=SCHEDULE_WORKERS) if SCHEDULE_WORKERS > 0 else None
+
+# Prometheus metrics, served in text format at /metrics
+request_latency = Histogram('http_request_duration_seconds',
+                            'Time until the response headers are ready (streamed bodies excluded), by route.',
+                            ['route', 'method', 'status'], buckets=LATENCY_BUCKETS)
+request_size = Histogram('http_request_size_bytes', 'Request body size, by route.', ['route'],
+                         buckets=SIZE_BUCKETS)
+response_size = Histogram('http_response_size_bytes', 'Response body size (streamed bodies excluded), by route.',
+                          ['route'], buckets=SIZE_BUCKETS)
+schedule_periods = Histogram('loan_schedule_periods', 'Rows in the computed schedule, by route.', ['route'],
+                             buckets=PERIOD_BUCKETS)
+request_errors = Counter('http_request_errors_total', 'Requests that failed, by route and exception type.',
+                         ['route', 'exception'])
+
+def cache_metric(field):
+    return lambda: schedule_cache.stats()[field]
+
+for field, metric_type, documentation in [
+        ('hits', 'counter', 'Schedule cache lookups answered from memory.'),
+        ('misses', 'counter', 'Schedule cache lookups that missed.'),
+        ('evictions', 'counter', 'Schedule cache entries evicted by the size limit.'),
+        ('expirations', 'counter', 'Schedule cache entries dropped after their TTL.'),
+        ('size', 'gauge', 'Entries in the schedule cache.'),
+        ('hit_rate', 'gauge', 'Share of schedule cache lookups that hit.')]:
+    suffix = '_total' if metric_type == 'counter' else ''
+    GaugeCallback(f'schedule_cache_{field}{suffix}', documentation, cache_metric(field), type=metric_type)
+
+GaugeCallback('schedule_checkpoint_hits_total', 'Full schedule runs that found an earlier run of the same loan.',
+              lambda: schedule_checkpoints.stats()['hits'], type='counter')
+GaugeCallback('schedule_checkpoint_misses_total', 'Full schedule runs with no earlier run of the same loan to resume.',
+              lambda: schedule_checkpoints.stats()['misses'], type='counter')
+GaugeCallback('payment_calendar_cache_hits_total', 'Payment calendar lookups answered from memory.',
+              lambda: get_payment_calendar.cache_info().hits, type='counter')
+GaugeCallback('payment_calendar_cache_misses_total', 'Payment calendar lookups that built a new calendar.',
+              lambda: get_payment_calendar.cache_info().misses, type='counter')
+
+def metric_route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    route = metric_route()
+    if route != '/metrics':
+        started = g.get('request_started')
+        if started is not None:
+            request_latency.observe(time.perf_counter() - started, route=route, method=request.method,
+                                    status=response.status_code)
+        if request.content_length is not None:
+            request_size.observe(request.content_length, route=route)
+        if not response.is_streamed and response.content_length is not None:
+            response_size.observe(response.content_length, route=route)
+    return response
+
+def calculate_schedule(calculator, **kwargs):
+    """
+    calculator.calculate_amortization(**kwargs), in the schedule worker pool when one is configured. Fixed-rate
+    'By Loan Term' loans without adjustments take the closed form, which is cheaper than a round trip to a
+    worker, so they always stay in the request thread.
+    """
+    closed_form = kwargs['type'] == "By Loan Term" and kwargs.get('interest_type') == "Fixed" and \
+        kwargs.get('adjustment_df') is None and kwargs.get('adjustment_rules') is None
+    if schedule_pool is None or closed_form:
+        return calculator.calculate_amortization(**kwargs)
+    with span('engine'):
+        return schedule_pool.calculate_amortization(calculator, **kwargs)
+
+def error_response(e):
+    """
+    500 response for an exception raised while handling a request, counted by exception type.
+    """
+    request_errors.inc(route=metric_route(), exception=type(e).__name__)
+    return jsonify({'error': str(e)}), 500
+
+def traced(view):
+    """
+    Time the stages of a view when the request asks for it with an 'X-Trace: 1' header.
+    """
+    @functools.wraps(view)
+    def traced_view(*args, **kwargs):
+        if request.headers.get('X-Trace') != '1':
+            return view(*args, **kwargs)
+
+        with tracing(request.path) as trace:
+            response = app.make_response(view(*args, **kwargs))
+        response.headers['Server-Timing'] = trace.server_timing()
+        if TRACE_FILE:
+            trace.write(TRACE_FILE)
+        return response
+
+    return traced_view
 
 @app.route('/calculate_amortization_schedule', methods=['POST'])
+@traced
 def calculate_amortization_schedule():
     try:
         # Get the JSON data from the request
         data = request.json
 
-        # Extract variables from the request
-        loan_amount = data['loan_amount']
-        loan_term = data.get('loan_term', None)
-        repayment_amount = data.get('repayment_amount', None)
-        first_payment_date = data['first_payment_date']
-        interest_type = data['interest_type']
-        adjustment_df = data.get('adjustment_df', None)
-        sliced_date = pd.to_datetime(data.get('sliced_date')) if data.get('sliced_date') else None
-        loan_term_mode = data['loan_term_mode']
-        payment_frequency = data['payment_frequency']
-        type = data['type']
-        interest_table = data.get('interest_table', None)
-        
-        print(interest_table)
-        
-        # print(repayment_amount)
-
-        # Process adjustment_df if provided
-        if adjustment_df:
-            adjustment_df = pd.DataFrame(adjustment_df)
-            if not {'Event Date', 'Adjustment Amount'}.issubset(adjustment_df.columns):
-                raise ValueError("Adjustment DataFrame must contain 'Event Date' and 'Adjustment Amount'.")
-            adjustment_df['Event Date'] = pd.to_datetime(adjustment_df['Event Date'])
+        # JSON unless the Accept header asks for a columnar format (Arrow IPC or MessagePack)
+        mimetype = request.accept_mimetypes.best_match(SCHEDULE_MIMETYPES, default=JSON_MIMETYPE)
+
+        # Serve repeated payloads straight from the cache
+        try:
+            cache_key = request_cache_key(data)
+        except (KeyError, TypeError, ValueError):
+            cache_key = None
+        if cache_key is not None and mimetype != JSON_MIMETYPE:
+            cache_key = f'{cache_key}:{mimetype}'
+        if cache_key is not None:
+            cached_body = schedule_cache.get(cache_key)
+            if cached_body is not None:
+                return Response(cached_body, mimetype=mimetype)
+
+        with span('parse'):
+            # Parsed like the other schedule endpoints, so an empty adjustment list means none as in the cache key
+            arguments = schedule_arguments(data)
+            # This endpoint requires the mode and interest type, and passes only the loan type's term field
+            arguments['loan_term_mode'] = data['loan_term_mode']
+            arguments['interest_type'] = data['interest_type']
+            type = data['type']
+            arguments.pop('repayment_amount' if type == "By Loan Term" else 'loan_term')
+            sliced_date = pd.to_datetime(data.get('sliced_date')) if data.get('sliced_date') else None
+            sliced_only = bool(data.get('sliced_only', False)) and sliced_date is not None
+            first_payment_date = arguments['first_payment_date']
+            payment_frequency = arguments['payment_frequency']
+            logger.debug("Interest table: %s", arguments['variable_interest_configuration'])
 
         # Initialize LoanCalculator and calculate schedule
         calculator = LoanCalculator(annual_interest_rate=data['interest_rate'])
+        schedule_df = calculate_schedule(calculator, type=type, sliced_date=sliced_date if sliced_only else None,
+                                         **arguments)
 
-        if type == "By Loan Term":
-            schedule_df = calculator.calculate_amortization(
-                type=type,
-                loan_amount=loan_amount,
-                # repayment_amount=repayment_amount,
-                loan_term=loan_term,
-                first_payment_date=first_payment_date,
-                adjustment_df=adjustment_df,
-                loan_term_mode=loan_term_mode,
-                payment_frequency=payment_frequency,
-                interest_type=interest_type,
-                variable_interest_configuration=interest_table
-            )
-            
+        schedule_periods.observe(len(schedule_df), route=metric_route())
+
+        with span('serialize'):
+            if mimetype != JSON_MIMETYPE:
+                # Typed columns with the payment dates, and the sliced schedule as a row offset into the schedule
+                if sliced_only:
+                    last_period = int(schedule_df['No.'].iloc[-1]) if not schedule_df.empty else 0
+                    calendar = get_payment_calendar(first_payment_date, payment_frequency, last_period)
+                    dates = calendar.dates[last_period - len(schedule_df):]
+                    sliced_offset = 0
+                else:
+                    calendar = get_payment_calendar(first_payment_date, payment_frequency, len(schedule_df))
+                    dates = calendar.dates
+                    sliced_offset = calendar.first_period_on_or_after(sliced_date) if sliced_date else 0
+                response = Response(encode_schedule(schedule_df, dates, mimetype, sliced_offset, sliced_only),
+                                    mimetype=mimetype)
+            elif sliced_only:
+                # The model only computed the periods from sliced_date on, so return just those
+                last_period = int(schedule_df['No.'].iloc[-1]) if not schedule_df.empty else 0
+                calendar = get_payment_calendar(first_payment_date, payment_frequency, last_period)
+                schedule_df['Period'] = calendar.format_dates('%d-%m-%Y')[last_period - len(schedule_df):]
+                response = jsonify({
+                    'sliced_schedule_df': schedule_df.to_dict(orient='records')
+                })
+            else:
+                # Format dates for JSON output from the schedule's payment calendar
+                calendar = get_payment_calendar(first_payment_date, payment_frequency, len(schedule_df))
+                schedule_df['Period'] = calendar.format_dates('%d-%m-%Y')
+
+                # Filter by sliced_date if applicable
+                if sliced_date:
+                    sliced_schedule_df = schedule_df.iloc[calendar.first_period_on_or_after(sliced_date):]
+                else:
+                    sliced_schedule_df = schedule_df
+
+                # Convert DataFrames to JSON and return as a response
+                response = jsonify({
+                    'schedule_df': schedule_df.to_dict(orient='records'),
+                    'sliced_schedule_df': sliced_schedule_df.to_dict(orient='records')
+                })
+        if cache_key is not None:
+            schedule_cache.put(cache_key, response.get_data())
+        return response
+
+    except Exception as e:
+        return error_response(e)
+
+def schedule_arguments(data):
+    """
+    LoanCalculator.calculate_amortization keyword arguments from a /calculate_amortization_schedule payload.
+    """
+    adjustment_df = data.get('adjustment_df', None)
+    if adjustment_df:
+        adjustment_df = pd.DataFrame(adjustment_df)
+        if not {'Event Date', 'Adjustment Amount'}.issubset(adjustment_df.columns):
+            raise ValueError("Adjustment DataFrame must contain 'Event Date' and 'Adjustment Amount'.")
+        adjustment_df['Event Date'] = pd.to_datetime(adjustment_df['Event Date'])
+    else:
+        adjustment_df = None
+
+    return {
+        'loan_amount': data['loan_amount'],
+        'first_payment_date': data['first_payment_date'],
+        'loan_term': data.get('loan_term', None),
+        'repayment_amount': data.get('repayment_amount', None),
+        'adjustment_df': adjustment_df,
+        'loan_term_mode': data.get('loan_term_mode', None),
+        'payment_frequency': data['payment_frequency'],
+        'interest_type': data.get('interest_type', 'Fixed'),
+        'variable_interest_configuration': data.get('interest_table', None),
+        'adjustment_rules': data.get('adjustment_rules', None) or None
+    }
+
+@app.route('/stream_amortization_schedule', methods=['POST'])
+@traced
+def stream_amortization_schedule():
+    try:
+        # Same payload as /calculate_amortization_schedule; a sliced_date starts the stream at the slice
+        data = request.json
+        with span('parse'):
+            arguments = schedule_arguments(data)
+            if data.get('sliced_date'):
+                arguments['sliced_date'] = pd.to_datetime(data['sliced_date'])
+
+        calculator = LoanCalculator(annual_interest_rate=data['interest_rate'])
+        rows = calculator.iter_schedule(data['type'], date_format='%d-%m-%Y', **arguments)
+
+        # Compute the first row up front so invalid loans still get an error response
+        first_rows = list(itertools.islice(rows, 1))
+
+    except Exception as e:
+        return error_response(e)
+
+    route = metric_route()
+
+    def generate():
+        # One JSON object per line, written as the rows are computed
+        n_rows = 0
+        try:
+            for row in itertools.chain(first_rows, rows):
+                n_rows += 1
+                yield json.dumps(row) + '\n'
+        except Exception as e:
+            request_errors.inc(route=route, exception=type(e).__name__)
+            yield json.dumps({'error': str(e)}) + '\n'
         else:
-            # print("this supposed to run")
-            
-            schedule_df = calculator.calculate_amortization(
-                type=type,
-                loan_amount=loan_amount,
-                repayment_amount=repayment_amount,
-                # loan_term=loan_term,
-                first_payment_date=first_payment_date,
-                adjustment_df=adjustment_df,
-                loan_term_mode=loan_term_mode,
-                payment_frequency=payment_frequency,
-                interest_type=interest_type,
-                variable_interest_configuration=interest_table
-            )
-        
-        
+            schedule_periods.observe(n_rows, route=route)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/loan_state', methods=['POST'])
+@traced
+def loan_state():
+    try:
+        # Same payload as /calculate_amortization_schedule plus the query 'date'
+        data = request.json
+
+        with span('parse'):
+            arguments = schedule_arguments(data)
+            date = pd.to_datetime(data['date'])
+
+        calculator = LoanCalculator(annual_interest_rate=data['interest_rate'])
+        with span('engine'):
+            state = calculator.loan_state_at(type=data['type'], date=date, **arguments)
+
+        return jsonify(state)
+
+    except Exception as e:
+        return error_response(e)
 
-        # Filter by sliced_date if applicable
-        schedule_df['Period'] = pd.to_datetime(schedule_df['Period'])
-        if sliced_date:
-            sliced_schedule_df = schedule_df[schedule_df['Period'] >= sliced_date]
+@app.route('/loan_summary', methods=['POST'])
+@traced
+def loan_summary():
+    try:
+        # Same payload as /calculate_amortization_schedule; 'include_segments' adds the segments themselves
+        data = request.json
+
+        with span('parse'):
+            arguments = schedule_arguments(data)
+
+        calculator = LoanCalculator(annual_interest_rate=data['interest_rate'])
+        with span('engine'):
+            segments = calculator.schedule_segments(data['type'], **arguments)
+
+        with span('serialize'):
+            response = {'summary': segments.summary()}
+            if data.get('include_segments'):
+                response['segments'] = segments.to_records()
+        return jsonify(response)
+
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/compact_schedule', methods=['POST'])
+@traced
+def compact_schedule():
+    try:
+        # Same payload as /calculate_amortization_schedule; returns the schedule as segments for /expand_schedule
+        data = request.json
+
+        with span('parse'):
+            arguments = schedule_arguments(data)
+
+        calculator = LoanCalculator(annual_interest_rate=data['interest_rate'])
+        compact = calculator.compact_schedule(data['type'], **arguments)
+        schedule_periods.observe(compact['n_periods'], route=metric_route())
+
+        return jsonify({'compact_schedule': compact})
+
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/expand_schedule', methods=['POST'])
+@traced
+def expand_schedule():
+    try:
+        # A /compact_schedule result plus the optional 'first_period' and 'last_period' (1-based, inclusive)
+        data = request.json
+        compact = data['compact_schedule']
+
+        with span('engine'):
+            schedule_df = expand_compact_schedule(compact, data.get('first_period'), data.get('last_period'))
+        schedule_periods.observe(len(schedule_df), route=metric_route())
+
+        with span('serialize'):
+            if not schedule_df.empty:
+                first_row = int(schedule_df['No.'].iloc[0]) - 1
+                calendar = get_payment_calendar(compact['first_payment_date'], compact['payment_frequency'],
+                                                first_row + len(schedule_df))
+                schedule_df['Period'] = calendar.format_dates('%d-%m-%Y')[first_row:]
+            return jsonify({'schedule_df': schedule_df.to_dict(orient='records')})
+
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/minimum_repayment', methods=['POST'])
+@traced
+def calculate_minimum_repayment():
+    try:
+        # loan_amount and interest_rate may be single values or equally long lists
+        data = request.json
+        interest_table = data.get('interest_table', None) if data.get('interest_type') == 'Variable' else None
+
+        minimum = minimum_repayment(
+            data['loan_amount'],
+            data['interest_rate'],
+            payment_frequency=data.get('payment_frequency', 'monthly'),
+            variable_interest_configuration=interest_table
+        )
+
+        return jsonify({'minimum_repayment': minimum.astype(int).tolist()})
+
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/sensitivity_grid', methods=['POST'])
+@traced
+def calculate_sensitivity_grid():
+    try:
+        # Rates are 'interest_rates', or 'interest_rate' +/- 'rate_spread_bp' in 'rate_step_bp' steps
+        data = request.json
+        if data.get('interest_rates'):
+            interest_rates = data['interest_rates']
         else:
-            sliced_schedule_df = schedule_df
+            interest_rates = rate_axis(data['interest_rate'], data.get('rate_spread_bp', 300),
+                                       data.get('rate_step_bp', 25))
 
-        # Format dates for JSON output
-        schedule_df['Period'] = schedule_df['Period'].dt.strftime('%d-%m-%Y')
-        sliced_schedule_df['Period'] = sliced_schedule_df['Period'].dt.strftime('%d-%m-%Y')
+        with span('engine'):
+            grid = sensitivity_grid(
+                data['loan_amount'],
+                data['first_payment_date'],
+                interest_rates,
+                data['loan_terms'],
+                payment_frequency=data.get('payment_frequency', 'monthly'),
+                horizon_date=data.get('horizon_date', None),
+                schedule_cells=[tuple(cell) for cell in data.get('schedule_cells', None) or []]
+            )
 
-        # Convert DataFrames to JSON and return as a response
-        return jsonify({
-            'schedule_df': schedule_df.to_dict(orient='records'),
-            'sliced_schedule_df': sliced_schedule_df.to_dict(orient='records')
-        })
+        with span('serialize'):
+            response = {
+                'interest_rates': grid['interest_rates'].tolist(),
+                'loan_terms': grid['loan_terms'].tolist(),
+                'payment': grid['payment'].tolist(),
+                'total_interest': grid['total_interest'].tolist(),
+                'payoff_date': pd.DatetimeIndex(grid['payoff_date'].ravel()).strftime('%d-%m-%Y')
+                    .to_numpy().reshape(grid['payoff_date'].shape).tolist()
+            }
+            if 'balance_at_horizon' in grid:
+                response['balance_at_horizon'] = grid['balance_at_horizon'].tolist()
+
+            schedules = []
+            for (rate, term), schedule_df in grid.get('schedules', {}).items():
+                calendar = get_payment_calendar(data['first_payment_date'], data.get('payment_frequency', 'monthly'),
+                                                len(schedule_df))
+                schedule_df['Period'] = calendar.format_dates('%d-%m-%Y')
+                schedules.append({'interest_rate': rate, 'loan_term': term,
+                                  'schedule_df': schedule_df.to_dict(orient='records')})
+            if schedules:
+                response['schedules'] = schedules
+
+        return jsonify(response)
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@app.route('/simulate_variable_rate', methods=['POST'])
+@traced
+def simulate_variable_rate():
+    try:
+        # Summary of the simulated distributions; the per-path arrays are too large to send back
+        data = request.json
+        calculator = LoanCalculator(annual_interest_rate=data['interest_rate'],
+                                    interest_rate_cap=data.get('interest_rate_cap', 12),
+                                    interest_rate_minimum=data.get('interest_rate_minimum', 4))
+
+        simulation = calculator.simulate_variable_rate(
+            data['type'],
+            data['loan_amount'],
+            data['first_payment_date'],
+            loan_term=data.get('loan_term', None),
+            repayment_amount=data.get('repayment_amount', None),
+            payment_frequency=data.get('payment_frequency', 'monthly'),
+            n_paths=int(data.get('n_paths', 10000)),
+            long_term_rate=data.get('long_term_rate', None),
+            reversion_speed=data.get('reversion_speed', 0.25),
+            volatility=data.get('volatility', 1.0),
+            reset_periods=int(data.get('reset_periods', 1)),
+            seed=data.get('seed', None)
+        )
+
+        return jsonify(simulation['summary'])
+
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/schedule_cache', methods=['GET'])
+def schedule_cache_stats():
+    return jsonify(schedule_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True)
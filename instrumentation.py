@@ -0,0 +1,75 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Trace of the request being handled, if it asked for one
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+# Shared no-op context returned by span() while nothing is traced
+_NO_SPAN = nullcontext()
+
+_trace_file_lock = threading.Lock()
+
+
+class Trace:
+    """
+    Timing spans (name, milliseconds) recorded while one request is handled.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.started_at = time.time()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, (time.perf_counter() - start) * 1000))
+
+    def server_timing(self):
+        """
+        Spans as a Server-Timing header value, e.g. 'parse;dur=0.412, engine;dur=3.104'.
+        """
+        return ", ".join(f"{name};dur={duration:.3f}" for name, duration in self.spans)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "spans": [{"name": name, "duration_ms": duration} for name, duration in self.spans],
+        }
+
+    def write(self, path):
+        """
+        Append the trace to path as one JSON line.
+        """
+        line = json.dumps(self.to_dict()) + "\n"
+        with _trace_file_lock:
+            with open(path, "a") as trace_file:
+                trace_file.write(line)
+
+
+@contextmanager
+def tracing(name):
+    """
+    Record the spans opened inside the block (in this thread or task) into a new Trace.
+    """
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def span(name):
+    """
+    Context manager timing a stage into the current trace; a shared no-op when nothing is traced.
+    """
+    trace = _current_trace.get()
+    return _NO_SPAN if trace is None else trace.span(name)
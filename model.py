@@ -1,8 +1,27 @@
+import bisect
+import logging
+import math
+import sys
+from functools import partial
+
+import numpy as np
 import pandas as pd
-import numpy_financial as npf
-from datetime import datetime, timedelta
-import plotly.graph_objects as go
-from dateutil.relativedelta import relativedelta
+import annuity
+from payment_calendar import PERIODS_PER_YEAR, get_payment_calendar, payment_date_grid
+from rate_path import RatePath, compile_rate_path
+from checkpoints import CHECKPOINT_INTERVAL, ScheduleRun, schedule_checkpoints
+from segments import Segment, SegmentSchedule
+from instrumentation import span
+from metrics import engine_runs
+from monte_carlo import SUMMARY_PERCENTILES, amortize_rate_paths, mean_reverting_rate_paths, summarize_paths
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on loans x periods cells handled per vectorized portfolio chunk
+_PORTFOLIO_CHUNK_CELLS = 2_000_000
+
+# Version of the compact schedule format written by LoanCalculator.compact_schedule
+COMPACT_SCHEDULE_VERSION = 2
 
 class LoanCalculator:
     def __init__(self, annual_interest_rate, interest_rate_cap=12, interest_rate_minimum=4):
@@ -26,78 +45,242 @@ class LoanCalculator:
         adjustment_df = adjustment_df.sort_values(by='Event Date')
         return adjustment_df
 
-    def calculate_amortization_schedule_by_loan_term(self, loan_amount, loan_term, first_payment_date,
-                                                     adjustment_df=None, loan_term_mode="fixed", 
-                                                     payment_frequency="monthly", interest_type="Fixed",
-                                                     variable_interest_configuration=None):
+    def process_adjustment_rules(self, adjustment_rules):
+        """
+        Process and validate periodical repayment/drawdown rules.
+
+        adjustment_rules: DataFrame or list of records with columns ['Amount', 'From', 'Until', 'Period'];
+        every rule adds Amount on From and then every Period ('monthly', 'weekly' or 'fortnightly') up to Until.
+        """
+        adjustment_rules = pd.DataFrame(adjustment_rules)
+        if not all(col in adjustment_rules.columns for col in ['Amount', 'From', 'Until', 'Period']):
+            raise ValueError("Adjustment rules must contain 'Amount', 'From', 'Until' and 'Period' columns.")
+
+        # Convert From and Until to datetime
+        adjustment_rules['From'] = pd.to_datetime(adjustment_rules['From'])
+        adjustment_rules['Until'] = pd.to_datetime(adjustment_rules['Until'])
+
+        for period in adjustment_rules['Period']:
+            if period not in PERIODS_PER_YEAR:
+                raise ValueError(f"Invalid period type: {period}")
+        return adjustment_rules
+
+    def _period_adjustments(self, calendar, adjustment_df, adjustment_rules):
+        """
+        Balance adjustment of every payment period from one-off events and periodical rules, or None when
+        neither is given.
+        """
+        if adjustment_df is None and adjustment_rules is None:
+            return None
+
+        with span("adjustment_prep"):
+            if adjustment_df is not None:
+                period_adjustments = _bucket_adjustments(self.process_adjustments(adjustment_df), calendar)
+            else:
+                period_adjustments = [0] * calendar.n_periods
+
+            if adjustment_rules is not None:
+                rule_totals = _bucket_adjustment_rules(self.process_adjustment_rules(adjustment_rules), calendar)
+                for period_index in np.flatnonzero(rule_totals).tolist():
+                    period_adjustments[period_index] = \
+                        period_adjustments[period_index] + rule_totals[period_index].item()
+        return period_adjustments
+
+    @staticmethod
+    def _has_adjustments(adjustment_df, adjustment_rules):
+        """
+        Whether any one-off adjustment or periodical rule was given (an empty table counts as none).
+        """
+        return ((adjustment_df is not None and not adjustment_df.empty)
+                or (adjustment_rules is not None and len(adjustment_rules) > 0))
+
+    @staticmethod
+    def _validate_schedule_inputs(payment_frequency, interest_type, variable_interest_configuration):
+        """
+        Validate the payment frequency and variable interest configuration; returns the periods per year.
+        """
         # Validate payment frequency
-        valid_frequencies = {"monthly": 12, "weekly": 52, "fortnightly": 26}
-        if payment_frequency not in valid_frequencies: 
-            raise ValueError(f"Invalid payment frequency. Choose from {list(valid_frequencies.keys())}.")
+        if payment_frequency not in PERIODS_PER_YEAR:
+            raise ValueError(f"Invalid payment frequency. Choose from {list(PERIODS_PER_YEAR.keys())}.")
 
-        # Validate variable interest configuration
-        if interest_type == "Variable" and not variable_interest_configuration:
-            raise ValueError("Variable interest configuration must be provided for 'Variable' interest type.")
+        # Validate variable interest configuration (compiling it up front)
+        if interest_type == "Variable":
+            if not variable_interest_configuration:
+                raise ValueError("Variable interest configuration must be provided for 'Variable' interest type.")
+            compile_rate_path(variable_interest_configuration)
 
-        # Determine the number of periods per year
-        periods_per_year = valid_frequencies[payment_frequency]
+        return PERIODS_PER_YEAR[payment_frequency]
+
+    def calculate_amortization_schedule_by_loan_term(self, loan_amount, loan_term, first_payment_date,
+                                                     adjustment_df=None, loan_term_mode="fixed", 
+                                                     payment_frequency="monthly", interest_type="Fixed",
+                                                     variable_interest_configuration=None, sliced_date=None,
+                                                     adjustment_rules=None):
+        # Validate the inputs and determine the number of periods per year
+        periods_per_year = self._validate_schedule_inputs(payment_frequency, interest_type,
+                                                          variable_interest_configuration)
 
         # Convert first payment date to datetime
         first_payment_date = pd.to_datetime(first_payment_date)
 
         # Initialize variables
         total_periods = loan_term * periods_per_year
+        current_interest_rate = self.annual_interest_rate
+
+        # Fixed rate without adjustments has an exact closed form, so skip the period loop
+        if interest_type == "Fixed" and adjustment_df is None and adjustment_rules is None and \
+                self._closed_form_applicable(loan_amount, total_periods, current_interest_rate):
+            engine_runs.inc(path="closed_form")
+            return self._closed_form_schedule_by_loan_term(loan_amount, total_periods, first_payment_date,
+                                                           payment_frequency, periods_per_year, sliced_date)
+
+        # Payment dates and adjustment windows of every period
+        calendar = get_payment_calendar(first_payment_date, payment_frequency, total_periods)
+        first_period = _first_sliced_period(calendar, sliced_date)
+
+        # Walk the periods, writing the ones from the slice on into the schedule columns
+        engine_runs.inc(path="period_loop")
+        checkpoint_key = _checkpoint_key("By Loan Term", self.annual_interest_rate, loan_amount, loan_term, calendar,
+                                         loan_term_mode, interest_type, variable_interest_configuration,
+                                         self._has_adjustments(adjustment_df, adjustment_rules))
+        with span("engine"):
+            walk_periods = partial(self._walk_by_loan_term, loan_amount, loan_term, calendar, first_period,
+                                   adjustment_df, loan_term_mode, interest_type, variable_interest_configuration,
+                                   adjustment_rules)
+            schedule = self._walk_into_schedule(walk_periods, checkpoint_key, calendar, first_period, adjustment_df,
+                                                adjustment_rules)
+
+        # Convert schedule to DataFrame
+        with span("dataframe_build"):
+            schedule_df = schedule.to_frame(calendar)
+        return schedule_df
+
+    def _walk_into_schedule(self, walk_periods, checkpoint_key, calendar, first_period, adjustment_df,
+                            adjustment_rules):
+        """
+        Run a period walker (walk_periods, called with the walker's optional keyword arguments) into schedule
+        columns from first_period on.
+
+        Full schedules go through schedule_checkpoints: when the same loan was last computed with adjustments
+        that only differ from some period on, its rows before the latest checkpoint at or before that period
+        are reused and the walk resumes from the checkpointed state, so only the rest is recomputed.
+        """
+        schedule = _ScheduleColumns(calendar.n_periods, first_period)
+        if first_period == 1:
+            period_adjustments = self._period_adjustments(calendar, adjustment_df, adjustment_rules)
+            previous = schedule_checkpoints.get(checkpoint_key)
+            resume_period = previous.resume_point(period_adjustments) if previous is not None else None
+            states = {}
+            if resume_period is not None:
+                engine_runs.inc(path="checkpoint_resume")
+                schedule.prefill(previous.rows, resume_period - 1)
+                states = {period: state for period, state in previous.states.items() if period <= resume_period}
+            walk = walk_periods(period_adjustments=period_adjustments, checkpoints=states,
+                                resume=states[resume_period] if resume_period is not None else None)
+        else:
+            period_adjustments = self._period_adjustments(calendar, adjustment_df, adjustment_rules)
+            walk = walk_periods(period_adjustments=period_adjustments)
+            schedule.float_columns[_ADJUSTMENT_COLUMN] = _any_non_integer(period_adjustments, first_period - 1)
+
+        for period, n_periods, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, \
+                remaining_balance, original in walk:
+            if n_periods == 1 and period >= first_period:
+                schedule.append(interest_rate, interest_due, principal_paid, payment_due, balance_adjustment,
+                                max(0, remaining_balance), original=original)
+            elif period < first_period:
+                # Periods before the slice are not written but still decide whether a column is integer
+                schedule.float_columns |= _step_non_integers(n_periods, interest_rate, interest_due, principal_paid,
+                                                             payment_due, balance_adjustment,
+                                                             max(0, remaining_balance))
+
+        if first_period == 1:
+            schedule_checkpoints.put(checkpoint_key, ScheduleRun(period_adjustments, schedule.rows(), states))
+        return schedule
+
+    def _walk_by_loan_term(self, loan_amount, loan_term, calendar, first_period, adjustment_df=None,
+                           loan_term_mode="fixed", interest_type="Fixed", variable_interest_configuration=None,
+                           adjustment_rules=None, period_adjustments=None, resume=None, checkpoints=None,
+                           checkpoint_periods=(), has_adjustments=None):
+        """
+        Period loop of calculate_amortization_schedule_by_loan_term, as a generator over the calendar's periods.
+
+        Yields (period, n_periods, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment,
+        balance, original) per period. Before first_period, stretches without adjustments or rate changes are
+        covered in closed form and yielded as one tuple with n_periods > 1, carrying the stretch's interest and
+        principal totals and the balance at its end. Stops once the balance is paid off.
+
+        period_adjustments: the adjustments already bucketed per period (computed from adjustment_df and
+        adjustment_rules when None)
+        checkpoints: dict the walker state at the start of every CHECKPOINT_INTERVAL-th stepped period, and of
+        every stepped period in checkpoint_periods, is recorded into, keyed by period
+        resume: such a recorded state to continue from instead of period 1
+        has_adjustments: whether adjustments were given (computed from adjustment_df and adjustment_rules when
+        None), for resuming from period_adjustments alone
+        """
+        payment_frequency = calendar.payment_frequency
+        periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+        total_periods = calendar.n_periods
         remaining_balance = loan_amount
         current_interest_rate = self.annual_interest_rate
 
-        # Prepare adjustments
-        if adjustment_df is not None:
-            adjustment_df = self.process_adjustments(adjustment_df)
+        # Prepare adjustments and periodical rules and bucket them into payment periods up front
+        if period_adjustments is None:
+            period_adjustments = self._period_adjustments(calendar, adjustment_df, adjustment_rules)
+        if has_adjustments is None:
+            has_adjustments = self._has_adjustments(adjustment_df, adjustment_rules)
 
-        # Initialize variable interest configuration tracking
+        # Compiled rate stages of a variable interest configuration and the period the next one starts
         if interest_type == "Variable":
-            interest_rate_schedule = variable_interest_configuration["Interest Rate"]
-            length_period_schedule = variable_interest_configuration["Length Period before next Adjustment"]
-            current_stage = 0
-            periods_remaining_in_stage = length_period_schedule.get(str(current_stage), float("inf"))
-            current_interest_rate = interest_rate_schedule.get(str(current_stage), self.annual_interest_rate)
+            rate_path = compile_rate_path(variable_interest_configuration)
+            current_interest_rate = rate_path.initial_rate(self.annual_interest_rate)
+            next_rate_change = rate_path.next_change(0)
+        else:
+            next_rate_change = None
 
         # Calculate initial payment
         period_interest_rate = (current_interest_rate / 100) / periods_per_year
-        initial_payment = npf.pmt(rate=period_interest_rate, nper=total_periods, pv=-loan_amount)
+        initial_payment = annuity.pmt(period_interest_rate, total_periods, loan_amount)
 
-        # Create an empty list to hold schedule data
-        schedule = []
+        adjustment_periods = _adjustment_periods(period_adjustments) if period_adjustments is not None else None
+        recalculate_payment = loan_term_mode != "fixed" and has_adjustments
+        debug = logger.isEnabledFor(logging.DEBUG)
 
-        for period in range(1, total_periods + 1):
-            # Generate the correct period date
-            if payment_frequency == "monthly":
-                current_date = first_payment_date + pd.DateOffset(months=period - 1)
-                
-                
-            else:
-                current_date = first_payment_date + timedelta(days=(365 // periods_per_year) * (period - 1))
+        max_periods = total_periods
+        period = 1
+        if resume is not None:
+            # Continue from a recorded checkpoint (see checkpoints.ScheduleRun)
+            (period, remaining_balance, total_periods, initial_payment, current_interest_rate, period_interest_rate,
+             next_rate_change) = resume
+        while period <= max_periods:
+            # Before the slice, cover stretches without adjustments or rate changes in closed form.
+            # The payment stays level over such a stretch, and the final period is always run below.
+            if period < first_period:
+                quiet = _quiet_periods(period, min(first_period, total_periods), adjustment_periods,
+                                       next_rate_change)
+                if quiet > 0:
+                    if interest_type == "Variable":
+                        period_interest_rate = current_interest_rate / 100 / periods_per_year
+                    pmt = annuity.pmt(period_interest_rate, total_periods - period + 1, remaining_balance)
+                    if recalculate_payment:
+                        initial_payment = pmt
+                    start_balance = remaining_balance
+                    remaining_balance = annuity.balance_after(remaining_balance, period_interest_rate, pmt, quiet)
+                    yield (period, quiet, current_interest_rate, quiet * pmt - (start_balance - remaining_balance),
+                           start_balance - remaining_balance, pmt, 0, remaining_balance, True)
+                    period += quiet
+                    continue
+
+            if checkpoints is not None and (period % CHECKPOINT_INTERVAL == 0 or period in checkpoint_periods):
+                checkpoints[period] = (period, remaining_balance, total_periods, initial_payment, current_interest_rate,
+                                       period_interest_rate, next_rate_change)
 
             # Check for balance adjustment
-            if adjustment_df is not None:
-                if payment_frequency == "monthly":
-                    # Adjustments should be considered from the start of the current month
-                    month_start = current_date - pd.DateOffset(months=1) + pd.DateOffset(days=1)
-                    adjustments = adjustment_df[
-                        (adjustment_df['Event Date'] >= month_start) & (adjustment_df['Event Date'] <= current_date)
-                    ]
-                    
-                    print("Adjustments", adjustments)
-                    print("Current Date", current_date)
-                    print("Month Start", month_start)
-                else:
-                    # Use fixed-day periods for non-monthly payments
-                    adjustments = adjustment_df[
-                        (adjustment_df['Event Date'] > (current_date - timedelta(days=(365 // periods_per_year)))) &
-                        (adjustment_df['Event Date'] <= current_date)
-                    ]
-                
-                balance_adjustment = adjustments['Adjustment Amount'].sum() if not adjustments.empty else 0
+            if period_adjustments is not None:
+                balance_adjustment = period_adjustments[period - 1]
+
+                if debug:
+                    logger.debug("Period %s (%s) adjustment: %s", period, calendar.labels[period - 1],
+                                 balance_adjustment)
             else:
                 balance_adjustment = 0
 
@@ -105,10 +288,9 @@ class LoanCalculator:
             # Apply adjustments and recalculate loan term if necessary
             remaining_balance += balance_adjustment
 
-            if loan_term_mode == "adjusted" and adjustment_df is not None and not adjustment_df.empty and balance_adjustment != 0:
-                remaining_periods = max(1, int(npf.nper(rate=period_interest_rate, 
-                                                        pmt=-initial_payment, 
-                                                        pv=remaining_balance).round()))
+            if loan_term_mode == "adjusted" and has_adjustments and balance_adjustment != 0:
+                remaining_periods = max(1, int(annuity.nper(period_interest_rate, initial_payment,
+                                                            remaining_balance).round()))
                 
                 # print("Remaining Period", remaining_periods)
                 
@@ -116,19 +298,17 @@ class LoanCalculator:
 
             # Adjust interest rate if variable
             if interest_type == "Variable":
-                if periods_remaining_in_stage <= 0:
-                    current_stage += 1
-                    current_interest_rate = interest_rate_schedule.get(str(current_stage), current_interest_rate)
-                    periods_remaining_in_stage = length_period_schedule.get(str(current_stage), float("inf"))
+                if next_rate_change is not None and period >= next_rate_change:
+                    current_interest_rate = rate_path.rate_at(period, self.annual_interest_rate)
+                    next_rate_change = rate_path.next_change(period)
 
-                periods_remaining_in_stage -= 1
                 period_interest_rate = current_interest_rate / 100 / periods_per_year
 
             # Calculate PMT for this period
-            if loan_term_mode == "fixed" or (adjustment_df is None or adjustment_df.empty):
-                pmt = npf.pmt(rate=period_interest_rate, nper=total_periods - period + 1, pv=-remaining_balance)
+            if not recalculate_payment:
+                pmt = annuity.pmt(period_interest_rate, total_periods - period + 1, remaining_balance)
             else:
-                pmt = npf.pmt(rate=period_interest_rate, nper=total_periods - period + 1, pv=-remaining_balance)
+                pmt = annuity.pmt(period_interest_rate, total_periods - period + 1, remaining_balance)
                 initial_payment = pmt
 
             # Calculate interest due and principal paid
@@ -144,126 +324,312 @@ class LoanCalculator:
             # Update remaining balance
             remaining_balance -= principal_paid
 
-            # Append data to schedule
-            remark = "original" if period <= loan_term * periods_per_year else "extension"
-            schedule.append({
-                "No.": period,
-                "Period": current_date.strftime("%Y-%m-%d"),
-                "Year": current_date.year,
-                "Interest Rate": round(current_interest_rate, 2),
-                "Interest Due": round(interest_due, 2),
-                "Principal Paid": round(principal_paid, 2),
-                "Payment Due": round(pmt, 2),
-                "Balance Adjustment": round(balance_adjustment, 2),
-                "Balance": round(max(0, remaining_balance), 2),
-                "Remark": remark
-            })
+            yield (period, 1, current_interest_rate, interest_due, principal_paid, pmt, balance_adjustment,
+                   remaining_balance, period <= loan_term * periods_per_year)
 
             # Stop the loop if balance is fully paid off
             if remaining_balance <= 0:
                 break
 
-        # Convert schedule to DataFrame
-        schedule_df = pd.DataFrame(schedule)
-        return schedule_df
+            period += 1
+
+    @staticmethod
+    def _closed_form_applicable(loan_amount, total_periods, annual_interest_rate):
+        """
+        Whether a fixed-rate schedule can be built from the annuity formulas instead of the period loop.
+
+        Zero-rate loans stay on the loop: their balances land exactly on half cents, where the
+        loop's running subtraction and the closed form round differently.
+        """
+        return (isinstance(total_periods, (int, np.integer)) and total_periods >= 1
+                and loan_amount > 0 and annual_interest_rate > 0)
+
+    def _closed_form_schedule_by_loan_term(self, loan_amount, total_periods, first_payment_date,
+                                           payment_frequency, periods_per_year, sliced_date=None):
+        """
+        Vectorized fixed-rate schedule without adjustments.
+
+        Produces the same DataFrame as the period loop: every column is computed as a whole array
+        from the annuity formulas and rounded once at the end.
+        """
+        period_interest_rate = (self.annual_interest_rate / 100) / periods_per_year
+        pmt = annuity.pmt(period_interest_rate, total_periods, loan_amount)
+
+        with span("engine"):
+            lengths, grid = _closed_form_grid(np.array([loan_amount], dtype=np.float64),
+                                              np.array([period_interest_rate]), np.array([pmt]),
+                                              np.array([total_periods]), by_loan_term=True)
+        calendar = get_payment_calendar(first_payment_date, payment_frequency, total_periods)
+
+        with span("dataframe_build"):
+            columns = _grid_schedule_columns(lengths, calendar.dates[None, :],
+                                             np.array([round(self.annual_interest_rate, 2)]), grid, by_loan_term=True)
+            first_row = _first_sliced_period(calendar, sliced_date) - 1
+            return pd.DataFrame({name: values[first_row:] for name, values in columns.items()})
+
+    def calculate_portfolio(self, loans_df):
+        """
+        Calculate amortization schedules for a whole table of loans.
+
+        loans_df: DataFrame with one loan per row, using the same fields as the /calculate_amortization_schedule
+        payload: 'type', 'loan_amount', 'interest_rate', 'loan_term' or 'repayment_amount', 'first_payment_date',
+        'payment_frequency' and optionally 'loan_id', 'interest_type', 'loan_term_mode', 'adjustment_df' and
+        'adjustment_rules' (DataFrames or lists of records) and 'interest_table'. A missing 'interest_rate' falls
+        back to this calculator's annual_interest_rate and a missing 'loan_id' to the row index.
+
+        Fixed-rate loans without adjustments are amortized together as loans-by-periods arrays; every other
+        loan goes through calculate_amortization. Returns a long-format DataFrame with a 'Loan ID' column
+        followed by the usual schedule columns, ordered by loan then period.
+        """
+        loans = loans_df.reset_index()
+        n_loans = len(loans)
+        if n_loans == 0:
+            raise ValueError("Loan portfolio is empty.")
+
+        def column(name, default):
+            if name not in loans.columns:
+                return pd.Series([default] * n_loans)
+            return loans[name].where(loans[name].notna(), default)
+
+        loan_ids = loans["loan_id"] if "loan_id" in loans.columns else loans[loans.columns[0]]
+        types = column("type", "By Loan Term")
+        rates = column("interest_rate", self.annual_interest_rate)
+        frequencies = column("payment_frequency", "monthly")
+        interest_types = column("interest_type", "Fixed")
+        # An empty list or frame of adjustments means none, as it does in the /calculate_amortization_schedule payload
+        adjustments = column("adjustment_df", None).map(_none_if_empty)
+        adjustment_rules = column("adjustment_rules", None).map(_none_if_empty)
+
+        # Work out which loans the closed form can take
+        periods_per_year = frequencies.map(PERIODS_PER_YEAR)
+        period_rates = (rates.astype(np.float64) / 100 / periods_per_year).to_numpy()
+        loan_amounts = column("loan_amount", 0).astype(np.float64).to_numpy()
+        by_loan_term = (types == "By Loan Term").to_numpy()
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            loan_term_periods = column("loan_term", np.nan).astype(np.float64).to_numpy() * periods_per_year.to_numpy()
+            repayments = column("repayment_amount", np.nan).astype(np.float64).to_numpy()
+            repayment_periods = np.round(annuity.nper_array(period_rates, repayments, loan_amounts))
+        total_periods = np.where(by_loan_term, loan_term_periods, repayment_periods)
+
+        vectorized = ((interest_types == "Fixed") & adjustments.isna() & adjustment_rules.isna()
+                      & types.isin(["By Loan Term", "By Repayment Amount"])
+                      & (rates.astype(np.float64) > 0)).to_numpy(copy=True)
+        vectorized &= (loan_amounts > 0) & np.isfinite(total_periods) & (total_periods >= 1)
+        vectorized &= ~by_loan_term | (np.mod(loan_term_periods, 1) == 0)
+
+        frames = []
+        positions = []
+
+        vectorized_index = np.flatnonzero(vectorized)
+        if len(vectorized_index):
+            engine_runs.inc(len(vectorized_index), path="portfolio_closed_form")
+            total_periods = np.where(vectorized, total_periods, 0).astype(np.int64)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                payments = np.where(by_loan_term, annuity.pmt_array(period_rates, total_periods, loan_amounts),
+                                    repayments)
+            first_dates = pd.to_datetime(column("first_payment_date", pd.NaT)).to_numpy(dtype="datetime64[s]")
+            rate_labels = rates.to_numpy()
+            if rate_labels.dtype.kind == "f":
+                rate_labels = _round_column(rate_labels)
+
+            # Chunk loans so a loans-by-periods array stays within _PORTFOLIO_CHUNK_CELLS
+            order = vectorized_index[np.argsort(total_periods[vectorized_index], kind="stable")]
+            start = 0
+            while start < len(order):
+                stop = start + 1
+                while stop < len(order) and (stop - start + 1) * total_periods[order[stop]] <= _PORTFOLIO_CHUNK_CELLS:
+                    stop += 1
+                chunk = np.sort(order[start:stop])
+                width = int(total_periods[chunk].max())
+
+                lengths, grid = _closed_form_grid(loan_amounts[chunk], period_rates[chunk], payments[chunk],
+                                                  total_periods[chunk], by_loan_term=by_loan_term[chunk])
+                dates = payment_date_grid(first_dates[chunk], frequencies.to_numpy()[chunk], width)
+                chunk_df = pd.DataFrame(_grid_schedule_columns(lengths, dates, rate_labels[chunk], grid,
+                                                                  by_loan_term[chunk]))
+                chunk_df.insert(0, "Loan ID", np.repeat(loan_ids.to_numpy()[chunk], lengths))
+                frames.append(chunk_df)
+                positions.append(np.repeat(chunk, lengths))
+                start = stop
+
+        # Everything else goes through the per-loan engines
+        optional_fields = ["loan_term_mode", "payment_frequency", "interest_type"]
+        for position in np.flatnonzero(~vectorized):
+            row = loans.iloc[position]
+            kwargs = {"loan_amount": row["loan_amount"], "first_payment_date": row["first_payment_date"]}
+            # Only the field of the loan's type: rows of a mixed book often fill in both
+            term_field = "loan_term" if types[position] == "By Loan Term" else "repayment_amount"
+            for field in [term_field, *optional_fields]:
+                if field in loans.columns and pd.notna(row[field]):
+                    kwargs[field] = row[field]
+            if isinstance(kwargs.get("loan_term"), float) and kwargs["loan_term"].is_integer():
+                kwargs["loan_term"] = int(kwargs["loan_term"])
+            if "interest_table" in loans.columns and isinstance(row["interest_table"], (dict, RatePath)):
+                kwargs["variable_interest_configuration"] = row["interest_table"]
+            if adjustments[position] is not None:
+                kwargs["adjustment_df"] = pd.DataFrame(adjustments[position])
+            if adjustment_rules[position] is not None:
+                kwargs["adjustment_rules"] = adjustment_rules[position]
+
+            calculator = LoanCalculator(rates[position], self.interest_rate_cap, self.interest_rate_minimum)
+            loan_df = calculator.calculate_amortization(type=types[position], **kwargs)
+            loan_df.insert(0, "Loan ID", loan_ids[position])
+            frames.append(loan_df)
+            positions.append(np.full(len(loan_df), position))
+
+        portfolio_df = pd.concat(frames, ignore_index=True)
+        if len(frames) > 1:
+            portfolio_df = portfolio_df.iloc[np.argsort(np.concatenate(positions), kind="stable")]
+            portfolio_df = portfolio_df.reset_index(drop=True)
+        return portfolio_df
 
     def calculate_amortization_schedule_by_repayment_amount(self, loan_amount, repayment_amount, first_payment_date,
                                                             adjustment_df=None, loan_term_mode="adjusted", 
                                                             payment_frequency="monthly", interest_type="Fixed",
-                                                            variable_interest_configuration=None):
-        # Validate payment frequency
-        valid_frequencies = {"monthly": 12, "weekly": 52, "fortnightly": 26}
-        if payment_frequency not in valid_frequencies:
-            raise ValueError(f"Invalid payment frequency. Choose from {list(valid_frequencies.keys())}.")
-
-        # Validate variable interest configuration
-        if interest_type == "Variable" and not variable_interest_configuration:
-            raise ValueError("Variable interest configuration must be provided for 'Variable' interest type.")
-
-        # Determine the number of periods per year
-        periods_per_year = valid_frequencies[payment_frequency]
+                                                            variable_interest_configuration=None, sliced_date=None,
+                                                            adjustment_rules=None):
+        # Validate the inputs and determine the number of periods per year
+        periods_per_year = self._validate_schedule_inputs(payment_frequency, interest_type,
+                                                          variable_interest_configuration)
 
         # Convert first payment date to datetime
         first_payment_date = pd.to_datetime(first_payment_date)
 
         # Initialize variables
         period_interest_rate = (self.annual_interest_rate / 100) / periods_per_year
+        total_periods = self._repayment_total_periods(loan_amount, repayment_amount, period_interest_rate)
+
+        # Payment dates and adjustment windows of every period
+        calendar = get_payment_calendar(first_payment_date, payment_frequency, total_periods)
+        first_period = _first_sliced_period(calendar, sliced_date)
+
+        # Walk the periods, writing the ones from the slice on into the schedule columns
+        engine_runs.inc(path="period_loop")
+        checkpoint_key = _checkpoint_key("By Repayment Amount", self.annual_interest_rate, loan_amount,
+                                         repayment_amount, calendar, loan_term_mode, interest_type,
+                                         variable_interest_configuration,
+                                         self._has_adjustments(adjustment_df, adjustment_rules))
+        with span("engine"):
+            walk_periods = partial(self._walk_by_repayment_amount, loan_amount, repayment_amount, calendar,
+                                   first_period, adjustment_df, loan_term_mode, interest_type,
+                                   variable_interest_configuration, adjustment_rules)
+            schedule = self._walk_into_schedule(walk_periods, checkpoint_key, calendar, first_period, adjustment_df,
+                                                adjustment_rules)
+
+        # Convert schedule to DataFrame
+        with span("dataframe_build"):
+            schedule_df = schedule.to_frame(calendar)
+
+        
+
+        # Check for empty schedule (a slice past the payoff date is legitimately empty)
+        if schedule_df.empty and first_period == 1:
+            raise ValueError("Amortization schedule generation failed; the schedule is empty.")
+        
+        
+
+        return schedule_df
+
+
+    @staticmethod
+    def _repayment_total_periods(loan_amount, repayment_amount, period_interest_rate):
+        """
+        Number of repayments needed at the initial rate, rounded to a whole period.
+        """
         try:
-            total_periods = int(npf.nper(rate=period_interest_rate, pmt=-repayment_amount, pv=loan_amount).round())
+            return int(annuity.nper(period_interest_rate, repayment_amount, loan_amount).round())
         except ValueError as e:
             raise ValueError(f"Invalid repayment amount: {e}")
 
+    def _walk_by_repayment_amount(self, loan_amount, repayment_amount, calendar, first_period, adjustment_df=None,
+                                  loan_term_mode="adjusted", interest_type="Fixed",
+                                  variable_interest_configuration=None, adjustment_rules=None,
+                                  period_adjustments=None, resume=None, checkpoints=None, checkpoint_periods=(),
+                                  has_adjustments=None):
+        """
+        Period loop of calculate_amortization_schedule_by_repayment_amount, as a generator over the calendar's
+        periods. Yields the same tuples and takes the same period_adjustments, checkpoints, checkpoint_periods,
+        resume and has_adjustments arguments as _walk_by_loan_term.
+        """
+        payment_frequency = calendar.payment_frequency
+        periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+        total_periods = calendar.n_periods
+        period_interest_rate = (self.annual_interest_rate / 100) / periods_per_year
         remaining_balance = loan_amount
         current_interest_rate = self.annual_interest_rate
 
-        # Prepare adjustments
-        if adjustment_df is not None:
-            adjustment_df = self.process_adjustments(adjustment_df)
+        # Prepare adjustments and periodical rules and bucket them into payment periods up front
+        if period_adjustments is None:
+            period_adjustments = self._period_adjustments(calendar, adjustment_df, adjustment_rules)
+        if has_adjustments is None:
+            has_adjustments = self._has_adjustments(adjustment_df, adjustment_rules)
 
-        # Initialize variable interest configuration tracking
+        # Compiled rate stages of a variable interest configuration and the period the next one starts
         if interest_type == "Variable":
-            interest_rate_schedule = variable_interest_configuration["Interest Rate"]
-            length_period_schedule = variable_interest_configuration["Length Period before next Adjustment"]
-            current_stage = 0
-            periods_remaining_in_stage = length_period_schedule.get(str(current_stage), float("inf"))
-            current_interest_rate = interest_rate_schedule.get(str(current_stage), self.annual_interest_rate)
-
-        # Create an empty list to hold schedule data
-        schedule = []
-        
-        print("do we get here", total_periods)
+            rate_path = compile_rate_path(variable_interest_configuration)
+            current_interest_rate = rate_path.initial_rate(self.annual_interest_rate)
+            next_rate_change = rate_path.next_change(0)
+        else:
+            next_rate_change = None
 
-        for period in range(1, total_periods + 1):
-            
-           
-            
-            # Generate the correct period date
-            if payment_frequency == "monthly":
-                current_date = first_payment_date + pd.DateOffset(months=period - 1)
-            else:
-                current_date = first_payment_date + timedelta(days=(365 // periods_per_year) * (period - 1))
+        adjustment_periods = _adjustment_periods(period_adjustments) if period_adjustments is not None else None
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Repayment schedule over at most %s periods", total_periods)
+
+        max_periods = total_periods
+        period = 1
+        if resume is not None:
+            # Continue from a recorded checkpoint (see checkpoints.ScheduleRun)
+            (period, remaining_balance, total_periods, repayment_amount, current_interest_rate, period_interest_rate,
+             next_rate_change) = resume
+        while period <= max_periods:
+            # Before the slice, cover stretches without adjustments or rate changes in closed form,
+            # stopping short of the period that pays the loan off
+            if period < first_period:
+                quiet = _quiet_periods(period, first_period, adjustment_periods, next_rate_change)
+                if interest_type == "Variable":
+                    period_interest_rate = current_interest_rate / 100 / periods_per_year
+                quiet = min(quiet, _periods_before_payoff(remaining_balance, period_interest_rate, repayment_amount))
+                if quiet > 0:
+                    start_balance = remaining_balance
+                    remaining_balance = annuity.balance_after(remaining_balance, period_interest_rate, repayment_amount,
+                                                               quiet)
+                    yield (period, quiet, current_interest_rate,
+                           quiet * repayment_amount - (start_balance - remaining_balance),
+                           start_balance - remaining_balance, repayment_amount, 0, remaining_balance, True)
+                    period += quiet
+                    continue
+
+            if checkpoints is not None and (period % CHECKPOINT_INTERVAL == 0 or period in checkpoint_periods):
+                checkpoints[period] = (period, remaining_balance, total_periods, repayment_amount,
+                                       current_interest_rate, period_interest_rate, next_rate_change)
 
             # Check for balance adjustment
-            if adjustment_df is not None:
-                if payment_frequency == "monthly":
-                    # Adjustments should be considered from the start of the current month
-                    month_start = current_date - pd.DateOffset(months=1) + pd.DateOffset(days=1)
-                    adjustments = adjustment_df[
-                        (adjustment_df['Event Date'] >= month_start) & (adjustment_df['Event Date'] <= current_date)
-                    ]
-                    
-                  
-                else:
-                    # Use fixed-day periods for non-monthly payments
-                    adjustments = adjustment_df[
-                        (adjustment_df['Event Date'] > (current_date - timedelta(days=(365 // periods_per_year)))) &
-                        (adjustment_df['Event Date'] <= current_date)
-                    ]
-                
-                balance_adjustment = adjustments['Adjustment Amount'].sum() if not adjustments.empty else 0
+            if period_adjustments is not None:
+                balance_adjustment = period_adjustments[period - 1]
             else:
                 balance_adjustment = 0
 
             # Apply adjustments and recalculate loan term if necessary
             remaining_balance += balance_adjustment
 
-            if loan_term_mode == "adjusted" and adjustment_df is not None and not adjustment_df.empty and balance_adjustment != 0:
+            if loan_term_mode == "adjusted" and has_adjustments and balance_adjustment != 0:
                 try:
-                    remaining_periods = max(1, int(npf.nper(rate=period_interest_rate, 
-                                                            pmt=-repayment_amount, 
-                                                            pv=remaining_balance).round()))
+                    remaining_periods = max(1, int(annuity.nper(period_interest_rate, repayment_amount,
+                                                                remaining_balance).round()))
                 except ValueError:
                     raise ValueError(f"Adjustment caused invalid remaining balance: {remaining_balance}")
                 total_periods = period + remaining_periods - 1
 
             # Adjust interest rate if variable
             if interest_type == "Variable":
-                if periods_remaining_in_stage <= 0:
-                    current_stage += 1
-                    current_interest_rate = interest_rate_schedule.get(str(current_stage), current_interest_rate)
-                    periods_remaining_in_stage = length_period_schedule.get(str(current_stage), float("inf"))
+                if next_rate_change is not None and period >= next_rate_change:
+                    current_interest_rate = rate_path.rate_at(period, self.annual_interest_rate)
+                    next_rate_change = rate_path.next_change(period)
 
-                periods_remaining_in_stage -= 1
                 period_interest_rate = current_interest_rate / 100 / periods_per_year
 
             # Calculate interest due and principal paid
@@ -279,40 +645,19 @@ class LoanCalculator:
             # Update remaining balance
             remaining_balance -= principal_paid
 
-            # Append data to schedule
-            remark = "original" if period <= total_periods else "extension"
-            schedule.append({
-                "No.": period,
-                "Period": current_date.strftime("%Y-%m-%d"),
-                "Year": current_date.year,
-                "Interest Rate": round(current_interest_rate, 2),
-                "Interest Due": round(interest_due, 2),
-                "Principal Paid": round(principal_paid, 2),
-                "Payment Due": round(repayment_amount, 2),
-                "Balance Adjustment": round(balance_adjustment, 2),
-                "Balance": round(max(0, remaining_balance), 2),
-                "Remark": remark
-            })
+            yield (period, 1, current_interest_rate, interest_due, principal_paid, repayment_amount,
+                   balance_adjustment, remaining_balance, period <= total_periods)
 
             # Debug logging
-            print(f"Period: {period}, Remaining Balance: {remaining_balance}, PMT: {repayment_amount}, Total Periods: {total_periods}")
+            if debug:
+                logger.debug("Period: %s, Remaining Balance: %s, PMT: %s, Total Periods: %s", period,
+                             remaining_balance, repayment_amount, total_periods)
 
             # Stop the loop if balance is fully paid off
             if remaining_balance <= 0:
                 break
 
-        # Convert schedule to DataFrame
-        schedule_df = pd.DataFrame(schedule)
-
-        
-
-        # Check for empty schedule
-        if schedule_df.empty:
-            raise ValueError("Amortization schedule generation failed; the schedule is empty.")
-        
-        
-
-        return schedule_df
+            period += 1
 
 
     def calculate_amortization(self, type, **kwargs):
@@ -328,60 +673,1061 @@ class LoanCalculator:
             raise ValueError("Invalid type. Choose 'By Loan Term' or 'By Repayment Amount'.")
 
 
+    def iter_schedule(self, type, chunk_size=None, date_format=None, **kwargs):
+        """
+        Generator version of calculate_amortization: yields the schedule as it is computed instead of building it.
+
+        Takes the same keyword arguments as calculate_amortization, including sliced_date. Yields one dict per
+        row with the schedule's columns (values rounded like the DataFrame's, 'Period' rendered with date_format
+        when given), or with chunk_size, DataFrames of up to chunk_size rows. Only the current row or chunk is
+        held in memory. Invalid inputs raise here rather than on the first next().
+
+        Numbers are typed like calculate_amortization's columns (an integral value in a float column comes out
+        as a float), which takes a closed-form pass over the periods first (see _schedule_float_columns).
+        """
+        sliced_date = kwargs.pop("sliced_date", None)
+        calendar, walk_periods = self._prepare_walk(type, **kwargs)
+        engine_runs.inc(path="stream")
+        first_period = _first_sliced_period(calendar, sliced_date)
+        period_adjustments = self._period_adjustments(calendar, kwargs.get("adjustment_df"),
+                                                      kwargs.get("adjustment_rules"))
+        float_columns = _schedule_float_columns(
+            walk_periods(calendar.n_periods + 1, period_adjustments=period_adjustments), period_adjustments)
+
+        # An empty repayment schedule is an error, as in calculate_amortization_schedule_by_repayment_amount
+        require_rows = type == "By Repayment Amount" and first_period == 1
+        steps = walk_periods(first_period, period_adjustments=period_adjustments)
+        if chunk_size:
+            return _iter_schedule_chunks(calendar, steps, first_period, chunk_size, require_rows, float_columns)
+        labels = calendar.format_dates(date_format) if date_format else calendar.labels
+        return _iter_schedule_rows(calendar, labels, steps, first_period, require_rows, float_columns)
+
+    def _prepare_walk(self, type, loan_amount, first_payment_date, loan_term=None, repayment_amount=None,
+                      adjustment_df=None, loan_term_mode=None, payment_frequency="monthly", interest_type="Fixed",
+                      variable_interest_configuration=None, adjustment_rules=None):
+        """
+        Validate calculate_amortization-style arguments and return the loan's payment calendar together with
+        its period walker, to be called with the first period to emit (loan_term_mode defaults per type).
+        """
+        periods_per_year = self._validate_schedule_inputs(payment_frequency, interest_type,
+                                                          variable_interest_configuration)
+        first_payment_date = pd.to_datetime(first_payment_date)
+
+        if type == "By Loan Term":
+            calendar = get_payment_calendar(first_payment_date, payment_frequency, loan_term * periods_per_year)
+            walk_periods = partial(self._walk_by_loan_term, loan_amount, loan_term, calendar,
+                                   adjustment_df=adjustment_df, loan_term_mode=loan_term_mode or "fixed",
+                                   interest_type=interest_type,
+                                   variable_interest_configuration=variable_interest_configuration,
+                                   adjustment_rules=adjustment_rules)
+        elif type == "By Repayment Amount":
+            total_periods = self._repayment_total_periods(loan_amount, repayment_amount,
+                                                          (self.annual_interest_rate / 100) / periods_per_year)
+            calendar = get_payment_calendar(first_payment_date, payment_frequency, total_periods)
+            walk_periods = partial(self._walk_by_repayment_amount, loan_amount, repayment_amount, calendar,
+                                   adjustment_df=adjustment_df, loan_term_mode=loan_term_mode or "adjusted",
+                                   interest_type=interest_type,
+                                   variable_interest_configuration=variable_interest_configuration,
+                                   adjustment_rules=adjustment_rules)
+        else:
+            raise ValueError("Invalid type. Choose 'By Loan Term' or 'By Repayment Amount'.")
+
+        return calendar, walk_periods
+
+    def calculate_minimum_repayment(self, loan_amount, payment_frequency="monthly", interest_type="Fixed",
+                                    variable_interest_configuration=None):
+        """
+        Smallest whole-dollar repayment that pays off loan_amount at this calculator's rate (see minimum_repayment).
+        """
+        self._validate_schedule_inputs(payment_frequency, interest_type, variable_interest_configuration)
+        configuration = variable_interest_configuration if interest_type == "Variable" else None
+        return int(minimum_repayment(loan_amount, self.annual_interest_rate, payment_frequency, configuration))
+
+    def calculate_sensitivity(self, loan_amount, first_payment_date, loan_terms, rate_spread_bp=300, rate_step_bp=25,
+                              payment_frequency="monthly", horizon_date=None, schedule_cells=None):
+        """
+        sensitivity_grid over rates within rate_spread_bp basis points either side of this calculator's rate,
+        in rate_step_bp steps (negative rates are left out).
+        """
+        annual_interest_rates = rate_axis(self.annual_interest_rate, rate_spread_bp, rate_step_bp)
+        return sensitivity_grid(loan_amount, first_payment_date, annual_interest_rates, loan_terms,
+                                payment_frequency=payment_frequency, horizon_date=horizon_date,
+                                schedule_cells=schedule_cells, interest_rate_cap=self.interest_rate_cap,
+                                interest_rate_minimum=self.interest_rate_minimum)
+
+    def loan_state_at(self, type, date, loan_amount, first_payment_date, loan_term=None, repayment_amount=None,
+                      adjustment_df=None, loan_term_mode=None, payment_frequency="monthly", interest_type="Fixed",
+                      variable_interest_configuration=None, adjustment_rules=None):
+        """
+        State of a loan right after its last payment on or before date, without building the schedule.
+
+        Takes the same arguments as calculate_amortization (loan_term_mode defaults per type as there) and
+        walks the same periods, but stretches without adjustments or rate changes are covered with the
+        annuity formulas, so the cost grows with the number of adjustments and rate stages, not periods.
+
+        Returns a dict with:
+        payments_made: number of payments due on or before date (fewer if the loan was paid off earlier)
+        last_payment_date, next_payment_date: 'YYYY-MM-DD' dates, None when there is no such payment
+        balance, interest_rate: balance and annual rate after the last payment
+        cumulative_interest, cumulative_principal, cumulative_adjustments: totals over the payments made
+        next_payment: amount of the next scheduled payment
+        remaining_periods: payments left at the next payment's rate and amount (annuity.nper, rounded up);
+        0 once paid off, None when that payment never clears the balance
+        """
+        calendar, walk_periods = self._prepare_walk(type, loan_amount, first_payment_date, loan_term, repayment_amount,
+                                                    adjustment_df, loan_term_mode, payment_frequency, interest_type,
+                                                    variable_interest_configuration, adjustment_rules)
+        periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+        engine_runs.inc(path="point_query")
+
+        # Payments due on or before date
+        target_period = calendar.first_period_on_or_after(pd.Timestamp(date).normalize() + pd.Timedelta(days=1))
+
+        # Every period up to target_period is either jumped over or stepped; stop at the first one after it
+        walk = walk_periods(target_period + 1)
+
+        payments_made = 0
+        balance = loan_amount
+        interest_rate = None
+        cumulative_interest = cumulative_principal = cumulative_adjustments = 0
+        next_step = None
+
+        for step in walk:
+            period, n_periods, step_rate, interest_due, principal_paid, _, balance_adjustment, step_balance, _ = step
+            if period > target_period:
+                next_step = step
+                break
+            payments_made = period + n_periods - 1
+            balance = step_balance
+            interest_rate = step_rate
+            cumulative_interest += interest_due
+            cumulative_principal += principal_paid
+            cumulative_adjustments += balance_adjustment
+        walk.close()
+
+        if interest_rate is None:
+            interest_rate = next_step[2] if next_step is not None else self.annual_interest_rate
+        balance = max(0, balance)
+
+        if next_step is None or balance <= 0:
+            remaining_periods = 0 if balance <= 0 else None
+        else:
+            remaining_periods = _remaining_periods(balance, next_step[2] / 100 / periods_per_year, next_step[5])
+
+        return {
+            "payments_made": payments_made,
+            "last_payment_date": str(calendar.labels[payments_made - 1]) if payments_made else None,
+            "next_payment_date": str(calendar.labels[next_step[0] - 1]) if next_step is not None else None,
+            "balance": round(float(balance), 2),
+            "interest_rate": interest_rate,
+            "cumulative_interest": round(float(cumulative_interest), 2),
+            "cumulative_principal": round(float(cumulative_principal), 2),
+            "cumulative_adjustments": round(float(cumulative_adjustments), 2),
+            "next_payment": round(float(next_step[5]), 2) if next_step is not None else None,
+            "remaining_periods": remaining_periods
+        }
+
+    def balance_at(self, type, date, **kwargs):
+        """
+        Balance right after the last payment on or before date (see loan_state_at).
+        """
+        return self.loan_state_at(type, date, **kwargs)["balance"]
+
+    def remaining_term_at(self, type, date, **kwargs):
+        """
+        Payments left after date at the next payment's rate and amount (see loan_state_at).
+        """
+        return self.loan_state_at(type, date, **kwargs)["remaining_periods"]
+
+    def cumulative_interest_at(self, type, date, **kwargs):
+        """
+        Interest paid over the payments due on or before date (see loan_state_at).
+        """
+        return self.loan_state_at(type, date, **kwargs)["cumulative_interest"]
+
+    def schedule_segments(self, type, loan_amount, first_payment_date, loan_term=None, repayment_amount=None,
+                          adjustment_df=None, loan_term_mode=None, payment_frequency="monthly", interest_type="Fixed",
+                          variable_interest_configuration=None, adjustment_rules=None):
+        """
+        The loan's timeline split into segments at its events (balance adjustments, rate stage changes, term
+        recalculations and the final payment), each solved in closed form, without building any rows.
+
+        Takes the same arguments as calculate_amortization (loan_term_mode defaults per type as there). Between
+        events the loan evolves as a plain annuity, so the cost grows with the number of events, not periods.
+        Returns a SegmentSchedule, whose summary() gives loan-level totals and whose to_frame() and rows()
+        compute the schedule's rows only when called.
+        """
+        if loan_term_mode is None:
+            loan_term_mode = "fixed" if type == "By Loan Term" else "adjusted"
+        arguments = {"loan_amount": loan_amount, "first_payment_date": first_payment_date,
+                     "adjustment_df": adjustment_df, "loan_term_mode": loan_term_mode,
+                     "payment_frequency": payment_frequency, "interest_type": interest_type,
+                     "variable_interest_configuration": variable_interest_configuration,
+                     "adjustment_rules": adjustment_rules}
+        if type == "By Loan Term":
+            arguments["loan_term"] = loan_term
+        else:
+            arguments["repayment_amount"] = repayment_amount
+
+        calendar, walk_periods = self._prepare_walk(type, **arguments)
+        engine_runs.inc(path="segments")
+
+        with span("engine"):
+            # With the first period to emit past the calendar's end, the walker jumps every quiet stretch
+            # and only steps through event periods and the final payment
+            segments = [Segment(*step) for step in walk_periods(calendar.n_periods + 1)]
+        if not segments:
+            raise ValueError("Amortization schedule generation failed; the schedule is empty.")
+
+        return SegmentSchedule(calendar, segments, expand=partial(self.calculate_amortization, type, **arguments),
+                               stream=partial(self.iter_schedule, type, **arguments))
+
+    def loan_summary(self, type, **kwargs):
+        """
+        Loan-level totals computed from the loan's segments (see schedule_segments and SegmentSchedule.summary).
+        """
+        return self.schedule_segments(type, **kwargs).summary()
+
+    def compact_schedule(self, type, loan_amount, first_payment_date, loan_term=None, repayment_amount=None,
+                         adjustment_df=None, loan_term_mode=None, payment_frequency="monthly", interest_type="Fixed",
+                         variable_interest_configuration=None, adjustment_rules=None):
+        """
+        The loan's schedule in compact form, as a JSON-ready dict: its inputs, the periods carrying balance
+        adjustments and one segment per stretch between adjustments and rate stage changes.
+
+        Takes the same arguments as calculate_amortization (loan_term_mode defaults per type as there). Every
+        segment records the period loop's exact state at its start, so expand_compact_schedule reproduces any
+        range of rows exactly, rounding included, stepping only from the nearest segment start. Numbers keep
+        their type (ints and floats as they are, NumPy scalars as [dtype, value]) since it decides how the
+        schedule rounds them.
+
+        Returns a dict with 'version', the loan's inputs ('type', 'interest_rate', 'loan_amount', 'loan_term' or
+        'repayment_amount', 'first_payment_date', 'payment_frequency', 'loan_term_mode', 'interest_type',
+        'rate_path' as compiled (start_period, rate) stages or None and 'has_adjustments'), 'n_periods' (rows in
+        the schedule), 'float_columns' (the numeric columns the full schedule holds as floats rather than
+        integers), 'adjustments' ([period, amount] pairs, None without adjustments) and 'segments': dicts
+        with 'start_period', 'end_period', the rounded 'interest_rate' and 'payment' of the segment's first row
+        and 'balance' before it, and the loop 'state' to resume from.
+        """
+        if loan_term_mode is None:
+            loan_term_mode = "fixed" if type == "By Loan Term" else "adjusted"
+        calendar, walk_periods = self._prepare_walk(type, loan_amount, first_payment_date, loan_term, repayment_amount,
+                                                    adjustment_df, loan_term_mode, payment_frequency, interest_type,
+                                                    variable_interest_configuration, adjustment_rules)
+        period_adjustments = self._period_adjustments(calendar, adjustment_df, adjustment_rules)
+        rate_path = compile_rate_path(variable_interest_configuration) if interest_type == "Variable" else None
+
+        # Segments start on period 1, on every adjusted period and on every rate stage change
+        starts = {1}
+        if period_adjustments is not None:
+            starts.update(_adjustment_periods(period_adjustments).tolist())
+        if rate_path is not None:
+            starts.update(rate_path.change_periods)
+
+        engine_runs.inc(path="compact")
+        states = {}
+        first_rows = {}
+        n_periods = 0
+        # A range of rows is typed like the full schedule, not by its own values (see _ScheduleColumns)
+        float_columns = np.zeros(len(_ScheduleColumns.NUMERIC_COLUMNS), dtype=bool)
+        with span("engine"):
+            for period, _, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, \
+                    remaining_balance, _ in walk_periods(1, period_adjustments=period_adjustments, checkpoints=states,
+                                                         checkpoint_periods=starts):
+                n_periods = period
+                if period in starts:
+                    first_rows[period] = (interest_rate, payment_due)
+                if not float_columns.all():
+                    float_columns |= _step_non_integers(1, interest_rate, interest_due, principal_paid, payment_due,
+                                                        balance_adjustment, max(0, remaining_balance))
+        if n_periods == 0 and type == "By Repayment Amount":
+            raise ValueError("Amortization schedule generation failed; the schedule is empty.")
+
+        segment_starts = sorted(first_rows)
+        segments = []
+        for index, start in enumerate(segment_starts):
+            interest_rate, payment_due = first_rows[start]
+            segments.append({
+                "start_period": start,
+                "end_period": segment_starts[index + 1] - 1 if index + 1 < len(segment_starts) else n_periods,
+                "interest_rate": round(interest_rate, 2),
+                "payment": round(float(payment_due), 2),
+                "balance": round(float(states[start][1]), 2),
+                "state": [_pack_number(value) for value in states[start]]
+            })
+
+        compact = {
+            "version": COMPACT_SCHEDULE_VERSION,
+            "type": type,
+            "interest_rate": _pack_number(self.annual_interest_rate),
+            "loan_amount": _pack_number(loan_amount),
+            "first_payment_date": pd.Timestamp(first_payment_date).isoformat(),
+            "payment_frequency": payment_frequency,
+            "loan_term_mode": loan_term_mode,
+            "interest_type": interest_type,
+            "rate_path": [[start, _pack_number(rate)] for start, rate in rate_path.segments] if rate_path else None,
+            "has_adjustments": self._has_adjustments(adjustment_df, adjustment_rules),
+            "n_periods": n_periods,
+            "float_columns": [name for name, is_float in zip(_ScheduleColumns.NUMERIC_COLUMNS, float_columns)
+                              if is_float],
+            # Every period whose adjustment is not the integer 0, which is what the loop adds when nothing happens
+            "adjustments": [[period, _pack_number(amount)] for period, amount in enumerate(period_adjustments, 1)
+                            if not (amount.__class__ is int and amount == 0)]
+            if period_adjustments is not None else None,
+            "segments": segments
+        }
+        if type == "By Loan Term":
+            compact["loan_term"] = _pack_number(loan_term)
+        else:
+            compact["repayment_amount"] = _pack_number(repayment_amount)
+        return compact
+
+    def simulate_variable_rate(self, type, loan_amount, first_payment_date, loan_term=None, repayment_amount=None,
+                               payment_frequency="monthly", n_paths=10000, long_term_rate=None, reversion_speed=0.25,
+                               volatility=1.0, reset_periods=1, max_years=50, seed=None):
+        """
+        Monte Carlo stress test: amortize the loan along n_paths simulated variable-rate paths.
+
+        Rates start at this calculator's rate and mean-revert with random shocks, held between
+        interest_rate_minimum and interest_rate_cap (see monte_carlo.mean_reverting_rate_paths). All paths are
+        amortized together (see monte_carlo.amortize_rate_paths); 'By Repayment Amount' loans are followed for at
+        most max_years. Returns a dict with the per-path 'rate_paths', 'total_interest', 'peak_payment',
+        'payoff_date' (NaT when not paid off) and 'final_balance', plus a 'summary' of their distributions.
+        """
+        periods_per_year = self._validate_schedule_inputs(payment_frequency, "Fixed", None)
+        if type == "By Loan Term":
+            if loan_term is None:
+                raise ValueError("Loan term is required for 'By Loan Term'.")
+            n_periods = loan_term * periods_per_year
+            if n_periods < 1 or n_periods != int(n_periods):
+                raise ValueError("Loan term must cover a whole, positive number of payment periods.")
+            n_periods = int(n_periods)
+        elif type == "By Repayment Amount":
+            if repayment_amount is None:
+                raise ValueError("Repayment amount is required for 'By Repayment Amount'.")
+            n_periods = int(max_years * periods_per_year)
+        else:
+            raise ValueError("Invalid type. Choose 'By Loan Term' or 'By Repayment Amount'.")
+
+        engine_runs.inc(path="monte_carlo")
+        with span("engine"):
+            rate_paths = mean_reverting_rate_paths(self.annual_interest_rate, n_paths, n_periods, periods_per_year,
+                                                   long_term_rate=long_term_rate, reversion_speed=reversion_speed,
+                                                   volatility=volatility, reset_periods=reset_periods,
+                                                   rate_cap=self.interest_rate_cap,
+                                                   rate_minimum=self.interest_rate_minimum, seed=seed)
+            paths = amortize_rate_paths(loan_amount, rate_paths, periods_per_year,
+                                        loan_term_periods=n_periods if type == "By Loan Term" else None,
+                                        repayment_amount=repayment_amount if type == "By Repayment Amount" else None)
+
+        calendar = get_payment_calendar(first_payment_date, payment_frequency, n_periods)
+        paid_off = paths["payoff_period"] > 0
+        payoff_dates = np.where(paid_off, calendar.dates[paths["payoff_period"] - 1], np.datetime64("NaT"))
+
+        # Payoff date percentiles count unpaid paths as paying off last, so high percentiles may be NaT
+        payoff_periods = np.where(paid_off, paths["payoff_period"], n_periods + 1)
+        payoff_summary = {}
+        for percentile, period in zip(SUMMARY_PERCENTILES,
+                                      np.percentile(payoff_periods, SUMMARY_PERCENTILES, method="nearest")):
+            payoff_summary[f"p{percentile:g}"] = calendar.labels[period - 1] if period <= n_periods else None
+
+        return {
+            "rate_paths": rate_paths,
+            "total_interest": paths["total_interest"],
+            "peak_payment": paths["peak_payment"],
+            "payoff_date": payoff_dates,
+            "final_balance": paths["final_balance"],
+            "summary": {
+                "total_interest": summarize_paths(paths["total_interest"]),
+                "peak_payment": summarize_paths(paths["peak_payment"]),
+                "payoff_date": payoff_summary,
+                "paid_off_share": float(paid_off.mean()),
+            },
+        }
+
     def amortization_plot(self, schedule_df):
-        # Create stacked bar chart using Plotly
-        fig = go.Figure()
-        
-        # Add interest due stacked above principal paid
-        fig.add_trace(go.Bar(
-            x=schedule_df["Period"],
-            y=schedule_df["Interest Due"],
-            name="Interest Due",
-            marker_color="#7201a8"
-        ))
-
-        # Add principal paid as the base bar
-        fig.add_trace(go.Bar(
-            x=schedule_df["Period"],
-            y=schedule_df["Principal Paid"],
-            name="Principal Paid",
-            marker_color="#ed7953"
-        ))
-
-        # Update layout
-        fig.update_layout(
-            title="Amortization Schedule",
-            xaxis_title="Periods",
-            yaxis_title="Amount ($)",
-            barmode="stack",
-            legend=dict(title="Components"),
-            xaxis=dict(tickformat="%b-%Y")
-        )
-
-        return fig
-    
-    
+        # Plotly is only imported once a chart is drawn (see plots)
+        from plots import amortization_plot
+        return amortization_plot(schedule_df)
+
     def loan_balance_plot(self, schedule_df):
-        
-        # Create bar chart using Plotly
-        fig = go.Figure()
-        
-        # Add loan balance bar
-        fig.add_trace(go.Bar(
-            x=schedule_df["Period"],
-            y=schedule_df["Balance"],
-            name="Loan Balance",
-            marker_color="#636efa"
-        ))
-
-        # Update layout
-        fig.update_layout(
-            title="Loan Balance Over Time",
-            xaxis_title="Periods",
-            yaxis_title="Amount ($)",
-            xaxis=dict(tickformat="%b-%Y")
-        )
-
-        return fig
-
- 
\ No newline at end of file
+        from plots import loan_balance_plot
+        return loan_balance_plot(schedule_df)
+
+
+def minimum_repayment(loan_amounts, annual_interest_rates, payment_frequency="monthly",
+                      variable_interest_configuration=None):
+    """
+    Smallest whole-dollar repayment that pays off each loan, vectorized over loan amounts and annual rates (%).
+
+    A repayment has to beat the interest-only payment at every rate the loan goes through. At a fixed rate that
+    is the interest-only bound itself. With a variable interest configuration the interest-only bounds at the
+    first stage's rate and at the highest stage rate bracket the answer, which is then bisected: later stages
+    charge their rate on a balance the repayment has already paid down, tracked in closed form per stage.
+    Returns an array shaped like the broadcast inputs (a scalar for scalar inputs).
+    """
+    if payment_frequency not in PERIODS_PER_YEAR:
+        raise ValueError(f"Invalid payment frequency. Choose from {list(PERIODS_PER_YEAR.keys())}.")
+
+    periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+    loan_amounts, annual_interest_rates = np.broadcast_arrays(np.asarray(loan_amounts, dtype=np.float64),
+                                                              np.asarray(annual_interest_rates, dtype=np.float64))
+    base_rates = annual_interest_rates / 100 / periods_per_year
+    stages = _rate_stages(variable_interest_configuration, annual_interest_rates, periods_per_year)
+
+    # The loop derives its term from annuity.nper at the base rate, so the repayment must beat that too
+    floor_rates = np.maximum(base_rates, np.max([rates for _, rates in stages], axis=0))
+    low = np.floor(loan_amounts * np.maximum(base_rates, stages[0][1]))
+    high = np.floor(loan_amounts * floor_rates) + 1
+
+    # Bisect on whole dollars: low never pays off, high always does
+    while (high - low > 1).any():
+        middle = np.floor((low + high) / 2)
+        pays_off = _pays_off(loan_amounts, base_rates, stages, middle)
+        high = np.where(pays_off, middle, high)
+        low = np.where(pays_off, low, middle)
+
+    return high[()] if high.ndim == 0 else high
+
+
+def rate_axis(base_rate, spread_bp=300, step_bp=25):
+    """
+    Annual rates (%) from base_rate - spread_bp to base_rate + spread_bp basis points in step_bp steps,
+    leaving out negative rates.
+    """
+    if step_bp <= 0 or spread_bp < 0:
+        raise ValueError("Rate spread must not be negative and the rate step must be positive.")
+    shifts = np.arange(-(spread_bp // step_bp), spread_bp // step_bp + 1) * step_bp
+    rates = np.round(base_rate + shifts / 100, 4)
+    return rates[rates >= 0]
+
+
+def sensitivity_grid(loan_amount, first_payment_date, annual_interest_rates, loan_terms, payment_frequency="monthly",
+                     horizon_date=None, schedule_cells=None, interest_rate_cap=12, interest_rate_minimum=4):
+    """
+    Summary metrics of one fixed-rate 'By Loan Term' loan without adjustments over a grid of annual rates (%)
+    and loan terms (years), computed for every cell at once from the annuity formulas.
+
+    Returns a dict with the 'interest_rates' and 'loan_terms' axes and rates-by-terms arrays: 'payment' (the
+    level payment per period), 'total_interest', 'payoff_date' (date of the final payment) and, when
+    horizon_date is given, 'balance_at_horizon' (the balance after the payments due on or before it).
+    Amounts are rounded to cents once, so total_interest can differ by a few cents from the sum of a
+    schedule's rounded 'Interest Due' column. schedule_cells lists (rate, term) pairs whose full schedules are
+    added under 'schedules', keyed by the pair.
+    """
+    if payment_frequency not in PERIODS_PER_YEAR:
+        raise ValueError(f"Invalid payment frequency. Choose from {list(PERIODS_PER_YEAR.keys())}.")
+    if loan_amount <= 0:
+        raise ValueError("Loan amount must be positive.")
+
+    periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+    annual_interest_rates = np.atleast_1d(np.asarray(annual_interest_rates, dtype=np.float64))
+    loan_terms = np.atleast_1d(np.asarray(loan_terms, dtype=np.float64))
+    if annual_interest_rates.ndim != 1 or loan_terms.ndim != 1 or not len(annual_interest_rates) \
+            or not len(loan_terms):
+        raise ValueError("Interest rates and loan terms must be non-empty lists.")
+    if (annual_interest_rates < 0).any():
+        raise ValueError("Interest rates must not be negative.")
+
+    total_periods = loan_terms * periods_per_year
+    if (total_periods < 1).any() or (np.mod(total_periods, 1) != 0).any():
+        raise ValueError("Every loan term must cover a whole, positive number of payment periods.")
+    total_periods = total_periods.astype(np.int64)
+
+    # Rates down the rows, terms across the columns
+    period_rates = (annual_interest_rates / 100 / periods_per_year)[:, None]
+    n_periods = total_periods[None, :]
+    payments = annuity.pmt_array(period_rates, n_periods, loan_amount)
+    calendar = get_payment_calendar(first_payment_date, payment_frequency, int(total_periods.max()))
+    payment_days = calendar.dates.astype("datetime64[D]")
+
+    result = {
+        "interest_rates": annual_interest_rates,
+        "loan_terms": loan_terms,
+        "payment": np.round(payments, 2),
+        "total_interest": np.round(payments * n_periods - loan_amount, 2),
+        "payoff_date": np.broadcast_to(payment_days[total_periods - 1], payments.shape),
+    }
+
+    if horizon_date is not None:
+        horizon = np.datetime64(pd.Timestamp(horizon_date).date(), "D")
+        payments_made = np.minimum(np.searchsorted(payment_days, horizon, side="right"), n_periods)
+        balances = annuity.balance_after_array(float(loan_amount), period_rates, payments, payments_made)
+        balances = np.where(payments_made >= n_periods, 0, np.maximum(balances, 0))
+        result["balance_at_horizon"] = np.round(balances, 2)
+
+    if schedule_cells:
+        result["schedules"] = {}
+        for rate, term in schedule_cells:
+            loan_term = int(term) if float(term).is_integer() else term
+            calculator = LoanCalculator(rate, interest_rate_cap, interest_rate_minimum)
+            result["schedules"][(rate, term)] = calculator.calculate_amortization(
+                type="By Loan Term", loan_amount=loan_amount, loan_term=loan_term,
+                first_payment_date=first_payment_date, loan_term_mode="fixed", payment_frequency=payment_frequency)
+
+    return result
+
+
+def expand_compact_schedule(compact, first_period=None, last_period=None):
+    """
+    Rows first_period to last_period (1-based, inclusive; the whole schedule by default) of a compact schedule
+    (see LoanCalculator.compact_schedule), exactly as calculate_amortization builds them.
+
+    The period loop resumes from the latest segment start at or before first_period, so only the rows from
+    there up to last_period are computed. Numeric columns get the full schedule's dtypes ('float_columns').
+    """
+    if compact.get("version") != COMPACT_SCHEDULE_VERSION:
+        raise ValueError(f"Unsupported compact schedule version: {compact.get('version')!r}.")
+
+    n_periods = compact["n_periods"]
+    first_period = 1 if first_period is None else max(int(first_period), 1)
+    last_period = n_periods if last_period is None else min(int(last_period), n_periods)
+
+    rate_path = None
+    if compact["rate_path"]:
+        rate_path = RatePath([(start, _unpack_number(rate)) for start, rate in compact["rate_path"]])
+    calculator = LoanCalculator(_unpack_number(compact["interest_rate"]))
+    calendar, walk_periods = calculator._prepare_walk(
+        compact["type"], _unpack_number(compact["loan_amount"]), compact["first_payment_date"],
+        loan_term=_unpack_number(compact.get("loan_term")),
+        repayment_amount=_unpack_number(compact.get("repayment_amount")), loan_term_mode=compact["loan_term_mode"],
+        payment_frequency=compact["payment_frequency"], interest_type=compact["interest_type"],
+        variable_interest_configuration=rate_path)
+
+    period_adjustments = None
+    if compact["adjustments"] is not None:
+        period_adjustments = [0] * calendar.n_periods
+        for period, amount in compact["adjustments"]:
+            period_adjustments[period - 1] = _unpack_number(amount)
+
+    engine_runs.inc(path="compact_expand")
+    schedule = _ScheduleColumns(max(last_period, first_period - 1), first_period)
+    schedule.float_columns[:] = [name in compact["float_columns"] for name in _ScheduleColumns.NUMERIC_COLUMNS]
+    if first_period <= last_period:
+        starts = [segment["start_period"] for segment in compact["segments"]]
+        segment = compact["segments"][bisect.bisect_right(starts, first_period) - 1]
+        walk = walk_periods(segment["start_period"], period_adjustments=period_adjustments,
+                            resume=tuple(_unpack_number(value) for value in segment["state"]),
+                            has_adjustments=compact["has_adjustments"])
+        for period, _, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, \
+                remaining_balance, original in walk:
+            if period > last_period:
+                break
+            if period >= first_period:
+                schedule.append(interest_rate, interest_due, principal_paid, payment_due, balance_adjustment,
+                                max(0, remaining_balance), original=original)
+        walk.close()
+    return schedule.to_frame(calendar)
+
+
+class _ScheduleColumns:
+    """
+    Preallocated column arrays the period loops write into, one row per period from first_period on.
+
+    Values are stored unrounded and rounded once in to_frame, the way the builtin round() treated each
+    value: NumPy floats round like np.round, Python floats are correctly rounded. Columns keep the dtype
+    the old list-of-dicts schedule was inferred with, i.e. integer when every value written was an integer
+    (a whole-number rate, no adjustments, a balance clamped to 0). Columns flagged in float_columns are
+    float whatever the rows written hold, so a schedule starting after period 1 or a chunk of one can be
+    typed like the full schedule.
+    """
+
+    NUMERIC_COLUMNS = ("Interest Rate", "Interest Due", "Principal Paid", "Payment Due", "Balance Adjustment",
+                       "Balance")
+
+    def __init__(self, capacity, first_period=1):
+        capacity = max(int(capacity) - first_period + 1, 0)
+        self.first_period = first_period
+        self.n_rows = 0
+        self.values = np.empty((len(self.NUMERIC_COLUMNS), capacity), dtype=np.float64)
+        self.kinds = np.empty((len(self.NUMERIC_COLUMNS), capacity), dtype=np.int8)
+        self.original = np.empty(capacity, dtype=bool)
+        # Columns known to hold a non-integer value outside the rows written
+        self.float_columns = np.zeros(len(self.NUMERIC_COLUMNS), dtype=bool)
+
+    def append(self, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, balance,
+               original=True):
+        row = self.n_rows
+        for column, value in enumerate((interest_rate, interest_due, principal_paid, payment_due,
+                                        balance_adjustment, balance)):
+            self.values[column, row] = value
+            self.kinds[column, row] = _value_kind(value)
+        self.original[row] = original
+        self.n_rows = row + 1
+
+    def rows(self):
+        """
+        (values, kinds, original) of the rows written so far, as views.
+        """
+        n = self.n_rows
+        return self.values[:, :n], self.kinds[:, :n], self.original[:n]
+
+    def prefill(self, rows, n_rows):
+        """
+        Start from the first n_rows of another schedule's rows().
+        """
+        values, kinds, original = rows
+        self.values[:, :n_rows] = values[:, :n_rows]
+        self.kinds[:, :n_rows] = kinds[:, :n_rows]
+        self.original[:n_rows] = original[:n_rows]
+        self.n_rows = n_rows
+
+    def to_frame(self, calendar):
+        n = self.n_rows
+        first_row = self.first_period - 1
+        columns = {
+            "No.": np.arange(self.first_period, self.first_period + n),
+            "Period": calendar.labels[first_row:first_row + n],
+            "Year": calendar.years[first_row:first_row + n]
+        }
+
+        for column, name in enumerate(self.NUMERIC_COLUMNS):
+            kinds = self.kinds[column, :n]
+            values = _round_column(self.values[column, :n], builtin=kinds == _PYTHON_FLOAT)
+            columns[name] = values if self.float_columns[column] or (kinds != _INTEGER).any() \
+                else values.astype(np.int64)
+
+        columns["Remark"] = np.where(self.original[:n], "original", "extension").astype(object)
+        return pd.DataFrame(columns)
+
+
+# Row of 'Balance Adjustment' in _ScheduleColumns' arrays
+_ADJUSTMENT_COLUMN = _ScheduleColumns.NUMERIC_COLUMNS.index("Balance Adjustment")
+
+
+def _checkpoint_key(type, annual_interest_rate, loan_amount, loan_term_or_repayment, calendar, loan_term_mode,
+                    interest_type, variable_interest_configuration, has_adjustments):
+    """
+    schedule_checkpoints key of a loan: every input of its period loop except the adjustments themselves.
+
+    Numbers are keyed with their type, since 5 and 5.0 round differently in the schedule. The calendar and
+    a variable configuration's compiled rate path are memoized, so their instances (compared by identity)
+    stand for their contents.
+    """
+    rate_path = compile_rate_path(variable_interest_configuration) if interest_type == "Variable" else None
+    values = (annual_interest_rate, loan_amount, loan_term_or_repayment)
+    return (type, tuple((value.__class__, value) for value in values), calendar, loan_term_mode, interest_type,
+            rate_path, has_adjustments)
+
+
+def _iter_schedule_rows(calendar, labels, steps, first_period, require_rows, float_columns):
+    """
+    Schedule rows as dicts from a period walker, skipping the closed-form jumps before first_period. Values of
+    float_columns (see _schedule_float_columns) are always floats.
+    """
+    n_rows = 0
+    for period, n_periods, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, \
+            balance, original in steps:
+        if n_periods != 1 or period < first_period:
+            continue
+        n_rows += 1
+        row = {
+            "No.": period,
+            "Period": labels[period - 1],
+            "Year": int(calendar.years[period - 1])
+        }
+        values = (interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, max(0, balance))
+        for name, value, is_float in zip(_ScheduleColumns.NUMERIC_COLUMNS, values, float_columns):
+            value = round(value, 2)
+            row[name] = float(value) if is_float and _value_kind(value) == _INTEGER else value
+        row["Remark"] = "original" if original else "extension"
+        yield row
+
+    if require_rows and n_rows == 0:
+        raise ValueError("Amortization schedule generation failed; the schedule is empty.")
+
+
+def _iter_schedule_chunks(calendar, steps, first_period, chunk_size, require_rows, float_columns):
+    """
+    Schedule DataFrames of up to chunk_size rows from a period walker, with float_columns (see
+    _schedule_float_columns) as float64 in every chunk.
+    """
+    n_rows = 0
+    schedule = _ScheduleColumns(first_period + chunk_size - 1, first_period)
+    schedule.float_columns[:] = float_columns
+    for period, n_periods, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, \
+            balance, original in steps:
+        if n_periods != 1 or period < first_period:
+            continue
+        schedule.append(interest_rate, interest_due, principal_paid, payment_due, balance_adjustment,
+                        max(0, balance), original=original)
+        if schedule.n_rows == chunk_size:
+            n_rows += chunk_size
+            yield schedule.to_frame(calendar)
+            schedule = _ScheduleColumns(period + chunk_size, period + 1)
+            schedule.float_columns[:] = float_columns
+
+    if schedule.n_rows:
+        n_rows += schedule.n_rows
+        yield schedule.to_frame(calendar)
+    if require_rows and n_rows == 0:
+        raise ValueError("Amortization schedule generation failed; the schedule is empty.")
+
+
+def _schedule_float_columns(steps, period_adjustments):
+    """
+    Whether each of _ScheduleColumns.NUMERIC_COLUMNS is a float column of a loan's full schedule, from a
+    period walker over all of it (steps) and the walker's period_adjustments. The walker may cover quiet
+    stretches in closed form.
+    """
+    float_columns = np.zeros(len(_ScheduleColumns.NUMERIC_COLUMNS), dtype=bool)
+    n_rows = 0
+    for period, n_periods, interest_rate, interest_due, principal_paid, payment_due, balance_adjustment, \
+            balance, _ in steps:
+        float_columns |= _step_non_integers(n_periods, interest_rate, interest_due, principal_paid, payment_due,
+                                            balance_adjustment, max(0, balance))
+        n_rows = period + n_periods - 1
+    float_columns[_ADJUSTMENT_COLUMN] |= _any_non_integer(period_adjustments, n_rows)
+    return float_columns
+
+
+def _step_non_integers(n_periods, *values):
+    """
+    Whether each numeric column value of a period walker step is a non-integer. A closed-form stretch
+    (n_periods > 1) stands for periods whose interest, principal and balance are floats, since the period
+    rate is, whatever type its totals come out as; its adjustment is always the integer 0, so the periods'
+    own adjustments are checked separately (see _any_non_integer).
+    """
+    non_integers = [_value_kind(value) != _INTEGER for value in values]
+    if n_periods > 1:
+        non_integers[1] = non_integers[2] = non_integers[5] = True
+    return non_integers
+
+
+def _any_non_integer(period_adjustments, n_periods):
+    """
+    Whether any of the first n_periods period adjustments is a non-integer (a period whose events cancel out
+    holds a float 0.0 but is covered as quiet). False without adjustments.
+    """
+    if period_adjustments is None:
+        return False
+    return any(_value_kind(value) != _INTEGER for value in period_adjustments[:n_periods])
+
+
+def _closed_form_grid(loan_amounts, period_rates, payments, total_periods, by_loan_term):
+    """
+    Fixed-rate schedules for several loans at once, as loans-by-periods arrays.
+
+    Loan i pays payments[i] every period for at most total_periods[i] periods, settling early when the
+    balance runs out the same way the period loop does; loan-term schedules always clear the balance in
+    their final period. Returns (lengths, grid) where grid holds 'Interest Due', 'Principal Paid',
+    'Payment Due' and 'Balance' arrays; cells past a loan's length are meaningless.
+    """
+    width = int(np.max(total_periods))
+    rows = np.arange(len(loan_amounts))
+    rate = period_rates[:, None]
+    by_loan_term = np.broadcast_to(by_loan_term, rows.shape)
+
+    # Opening balance of every period: B_k = P * (1 + r)^k - PMT * ((1 + r)^k - 1) / r
+    growth = np.power(1 + rate, np.arange(width, dtype=np.float64))
+    opening_balance = loan_amounts[:, None] * growth - payments[:, None] * (growth - 1) / rate
+
+    # Repayment-amount loans are usually whole amounts that land exactly on half cents, so their balances
+    # are stepped period by period (across all loans at once) to round exactly like the loop does
+    stepped = np.flatnonzero(~by_loan_term)
+    if len(stepped):
+        stepped_rates = period_rates[stepped]
+        stepped_payments = payments[stepped]
+        balance = loan_amounts[stepped]
+        for k in range(1, width):
+            balance = balance - (stepped_payments - balance * stepped_rates)
+            opening_balance[stepped, k] = balance
+
+    interest_due = opening_balance * rate
+    payment_due = np.repeat(payments[:, None].astype(np.float64), width, axis=1)
+    principal_paid = payment_due - interest_due
+    balance = opening_balance - principal_paid
+
+    # A loan ends on the first period that would take its balance to zero or below
+    settles = (balance <= 0) & (np.arange(width) < total_periods[:, None])
+    settles[rows, total_periods - 1] |= by_loan_term
+    lengths = np.where(settles.any(axis=1), settles.argmax(axis=1) + 1, total_periods)
+
+    # The final period settles whatever balance is left
+    last = lengths - 1
+    settled = settles[rows, last]
+    principal_paid[rows, last] = np.where(settled, opening_balance[rows, last], principal_paid[rows, last])
+    payment_due[rows, last] = np.where(settled, principal_paid[rows, last] + interest_due[rows, last],
+                                       payment_due[rows, last])
+    balance[rows, last] = np.where(settled, 0, balance[rows, last])
+
+    return lengths, {"Interest Due": interest_due, "Principal Paid": principal_paid,
+                     "Payment Due": payment_due, "Balance": balance}
+
+
+def _grid_schedule_columns(lengths, dates, rate_labels, grid, by_loan_term):
+    """
+    Flatten loans-by-periods arrays into schedule columns, keeping each loan's first lengths[i] periods.
+
+    rate_labels holds the already rounded 'Interest Rate' value of every loan. Rounding follows the period
+    loop: loan-term values are NumPy floats from the first annuity.pmt on (only the first period's interest is a
+    Python float), while repayment-amount loans stay in Python floats throughout.
+    """
+    in_schedule = np.arange(dates.shape[1]) < lengths[:, None]
+    n_rows = int(lengths.sum())
+    period_dates = dates[in_schedule]
+
+    builtin = np.broadcast_to(~np.broadcast_to(by_loan_term, lengths.shape)[:, None], dates.shape)[in_schedule]
+    first_period = np.zeros(dates.shape, dtype=bool)
+    first_period[:, 0] = True
+    interest_builtin = builtin | first_period[in_schedule]
+
+    return {
+        "No.": np.broadcast_to(np.arange(1, dates.shape[1] + 1), dates.shape)[in_schedule],
+        "Period": np.datetime_as_string(period_dates, unit="D").astype(object),
+        "Year": period_dates.astype("datetime64[Y]").astype(np.int64) + 1970,
+        "Interest Rate": np.repeat(rate_labels, lengths),
+        "Interest Due": _round_column(grid["Interest Due"][in_schedule], builtin=interest_builtin),
+        "Principal Paid": _round_column(grid["Principal Paid"][in_schedule], builtin=builtin),
+        "Payment Due": _round_column(grid["Payment Due"][in_schedule], builtin=builtin),
+        "Balance Adjustment": np.zeros(n_rows, dtype=np.int64),
+        "Balance": _round_column(np.maximum(0, grid["Balance"][in_schedule]), builtin=builtin),
+        "Remark": np.full(n_rows, "original", dtype=object)
+    }
+
+
+def _rate_stages(variable_interest_configuration, annual_interest_rates, periods_per_year):
+    """
+    (first period index, period rates) of every rate stage the period loop goes through, in order.
+
+    Follows the compiled rate path the period loop uses (see rate_path.compile_rate_path).
+    """
+    rates = annual_interest_rates / 100 / periods_per_year
+    if not variable_interest_configuration:
+        return [(0, rates)]
+
+    rate_path = compile_rate_path(variable_interest_configuration)
+    stages = []
+    for index, (start, rate) in enumerate(rate_path.segments):
+        # An empty first stage is never charged
+        if index == 0 and rate_path.next_change(0) == start:
+            continue
+        annual_rates = annual_interest_rates if rate is None else np.full(np.shape(annual_interest_rates), rate,
+                                                                          dtype=np.float64)
+        stages.append((start - 1, annual_rates / 100 / periods_per_year))
+    return stages
+
+
+def _pays_off(loan_amounts, base_rates, stages, repayments):
+    """
+    Whether each repayment exceeds the interest due at the start of every rate stage (and at the base rate).
+    """
+    pays_off = repayments > loan_amounts * base_rates
+    balances = loan_amounts
+    previous_start, previous_rates = stages[0]
+    for start, rates in stages:
+        balances = annuity.balance_after_array(balances, previous_rates, repayments, start - previous_start)
+        pays_off &= (balances <= 0) | (repayments > balances * rates)
+        previous_start, previous_rates = start, rates
+    return pays_off
+
+
+def _first_sliced_period(calendar, sliced_date):
+    """
+    First period (1-based) paid on or after sliced_date; 1 when there is no slice.
+    """
+    if sliced_date is None:
+        return 1
+    return calendar.first_period_on_or_after(sliced_date) + 1
+
+
+def _adjustment_periods(period_adjustments):
+    """
+    Sorted 1-based periods that carry a non-zero balance adjustment.
+    """
+    return np.flatnonzero(np.asarray(period_adjustments, dtype=np.float64) != 0) + 1
+
+
+def _quiet_periods(period, end_period, adjustment_periods, next_rate_change):
+    """
+    Number of periods from period up to (not including) end_period with no balance adjustment and
+    no variable rate stage change (next_rate_change is the period the next stage starts, None for none),
+    i.e. periods over which the loan evolves as a plain annuity.
+    """
+    end = end_period
+    if adjustment_periods is not None:
+        next_adjustment = np.searchsorted(adjustment_periods, period)
+        if next_adjustment < len(adjustment_periods):
+            end = min(end, int(adjustment_periods[next_adjustment]))
+    if next_rate_change is not None:
+        end = min(end, next_rate_change)
+    return max(end - period, 0)
+
+
+def _periods_before_payoff(balance, period_interest_rate, payment):
+    """
+    Number of level payments that can safely be skipped in closed form before the one that pays the
+    balance off (effectively unlimited when the payment never clears the balance).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        periods = annuity.nper(period_interest_rate, payment, balance)
+    if not np.isfinite(periods):
+        return sys.maxsize
+    return max(int(periods) - 1, 0)
+
+
+def _remaining_periods(balance, period_interest_rate, payment):
+    """
+    Whole payments needed to clear balance, or None when the payment never clears it.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        periods = annuity.nper(period_interest_rate, payment, balance)
+    if not np.isfinite(periods) or periods < 0:
+        return None
+    # Round off float noise first so an exact number of payments is not counted one too many
+    return int(math.ceil(round(float(periods), 6)))
+
+
+def _none_if_empty(adjustments):
+    """
+    None for an empty list, tuple or DataFrame of adjustments, the value itself otherwise.
+    """
+    if isinstance(adjustments, (list, tuple, pd.DataFrame)) and len(adjustments) == 0:
+        return None
+    return adjustments
+
+
+def _bucket_adjustments(adjustment_df, calendar):
+    """
+    Total balance adjustment of every payment period of calendar, as a list indexed by period - 1.
+
+    adjustment_df must already be sorted by 'Event Date' (see process_adjustments). Each period collects
+    the events between its calendar window start and its payment date; the event range is found with
+    searchsorted on the sorted dates and summed with a single reduceat.
+    """
+    amounts = adjustment_df['Adjustment Amount'].to_numpy()
+    if amounts.dtype.kind not in "iu":
+        # NaN amounts count as zero, like Series.sum() does
+        amounts = np.nan_to_num(amounts.astype(np.float64), nan=0.0)
+
+    event_dates = adjustment_df['Event Date'].to_numpy(dtype="datetime64[s]")
+    valid = ~np.isnat(event_dates)
+    event_dates, amounts = event_dates[valid], amounts[valid]
+
+    first_event = np.searchsorted(event_dates, calendar.window_starts,
+                                  side="left" if calendar.window_includes_start else "right")
+    end_event = np.searchsorted(event_dates, calendar.dates, side="right")
+
+    # Periods without events add an integer 0, as the loop's empty-selection case did
+    period_adjustments = [0] * calendar.n_periods
+    has_events = np.flatnonzero(first_event < end_event)
+    if len(has_events):
+        # reduceat sums amounts[first:end] for every (first, end) pair; the trailing zero keeps end in range
+        bounds = np.column_stack([first_event[has_events], end_event[has_events]]).ravel()
+        sums = np.add.reduceat(np.append(amounts, amounts.dtype.type(0)), bounds)[::2]
+        for period_index, amount in zip(has_events.tolist(), sums.tolist()):
+            period_adjustments[period_index] = amount
+    return period_adjustments
+
+
+def _bucket_adjustment_rules(adjustment_rules, calendar):
+    """
+    Total amount the periodical rules add in every payment period of calendar, as an array indexed by
+    period - 1 (integer when every rule amount is an integer).
+
+    A rule's occurrences are never listed one by one: weekly and fortnightly rules step a fixed number of
+    days, so the occurrences up to a date follow from integer division; monthly occurrences (one per month,
+    the day clipped to the month's end and kept clipped, like repeatedly adding pd.DateOffset(months=1))
+    are generated as one array. Each period counts the occurrences in its adjustment window.
+    """
+    amounts = adjustment_rules['Amount'].to_numpy()
+    integer_amounts = amounts.dtype.kind in "iu"
+    totals = np.zeros(calendar.n_periods, dtype=np.int64 if integer_amounts else np.float64)
+
+    window_ends = calendar.dates.astype(np.int64)
+    window_starts = calendar.window_starts.astype(np.int64)
+    for amount, start, end, period in zip(amounts.tolist(), adjustment_rules['From'], adjustment_rules['Until'],
+                                          adjustment_rules['Period']):
+        if pd.isna(amount) or pd.isna(start) or pd.isna(end) or end < start:
+            continue
+
+        if period == "monthly":
+            occurrences = _monthly_occurrences(start, end).astype(np.int64)
+            counts = np.searchsorted(occurrences, window_ends, side="right") - \
+                np.searchsorted(occurrences, window_starts, side="left" if calendar.window_includes_start else "right")
+        else:
+            # Whole seconds, like the calendar's dates
+            step = int((pd.Timedelta(weeks=1) if period == "weekly" else pd.Timedelta(weeks=2)).total_seconds())
+            first = _epoch_seconds(start)
+            last_index = (_epoch_seconds(end) - first) // step
+
+            # Occurrences on or before the payment date, minus those before the window (or on its start)
+            counts = np.clip((window_ends - first) // step + 1, 0, last_index + 1)
+            if calendar.window_includes_start:
+                counts -= np.clip(-((first - window_starts) // step), 0, last_index + 1)
+            else:
+                counts -= np.clip((window_starts - first) // step + 1, 0, last_index + 1)
+
+        totals += counts * amount
+    return totals
+
+
+def _monthly_occurrences(start, end):
+    """
+    Dates from start to end one month apart, as datetime64[s]; a day clipped to a short month stays clipped.
+    """
+    start = pd.Timestamp(start)
+    n_months = (end.year - start.year) * 12 + end.month - start.month + 1
+    months = start.to_datetime64().astype("datetime64[M]") + np.arange(n_months)
+    days_in_month = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+    days = np.minimum.accumulate(np.minimum(days_in_month, start.day))
+    occurrences = months.astype("datetime64[D]") + (days - 1) + (start - start.normalize()).to_timedelta64()
+    occurrences = occurrences.astype("datetime64[s]")
+    return occurrences[occurrences <= end.to_datetime64().astype("datetime64[s]")]
+
+
+def _epoch_seconds(timestamp):
+    """
+    Whole seconds since the epoch of a Timestamp, whatever its resolution (Timestamp.value is in nanoseconds
+    and overflows past 2262).
+    """
+    return int(pd.Timestamp(timestamp).to_datetime64().astype("datetime64[s]").astype(np.int64))
+
+
+_INTEGER, _PYTHON_FLOAT, _NUMPY_FLOAT = 0, 1, 2
+
+
+def _pack_number(value):
+    """
+    JSON-ready form of a number that keeps its type: ints, floats and None as they are, NumPy scalars as
+    [dtype name, value].
+    """
+    if isinstance(value, np.generic):
+        return [value.dtype.name, value.item()]
+    return value
+
+
+def _unpack_number(value):
+    """
+    Number packed by _pack_number.
+    """
+    if isinstance(value, list):
+        return np.dtype(value[0]).type(value[1])
+    return value
+
+
+def _value_kind(value):
+    if type(value) is float:
+        return _PYTHON_FLOAT
+    if isinstance(value, np.floating):
+        return _NUMPY_FLOAT
+    return _INTEGER
+
+
+def _round_column(values, ndigits=2, builtin=True):
+    """
+    Vectorized equivalent of calling round(value, ndigits) on every element.
+
+    round() on a NumPy float is np.round, which scales by 10**ndigits first; on a Python float it is
+    correctly rounded. The two only disagree on values sitting on a half, so elements flagged in builtin
+    (bool or bool array) that are near a half are redone with round() on a Python float.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    near_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    near_half &= builtin
+    if near_half.any():
+        index = np.flatnonzero(near_half)
+        rounded[index] = [round(value, ndigits) for value in values[index].tolist()]
+    return rounded
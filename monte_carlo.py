@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+
+import annuity
+
+# Percentiles reported by summarize_paths
+SUMMARY_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def mean_reverting_rate_paths(initial_rate, n_paths, n_periods, periods_per_year, long_term_rate=None,
+                              reversion_speed=0.25, volatility=1.0, reset_periods=1, rate_cap=12, rate_minimum=4,
+                              seed=None):
+    """
+    Simulated annual rates (%) of n_paths paths over n_periods payment periods, as a paths-by-periods array.
+
+    Rates follow a discretized Ornstein-Uhlenbeck process that pulls them back towards long_term_rate
+    (initial_rate by default) at reversion_speed per year, with shocks of volatility percentage points per
+    square-root year. The rate resets every reset_periods periods and is held in [rate_minimum, rate_cap] at
+    every reset, including the first.
+    """
+    if n_paths < 1 or n_periods < 1:
+        raise ValueError("Number of paths and periods must be positive.")
+    if reset_periods < 1:
+        raise ValueError("Rate reset interval must be at least one period.")
+    if rate_minimum > rate_cap:
+        raise ValueError("Interest rate minimum must not exceed the interest rate cap.")
+
+    long_term_rate = initial_rate if long_term_rate is None else long_term_rate
+    rng = np.random.default_rng(seed)
+    n_resets = math.ceil(n_periods / reset_periods)
+    step_years = reset_periods / periods_per_year
+
+    reset_rates = np.empty((n_paths, n_resets), dtype=np.float64)
+    reset_rates[:, 0] = np.clip(initial_rate, rate_minimum, rate_cap)
+    for reset in range(1, n_resets):
+        previous = reset_rates[:, reset - 1]
+        shocks = rng.standard_normal(n_paths)
+        reset_rates[:, reset] = np.clip(previous + reversion_speed * (long_term_rate - previous) * step_years
+                                        + volatility * math.sqrt(step_years) * shocks, rate_minimum, rate_cap)
+
+    if reset_periods == 1:
+        return reset_rates
+    return np.repeat(reset_rates, reset_periods, axis=1)[:, :n_periods]
+
+
+def amortize_rate_paths(loan_amount, rate_paths, periods_per_year, loan_term_periods=None, repayment_amount=None):
+    """
+    Amortize one loan along every rate path at once, stepping all paths through a period per iteration.
+
+    rate_paths holds annual rates (%) as paths-by-periods. With loan_term_periods, every period's payment is
+    re-amortized over the periods left in the term at that period's rate, as 'By Loan Term' does. With
+    repayment_amount the payment stays level, as 'By Repayment Amount' does, and a path only pays off if
+    its balance runs out within the simulated periods. The final payment settles the remaining balance.
+
+    Returns per-path arrays: 'total_interest', 'peak_payment', 'payoff_period' (1-based, 0 when the loan is
+    not paid off within the simulated periods) and 'final_balance'.
+    """
+    if (loan_term_periods is None) == (repayment_amount is None):
+        raise ValueError("Provide exactly one of loan_term_periods and repayment_amount.")
+
+    n_paths, width = rate_paths.shape
+    if loan_term_periods is not None:
+        if loan_term_periods < 1 or loan_term_periods > width:
+            raise ValueError("Loan term must cover between one period and the length of the rate paths.")
+        width = int(loan_term_periods)
+
+    balance = np.full(n_paths, float(loan_amount))
+    total_interest = np.zeros(n_paths)
+    peak_payment = np.zeros(n_paths)
+    payoff_period = np.zeros(n_paths, dtype=np.int64)
+    active = np.ones(n_paths, dtype=bool)
+
+    for period in range(width):
+        rate = rate_paths[:, period] / 100 / periods_per_year
+        interest = balance * rate
+
+        if loan_term_periods is not None:
+            payment = annuity.pmt_array(rate, width - period, balance)
+        else:
+            payment = np.full(n_paths, float(repayment_amount))
+
+        # A path settles on the period that would take its balance to zero or below, or at the end of its term
+        principal = payment - interest
+        settles = active & (balance - principal <= 0)
+        if loan_term_periods is not None and period == width - 1:
+            settles = active.copy()
+        payment = np.where(settles, balance + interest, payment)
+
+        total_interest += np.where(active, interest, 0)
+        np.maximum(peak_payment, np.where(active, payment, 0), out=peak_payment)
+        balance = np.where(settles, 0, np.where(active, balance - principal, balance))
+        payoff_period[settles] = period + 1
+        active &= ~settles
+        if not active.any():
+            break
+
+    return {"total_interest": total_interest, "peak_payment": peak_payment, "payoff_period": payoff_period,
+            "final_balance": balance}
+
+
+def summarize_paths(values, percentiles=SUMMARY_PERCENTILES):
+    """
+    Mean, standard deviation, minimum, maximum and percentiles of per-path values, as a dict.
+    """
+    summary = {"mean": float(np.mean(values)), "std": float(np.std(values)), "min": float(np.min(values)),
+               "max": float(np.max(values))}
+    for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{percentile:g}"] = float(value)
+    return summary
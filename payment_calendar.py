@@ -0,0 +1,120 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = {"monthly": 12, "weekly": 52, "fortnightly": 26}
+
+# Number of distinct (first payment date, frequency, length) calendars kept in memory
+CALENDAR_CACHE_SIZE = 128
+
+
+class PaymentCalendar:
+    """
+    Payment dates of one schedule, generated in a single vectorized pass.
+
+    dates: datetime64[s] payment date of periods 1..n_periods (seconds rather than nanoseconds, whose range
+    ends in 2262, so schedules of any length get real dates)
+    labels: the same dates as 'YYYY-MM-DD' strings (the schedule's 'Period' column)
+    years: calendar year of every payment date
+    window_starts: start of every period's adjustment window. Monthly windows include their start
+    (the day after the same date one month earlier); weekly and fortnightly windows exclude it
+    (payment date minus the period length), see window_includes_start.
+
+    Instances are shared through get_payment_calendar, so the arrays are read-only.
+    """
+
+    def __init__(self, first_payment_date, payment_frequency, n_periods):
+        if payment_frequency not in PERIODS_PER_YEAR:
+            raise ValueError(f"Invalid payment frequency. Choose from {list(PERIODS_PER_YEAR.keys())}.")
+
+        self.first_payment_date = pd.Timestamp(first_payment_date)
+        self.payment_frequency = payment_frequency
+        self.n_periods = max(int(n_periods), 0)
+
+        self.dates = payment_date_grid(np.array([self.first_payment_date.to_datetime64()]),
+                                       [payment_frequency], self.n_periods)[0]
+        self.labels = np.datetime_as_string(self.dates, unit="D").astype(object)
+        self.years = self.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+
+        self.window_includes_start = payment_frequency == "monthly"
+        if self.window_includes_start:
+            self.window_starts = add_months(self.dates, -1) + np.timedelta64(1, "D")
+        else:
+            self.window_starts = self.dates - np.timedelta64(365 // PERIODS_PER_YEAR[payment_frequency], "D")
+
+        for array in (self.dates, self.labels, self.years, self.window_starts):
+            array.setflags(write=False)
+        self._formatted = {"%Y-%m-%d": self.labels}
+
+    def format_dates(self, date_format):
+        """
+        Payment dates rendered with a strftime format, memoized per format.
+        """
+        if date_format not in self._formatted:
+            formatted = pd.DatetimeIndex(self.dates).strftime(date_format).to_numpy(dtype=object)
+            formatted.setflags(write=False)
+            self._formatted[date_format] = formatted
+        return self._formatted[date_format]
+
+    def first_period_on_or_after(self, date):
+        """
+        Index of the first period whose payment day falls on or after date (n_periods if none does).
+        """
+        days = self.dates.astype("datetime64[D]").astype("datetime64[s]")
+        return int(np.searchsorted(days, pd.Timestamp(date).to_datetime64().astype("datetime64[s]"), side="left"))
+
+
+def get_payment_calendar(first_payment_date, payment_frequency, n_periods):
+    """
+    Memoized PaymentCalendar keyed by (first_payment_date, payment_frequency, n_periods).
+    """
+    return _cached_payment_calendar(pd.Timestamp(first_payment_date), payment_frequency, max(int(n_periods), 0))
+
+
+@lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def _cached_payment_calendar(first_payment_date, payment_frequency, n_periods):
+    return PaymentCalendar(first_payment_date, payment_frequency, n_periods)
+
+
+get_payment_calendar.cache_info = _cached_payment_calendar.cache_info
+get_payment_calendar.cache_clear = _cached_payment_calendar.cache_clear
+
+
+def payment_date_grid(first_payment_dates, payment_frequencies, n_periods):
+    """
+    Payment dates for periods 1..n_periods of several loans, as a loans-by-periods datetime64[s] array.
+
+    Monthly dates follow pd.DateOffset(months=k) (day clipped to month end), weekly and fortnightly
+    dates step by 365 // periods_per_year days, same as the period loop.
+    """
+    first_payment_dates = np.asarray(first_payment_dates, dtype="datetime64[s]")
+    payment_frequencies = np.asarray(payment_frequencies, dtype=object)
+    k = np.arange(n_periods)
+    dates = np.empty((len(first_payment_dates), n_periods), dtype="datetime64[s]")
+
+    monthly = payment_frequencies == "monthly"
+    if monthly.any():
+        dates[monthly] = add_months(first_payment_dates[monthly, None], k)
+
+    if (~monthly).any():
+        step_days = np.array([365 // PERIODS_PER_YEAR[frequency] for frequency in payment_frequencies[~monthly]])
+        dates[~monthly] = first_payment_dates[~monthly, None] + (step_days[:, None] * k).astype("timedelta64[D]")
+
+    return dates
+
+
+def add_months(dates, months):
+    """
+    Vectorized pd.DateOffset(months=...): shift datetime64 dates by whole months, clipping the day to
+    the end of the target month and keeping the time of day. dates and months broadcast together.
+    """
+    day = dates.astype("datetime64[D]")
+    month = dates.astype("datetime64[M]")
+    day_of_month = (day - month.astype("datetime64[D]")).astype(np.int64) + 1
+
+    target_month = month + months
+    target_month_start = target_month.astype("datetime64[D]")
+    days_in_month = ((target_month + 1).astype("datetime64[D]") - target_month_start).astype(np.int64)
+    target_day = target_month_start + (np.minimum(day_of_month, days_in_month) - 1)
+    return target_day.astype(dates.dtype) + (dates - day)
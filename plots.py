@@ -0,0 +1,57 @@
+import plotly.graph_objects as go
+
+
+def amortization_plot(schedule_df):
+    # Create stacked bar chart using Plotly
+    fig = go.Figure()
+
+    # Add interest due stacked above principal paid
+    fig.add_trace(go.Bar(
+        x=schedule_df["Period"],
+        y=schedule_df["Interest Due"],
+        name="Interest Due",
+        marker_color="#7201a8"
+    ))
+
+    # Add principal paid as the base bar
+    fig.add_trace(go.Bar(
+        x=schedule_df["Period"],
+        y=schedule_df["Principal Paid"],
+        name="Principal Paid",
+        marker_color="#ed7953"
+    ))
+
+    # Update layout
+    fig.update_layout(
+        title="Amortization Schedule",
+        xaxis_title="Periods",
+        yaxis_title="Amount ($)",
+        barmode="stack",
+        legend=dict(title="Components"),
+        xaxis=dict(tickformat="%b-%Y")
+    )
+
+    return fig
+
+
+def loan_balance_plot(schedule_df):
+    # Create bar chart using Plotly
+    fig = go.Figure()
+
+    # Add loan balance bar
+    fig.add_trace(go.Bar(
+        x=schedule_df["Period"],
+        y=schedule_df["Balance"],
+        name="Loan Balance",
+        marker_color="#636efa"
+    ))
+
+    # Update layout
+    fig.update_layout(
+        title="Loan Balance Over Time",
+        xaxis_title="Periods",
+        yaxis_title="Amount ($)",
+        xaxis=dict(tickformat="%b-%Y")
+    )
+
+    return fig
@@ -0,0 +1,167 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from metrics import engine_runs
+
+# Results whose column arrays exceed this many bytes come back through shared memory instead of the result pipe
+SHARED_MEMORY_THRESHOLD = 1 << 20
+
+# Portfolio tasks per worker, so uneven loans still balance across the pool
+TASKS_PER_WORKER = 4
+
+# Column arrays in a shared memory block start on this byte boundary
+_ALIGNMENT = 64
+
+
+class SchedulePool:
+    """
+    Process pool that LoanCalculator work is dispatched to, so CPU-bound schedules run outside the caller's
+    thread and batch runs use every core.
+
+    max_workers: worker processes (defaults to os.cpu_count())
+    chunk_size: loans per portfolio task (defaults to spreading the loans over TASKS_PER_WORKER tasks per worker)
+    shared_memory_threshold: results whose column arrays are larger than this many bytes are written to a
+    shared memory block the caller copies out of, smaller ones are pickled as arrays
+    start_method: multiprocessing start method ('fork', 'spawn', 'forkserver'; None for the platform default)
+
+    Workers return compact column arrays rather than pickled DataFrames: numeric columns as they are, text
+    columns as integer codes into their distinct values. Counters the model records in metrics stay in the
+    worker processes; the pool counts its own dispatches as the 'process_pool' engine path.
+    """
+
+    def __init__(self, max_workers=None, chunk_size=None, shared_memory_threshold=SHARED_MEMORY_THRESHOLD,
+                 start_method=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.shared_memory_threshold = shared_memory_threshold
+
+        # Workers register the blocks they create with the resource tracker and the caller unregisters them on
+        # unlink, so both sides must talk to the same tracker process
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=get_context(start_method) if start_method else None)
+
+    def calculate_amortization(self, calculator, type, **kwargs):
+        """
+        calculator.calculate_amortization(type, **kwargs) computed in a worker process.
+        """
+        engine_runs.inc(path="process_pool")
+        future = self._executor.submit(_schedule_task, calculator, type, kwargs, self.shared_memory_threshold)
+        return _unpack_frame(future.result())
+
+    def calculate_portfolio(self, calculator, loans_df):
+        """
+        calculator.calculate_portfolio(loans_df) with the loans split into chunks computed in parallel.
+
+        Chunks keep their row index, so loans without a 'loan_id' are labelled the same as in a single
+        calculate_portfolio call, and the result is ordered by loan then period.
+        """
+        n_loans = len(loans_df)
+        if n_loans == 0:
+            raise ValueError("Loan portfolio is empty.")
+
+        chunk_size = self.chunk_size or math.ceil(n_loans / (self.max_workers * TASKS_PER_WORKER))
+        futures = []
+        for start in range(0, n_loans, chunk_size):
+            engine_runs.inc(path="process_pool")
+            futures.append(self._executor.submit(_portfolio_task, calculator, loans_df.iloc[start:start + chunk_size],
+                                                 self.shared_memory_threshold))
+
+        # Collect every result, even after a failure, so no shared memory block is left behind
+        frames = []
+        error = None
+        for future in futures:
+            try:
+                frames.append(_unpack_frame(future.result()))
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def _schedule_task(calculator, type, kwargs, shared_memory_threshold):
+    return _pack_frame(calculator.calculate_amortization(type=type, **kwargs), shared_memory_threshold)
+
+
+def _portfolio_task(calculator, loans_df, shared_memory_threshold):
+    return _pack_frame(calculator.calculate_portfolio(loans_df), shared_memory_threshold)
+
+
+def _pack_frame(df, shared_memory_threshold):
+    """
+    Column arrays of df ready to send back to the caller.
+
+    Returns (n_rows, columns, block name): columns are (name, encoding, array or (dtype, length, offset),
+    categories) tuples. 'array' columns are the column's values; 'codes' columns hold integer codes into
+    categories, used for text columns; 'objects' columns are any other object column, pickled as is.
+    When the arrays add up to more than shared_memory_threshold bytes, they are copied into one shared memory
+    block and referenced by (dtype, length, offset).
+    """
+    columns = []
+    for name, series in df.items():
+        values = series.to_numpy()
+        if values.dtype != object:
+            columns.append([name, "array", values, None])
+        elif pd.api.types.infer_dtype(values, skipna=False) == "string":
+            categories, codes = np.unique(values.astype(str), return_inverse=True)
+            columns.append([name, "codes", codes.astype(np.int32), categories.astype(object)])
+        else:
+            columns.append([name, "objects", values, None])
+
+    arrays = [column for column in columns if column[1] != "objects"]
+    total_bytes = sum(_aligned(column[2].nbytes) for column in arrays)
+    if total_bytes <= shared_memory_threshold:
+        return len(df), columns, None
+
+    block = SharedMemory(create=True, size=total_bytes)
+    try:
+        offset = 0
+        for column in arrays:
+            values = column[2]
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf, offset=offset)[:] = values
+            column[2] = (values.dtype.str, len(values), offset)
+            offset += _aligned(values.nbytes)
+    finally:
+        block.close()
+    return len(df), columns, block.name
+
+
+def _unpack_frame(packed):
+    """
+    DataFrame from _pack_frame's result, releasing its shared memory block.
+    """
+    n_rows, columns, block_name = packed
+    block = SharedMemory(name=block_name) if block_name is not None else None
+    try:
+        frame = {}
+        for name, encoding, values, categories in columns:
+            if block is not None and encoding != "objects":
+                dtype, length, offset = values
+                values = np.ndarray(length, dtype=np.dtype(dtype), buffer=block.buf, offset=offset).copy()
+            frame[name] = categories[values] if encoding == "codes" else values
+        return pd.DataFrame(frame, index=pd.RangeIndex(n_rows))
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+
+def _aligned(n_bytes):
+    return -(-n_bytes // _ALIGNMENT) * _ALIGNMENT
@@ -0,0 +1,120 @@
+import bisect
+import math
+import numbers
+from functools import lru_cache
+
+RATE_COLUMN = "Interest Rate"
+LENGTH_COLUMN = "Length Period before next Adjustment"
+
+# Number of distinct rate tables kept compiled in memory
+RATE_PATH_CACHE_SIZE = 256
+
+
+class RatePath:
+    """
+    Variable interest configuration compiled into rate segments.
+
+    segments: (start_period, annual_rate) per rate stage, in order; a stage runs from its 1-based
+    start_period up to the next stage's start and the last stage runs indefinitely. A rate of None stands
+    for the loan's own annual rate. Only the first stage can be empty (start equal to the next stage's),
+    in which case its rate is still the one a loan starts from.
+
+    Rates keep the values given in the table (int or float), so schedules round them the same way.
+    Instances are immutable and shared between loans with the same rate table.
+    """
+
+    def __init__(self, segments):
+        if not segments:
+            raise ValueError("A rate path needs at least one rate stage.")
+        self.segments = tuple(segments)
+        self.starts = tuple(start for start, _ in self.segments)
+        # Periods on which the rate stage changes (the first stage's start is not a change)
+        self.change_periods = self.starts[1:]
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __repr__(self):
+        return f"RatePath({list(self.segments)!r})"
+
+    def initial_rate(self, base_rate):
+        """
+        Rate of the first stage, even when that stage is empty.
+        """
+        rate = self.segments[0][1]
+        return base_rate if rate is None else rate
+
+    def rate_at(self, period, base_rate):
+        """
+        Annual rate charged in period (1-based).
+        """
+        rate = self.segments[bisect.bisect_right(self.starts, period) - 1][1]
+        return base_rate if rate is None else rate
+
+    def next_change(self, period):
+        """
+        First period after period that starts a new rate stage, or None when the rate stays put
+        (next_change(0) is the first change, which is period 1 when the first stage is empty).
+        """
+        index = bisect.bisect_right(self.change_periods, period)
+        return self.change_periods[index] if index < len(self.change_periods) else None
+
+
+def compile_rate_path(variable_interest_configuration):
+    """
+    Validate a variable interest configuration and compile it into a RatePath, memoized per table.
+
+    The configuration maps 'Interest Rate' and 'Length Period before next Adjustment' to dicts keyed by
+    stage number, as ints (pandas' DataFrame.to_dict) or strings (after a JSON round trip). Stage 0 lasts
+    its length in periods, later stages at least one period; a missing rate keeps the previous stage's
+    (the loan's own rate for stage 0) and a missing length makes the stage the last. A RatePath is
+    returned as is.
+    """
+    if isinstance(variable_interest_configuration, RatePath):
+        return variable_interest_configuration
+
+    try:
+        rates = _stage_values(variable_interest_configuration[RATE_COLUMN], RATE_COLUMN)
+        lengths = _stage_values(variable_interest_configuration[LENGTH_COLUMN], LENGTH_COLUMN)
+    except (KeyError, TypeError):
+        raise ValueError(f"Variable interest configuration must map '{RATE_COLUMN}' and '{LENGTH_COLUMN}' "
+                         "to stage-numbered values.")
+    return _compiled_rate_path(rates, lengths)
+
+
+@lru_cache(maxsize=RATE_PATH_CACHE_SIZE)
+def _compiled_rate_path(rates, lengths):
+    rates = {stage: value for stage, _, value in rates}
+    lengths = {stage: value for stage, _, value in lengths}
+
+    segments = []
+    stage = 0
+    start = 1
+    rate = rates.get(0)
+    while True:
+        segments.append((start, rate))
+        length = lengths.get(stage, math.inf)
+        if length == math.inf:
+            return RatePath(segments)
+        start += max(math.ceil(length) if length > 0 else 0, 0 if stage == 0 else 1)
+        stage += 1
+        rate = rates.get(stage, rate)
+
+
+def _stage_values(values, column):
+    """
+    Hashable ((stage, type, value), ...) of one configuration column, with stage keys as ints. The type keeps
+    5 and 5.0 apart in the compile cache, since they round differently in a schedule.
+    """
+    stage_values = []
+    for key, value in values.items():
+        try:
+            stage = int(key)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid stage number in '{column}': {key!r}.")
+        if stage < 0:
+            raise ValueError(f"Invalid stage number in '{column}': {key!r}.")
+        if isinstance(value, bool) or not isinstance(value, numbers.Real) or math.isnan(value):
+            raise ValueError(f"'{column}' of stage {stage} must be a number, got {value!r}.")
+        stage_values.append((stage, type(value), value))
+    return tuple(sorted(stage_values, key=lambda stage_value: stage_value[0]))
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Payload fields that do not change the result for a given calculation type or interest type
+_UNUSED_FIELDS = {
+    "By Loan Term": ("repayment_amount",),
+    "By Repayment Amount": ("loan_term",),
+}
+
+
+class ScheduleCache:
+    """
+    Bounded, thread-safe LRU cache of serialized schedule responses.
+
+    max_size: maximum number of entries kept (0 disables the cache)
+    ttl_seconds: lifetime of an entry; expired entries are dropped on access (None keeps them until evicted)
+    """
+
+    def __init__(self, max_size=256, ttl_seconds=600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Cached value for key, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def request_cache_key(data):
+    """
+    Canonical hash of a /calculate_amortization_schedule payload.
+
+    Dates are normalized to ISO format, adjustments are sorted by date and amount, and fields the requested
+    calculation ignores are dropped, so equivalent payloads share a key. Numbers keep their JSON type since
+    5 and 5.0 serialize differently in the response.
+    """
+    normalized = dict(data)
+
+    for field in _UNUSED_FIELDS.get(normalized.get("type"), ()):
+        normalized.pop(field, None)
+    if normalized.get("interest_type") != "Variable":
+        normalized.pop("interest_table", None)
+
+    for field in ("first_payment_date", "sliced_date"):
+        if normalized.get(field):
+            normalized[field] = pd.Timestamp(normalized[field]).isoformat()
+
+    if normalized.get("adjustment_df"):
+        adjustments = [(pd.Timestamp(row["Event Date"]).isoformat(), row["Adjustment Amount"])
+                       for row in normalized["adjustment_df"]]
+        normalized["adjustment_df"] = sorted(adjustments, key=lambda row: (row[0], float(row[1])))
+    else:
+        normalized["adjustment_df"] = None
+
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
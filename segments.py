@@ -0,0 +1,150 @@
+import bisect
+
+
+class Segment:
+    """
+    Run of consecutive payment periods over which a loan evolves as a plain annuity.
+
+    start_period: first period of the segment (1-based); n_periods: number of periods it covers
+    interest_rate: annual rate charged over the segment
+    interest, principal: totals paid over the segment
+    payment: the payment of each of its periods
+    balance_adjustment: adjustment applied at the start of the segment (only single-period segments carry one)
+    balance: balance after the segment's last payment
+    original: whether the segment lies within the loan's original term
+    """
+
+    __slots__ = ("start_period", "n_periods", "interest_rate", "interest", "principal", "payment",
+                 "balance_adjustment", "balance", "original")
+
+    def __init__(self, start_period, n_periods, interest_rate, interest, principal, payment, balance_adjustment,
+                 balance, original):
+        self.start_period = start_period
+        self.n_periods = n_periods
+        self.interest_rate = interest_rate
+        self.interest = interest
+        self.principal = principal
+        self.payment = payment
+        self.balance_adjustment = balance_adjustment
+        self.balance = balance
+        self.original = original
+
+    @property
+    def end_period(self):
+        return self.start_period + self.n_periods - 1
+
+    @property
+    def opening_balance(self):
+        """
+        Balance before the segment's adjustment and first payment.
+        """
+        return self.balance + self.principal - self.balance_adjustment
+
+    def __repr__(self):
+        return (f"Segment(periods {self.start_period}-{self.end_period}, rate {self.interest_rate}, "
+                f"payment {float(self.payment):.2f}, balance {float(self.balance):.2f})")
+
+
+class SegmentSchedule:
+    """
+    A loan's timeline as Segments split at its events, with rows expanded only on request.
+
+    calendar: the loan's payment calendar
+    segments: the Segments in period order, ending with the period that pays the loan off (or the calendar's
+    last period)
+    expand: callable returning the schedule DataFrame, taking calculate_amortization's sliced_date
+    stream: callable returning iter_schedule's generator, taking its chunk_size, date_format and sliced_date
+
+    Totals are summed from the unrounded segment values and rounded once, so they can differ by a few cents
+    from the sums of a schedule's rounded columns.
+    """
+
+    def __init__(self, calendar, segments, expand, stream):
+        self.calendar = calendar
+        self.segments = segments
+        self._expand = expand
+        self._stream = stream
+        self._starts = [segment.start_period for segment in segments]
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    @property
+    def n_periods(self):
+        """
+        Number of payments in the schedule.
+        """
+        return self.segments[-1].end_period if self.segments else 0
+
+    def segment_at(self, period):
+        """
+        Segment covering period (1-based), or None when the schedule has no such period.
+        """
+        index = bisect.bisect_right(self._starts, period) - 1
+        if index < 0 or period > self.segments[index].end_period:
+            return None
+        return self.segments[index]
+
+    def summary(self):
+        """
+        Loan-level totals without expanding any rows, as a dict with:
+        payments: number of payments; payoff_date: 'YYYY-MM-DD' date of the final payment (None when the
+        balance is not cleared); final_balance; first_payment, last_payment: the first and last payment amounts;
+        total_interest, total_principal, total_adjustments, total_paid: totals over the schedule;
+        segments: number of segments
+        """
+        total_interest = total_principal = total_adjustments = 0
+        for segment in self.segments:
+            total_interest += segment.interest
+            total_principal += segment.principal
+            total_adjustments += segment.balance_adjustment
+
+        # A balance left with float noise below a cent shows as 0.00 in the schedule, so it counts as paid off
+        final_balance = round(float(max(0, self.segments[-1].balance)), 2) if self.segments else 0
+        return {
+            "payments": self.n_periods,
+            "payoff_date": str(self.calendar.labels[self.n_periods - 1]) if self.segments and final_balance <= 0
+            else None,
+            "final_balance": final_balance,
+            "first_payment": round(float(self.segments[0].payment), 2) if self.segments else None,
+            "last_payment": round(float(self.segments[-1].payment), 2) if self.segments else None,
+            "total_interest": round(float(total_interest), 2),
+            "total_principal": round(float(total_principal), 2),
+            "total_adjustments": round(float(total_adjustments), 2),
+            "total_paid": round(float(total_interest + total_principal), 2),
+            "segments": len(self.segments)
+        }
+
+    def to_records(self):
+        """
+        Segments as JSON-ready dicts, with their first and last payment dates and amounts rounded to cents.
+        """
+        labels = self.calendar.labels
+        return [{
+            "start_period": segment.start_period,
+            "end_period": segment.end_period,
+            "start_date": str(labels[segment.start_period - 1]),
+            "end_date": str(labels[segment.end_period - 1]),
+            "n_periods": segment.n_periods,
+            "interest_rate": segment.interest_rate,
+            "payment": round(float(segment.payment), 2),
+            "interest": round(float(segment.interest), 2),
+            "principal": round(float(segment.principal), 2),
+            "balance_adjustment": round(float(segment.balance_adjustment), 2),
+            "balance": round(float(max(0, segment.balance)), 2)
+        } for segment in self.segments]
+
+    def to_frame(self, sliced_date=None):
+        """
+        The schedule's rows as calculate_amortization builds them, from sliced_date on when given.
+        """
+        return self._expand(sliced_date=sliced_date)
+
+    def rows(self, chunk_size=None, date_format=None, sliced_date=None):
+        """
+        The schedule's rows as iter_schedule yields them, computed as they are consumed.
+        """
+        return self._stream(chunk_size=chunk_size, date_format=date_format, sliced_date=sliced_date)
@@ -2,6 +2,7 @@ import pandas as pd
 import streamlit as st
 import numpy as np
 from model import LoanCalculator
+from wire_format import ARROW_MIMETYPE, decode_schedule
 import requests
 from datetime import date
 import numpy as np
@@ -9,33 +10,17 @@ import numpy_financial as npf
 
 
 
-def calculate_minimum_repayment(period_interest_rate, remaining_balance, payment_frequency):
-    # Initial parameters
-    initial_payment = 10
-    increment_list = [1000, 100, 10, 1]  # Increment levels
-    
-    # Define periods per year for different frequencies
-    period_per_year = {'monthly': 12, 'weekly': 52, 'fortnightly': 26}
-    period_interest_rate = period_interest_rate / period_per_year[payment_frequency]
-    
-    # Iterate through increment levels
-    for increment in increment_list:
-        while True:
-            # Calculate the result
-            result = npf.nper(rate=period_interest_rate, pmt=-initial_payment, pv=remaining_balance)
-            
-            if not np.isnan(result):  # If result is valid, break to try smaller increment
-                break
-            else:
-                initial_payment += increment  # Increase by current increment
-        
-        # Backtrack one step and use the next smaller increment
-        initial_payment -= increment
-
-    # Final recalculation with the refined initial payment
-    result = npf.nper(rate=period_interest_rate, pmt=-initial_payment, pv=remaining_balance)
-    
-    return initial_payment + 1
+def fetch_minimum_repayment(interest_rate, loan_amount, payment_frequency, interest_table=None):
+    # Smallest whole-dollar repayment that pays the loan off, solved by the API
+    payload = {
+        "loan_amount": loan_amount,
+        "interest_rate": interest_rate,
+        "payment_frequency": payment_frequency,
+        "interest_type": "Variable" if interest_table is not None else "Fixed",
+        "interest_table": interest_table
+    }
+    response = requests.post("http://localhost:5000/minimum_repayment", json=payload)
+    return response.json()['minimum_repayment']
 
 
 
@@ -71,46 +56,6 @@ def count_periods(start_date: pd.Timestamp, end_date: pd.Timestamp, increment: s
     
     
     
-def generate_event_dates(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Generate event dates for each row in the input DataFrame based on the given 'From', 'Until', and 'Period'.
-
-    Parameters:
-        df (pd.DataFrame): Input DataFrame with columns ['Amount', 'From', 'Until', 'Period'].
-
-    Returns:
-        pd.DataFrame: Output DataFrame with columns ['Event Date', 'Amount'].
-    """
-    event_list = []
-
-    for _, row in df.iterrows():
-        amount = row['Amount']
-        current_date = pd.to_datetime(row['From'])
-        end_date = pd.to_datetime(row['Until'])
-        period = row['Period']
-
-        while current_date <= end_date:
-            event_list.append({'Event Date': current_date, 'Adjustment Amount': amount})
-
-            # Increment the date based on the period type
-            if period == 'monthly':
-                current_date += pd.DateOffset(months=1)
-            elif period == 'weekly':
-                current_date += pd.DateOffset(weeks=1)
-            elif period == 'fortnightly':
-                current_date += pd.DateOffset(weeks=2)
-            else:
-                raise ValueError(f"Invalid period type: {period}")
-
-    # Convert the list to a DataFrame
-    result_df = pd.DataFrame(event_list)
-    
-    
-
-    return result_df
-    
-
-
 st.title('Loan Calculator')
 
 
@@ -142,7 +87,7 @@ with st.container(border=True):
     if type == 'By Loan Term':
         loan_term = st.number_input('Loan Term (years)', min_value=0, value=30)
     else:
-        minimum_repayment_amount = calculate_minimum_repayment(interest_rate/100, loan_amount, payment_frequency)
+        minimum_repayment_amount = fetch_minimum_repayment(interest_rate, loan_amount, payment_frequency)
         repayment_amount = st.number_input('Repayment Amount', min_value=minimum_repayment_amount, value=minimum_repayment_amount)
             
     sliced_period = st.number_input('Get schedule after specific year (Loan Remaining Years)', min_value=0, value=0, help='For example if you enter 5, a sliced amortization schedule will be generated after 5 years from the first payment date')
@@ -263,10 +208,9 @@ with st.container(border=True):
         
         interest_table_dict = interest_table.to_dict()
         
-        max_interest = max(interest_table_dict['Interest Rate'].values())
-        
         if type == 'By Repayment Amount':
-            new_minimum_repayment_amount = calculate_minimum_repayment(max_interest/100, loan_amount, payment_frequency)
+            new_minimum_repayment_amount = fetch_minimum_repayment(interest_rate, loan_amount, payment_frequency,
+                                                                   interest_table_dict)
             
             if new_minimum_repayment_amount > repayment_amount:
                 st.warning(f"Variable Interest Rate Configuration has adjusted the minimum repayment amount to {new_minimum_repayment_amount}")
@@ -337,10 +281,12 @@ with st.container(border=True):
             )
     
     
+    # Periodical adjustments are sent as rules and evaluated per payment period by the API
+    adjustment_rules = None
     if not periodical_adjusment['Amount'].sum() == 0:
-        periodical_adjusment = generate_event_dates(periodical_adjusment)
-        adjustment_df = pd.concat([adjustment_df, periodical_adjusment])
-        adjustment_df = adjustment_df.drop_duplicates(subset=['Event Date'], keep='last')
+        adjustment_rules = periodical_adjusment.dropna().copy()
+        adjustment_rules['From'] = pd.to_datetime(adjustment_rules['From']).dt.strftime('%Y-%m-%d')
+        adjustment_rules['Until'] = pd.to_datetime(adjustment_rules['Until']).dt.strftime('%Y-%m-%d')
         
     
     
@@ -358,6 +304,9 @@ with st.container(border=True):
     
     st.dataframe(adjustment_df)
     
+    if adjustment_rules is not None:
+        st.dataframe(adjustment_rules)
+    
     # loan_term_mode = 'adjusted'
     
     # st.write(adjustment_df)
@@ -409,6 +358,7 @@ if st.button('Calculate'):
             "interest_type": "Fixed",
             "interest_rate": interest_rate,
             "adjustment_df": adjustment_df.to_dict(orient='records') if adjustment_df is not None else None,
+            "adjustment_rules": adjustment_rules.to_dict(orient='records') if adjustment_rules is not None else None,
             "sliced_date": sliced_date,
             "loan_term_mode": loan_term_mode,
             "payment_frequency": payment_frequency,
@@ -429,6 +379,7 @@ if st.button('Calculate'):
             # "periods_between_adjustments": periods_between_adjustments,
             # "estimated_adjustments": estimated_adjustments,
             "adjustment_df": adjustment_df.to_dict(orient='records') if adjustment_df is not None else None,
+            "adjustment_rules": adjustment_rules.to_dict(orient='records') if adjustment_rules is not None else None,
             "sliced_date": sliced_date,
             "loan_term_mode": loan_term_mode,
             "payment_frequency": payment_frequency,
@@ -440,15 +391,16 @@ if st.button('Calculate'):
     # print(payload)
 
     # Send POST request to Flask API
-    response = requests.post(api_url, json=payload)
+    # Ask for the schedule as Arrow columns, which parse far faster than JSON records
+    response = requests.post(api_url, json=payload, headers={'Accept': ARROW_MIMETYPE})
     
     # print("PRINT THIS")
     # print(response.json())
 
-    response_data = response.json()
-    # st.write(response_data)
-    response_df = pd.DataFrame(response_data['schedule_df'])
-    response_df_sliced = pd.DataFrame(response_data['sliced_schedule_df'])
+    if response.status_code != 200:
+        st.error(f"Error: {response.json().get('error', 'Unknown error')}")
+        st.stop()
+    response_df, response_df_sliced = decode_schedule(response.content, response.headers['Content-Type'])
     
     st.dataframe(response_df, column_order = ('No.', 'Period', 'Balance', 'Balance Adjustment', 'Interest Rate', 'Interest Due', 'Principal Paid', 'Payment Due', 'Year', 'Remark'), hide_index=True)
     
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from model import LoanCalculator
+
+STEPS = {"weekly": pd.Timedelta(weeks=1), "fortnightly": pd.Timedelta(weeks=2), "monthly": pd.DateOffset(months=1)}
+
+
+def expand(rules):
+    """
+    The one-off events a list of rules stands for, stepping each rule from its From date as the docs describe.
+    """
+    events = []
+    for rule in rules:
+        date, until = pd.Timestamp(rule["From"]), pd.Timestamp(rule["Until"])
+        while date <= until:
+            events.append((date, rule["Amount"]))
+            date = date + STEPS[rule["Period"]]
+    return pd.DataFrame(events, columns=["Event Date", "Adjustment Amount"])
+
+
+RULES = {
+    # Month-end start: later occurrences are clipped to the 28th and stay there
+    "monthly from a month end": [{"Amount": -200, "From": "2025-01-31", "Until": "2027-12-31", "Period": "monthly"}],
+    "weekly mid-week": [{"Amount": -35.5, "From": "2025-02-05", "Until": "2026-08-19", "Period": "weekly"}],
+    "fortnightly drawdown": [{"Amount": 150, "From": "2025-03-03", "Until": "2025-09-30", "Period": "fortnightly"}],
+    "overlapping rules": [
+        {"Amount": -100, "From": "2025-01-15", "Until": "2030-01-15", "Period": "monthly"},
+        {"Amount": -20, "From": "2026-06-06", "Until": "2029-06-06", "Period": "weekly"},
+    ],
+}
+
+
+@pytest.mark.parametrize("rules", RULES.values(), ids=RULES.keys())
+@pytest.mark.parametrize("payment_frequency", ["monthly", "fortnightly", "weekly"])
+def test_rules_match_their_expanded_events(rules, payment_frequency):
+    loan = {"loan_amount": 200000, "loan_term": 20, "first_payment_date": "2025-01-31",
+            "payment_frequency": payment_frequency, "loan_term_mode": "adjusted"}
+    calculator = LoanCalculator(5.5)
+
+    by_rules = calculator.calculate_amortization("By Loan Term", adjustment_rules=rules, **loan)
+    by_events = calculator.calculate_amortization("By Loan Term", adjustment_df=expand(rules), **loan)
+    pd.testing.assert_frame_equal(by_rules, by_events)
+
+
+def test_rules_add_to_one_off_events():
+    rules = RULES["overlapping rules"]
+    events = pd.DataFrame({"Event Date": pd.to_datetime(["2025-04-02", "2027-11-20"]),
+                           "Adjustment Amount": [-5000, 2500.25]})
+    loan = {"loan_amount": 90000, "repayment_amount": 700, "first_payment_date": "2025-01-15",
+            "payment_frequency": "fortnightly"}
+    calculator = LoanCalculator(4.5)
+
+    combined = calculator.calculate_amortization("By Repayment Amount", adjustment_df=events,
+                                                 adjustment_rules=rules, **loan)
+    expanded = pd.concat([events, expand(rules)], ignore_index=True)
+    pd.testing.assert_frame_equal(combined, calculator.calculate_amortization("By Repayment Amount",
+                                                                              adjustment_df=expanded, **loan))
+
+
+def test_rules_table_and_records_agree():
+    rules = RULES["weekly mid-week"]
+    loan = {"loan_amount": 150000, "loan_term": 15, "first_payment_date": "2025-01-15"}
+    calculator = LoanCalculator(6)
+    pd.testing.assert_frame_equal(
+        calculator.calculate_amortization("By Loan Term", adjustment_rules=pd.DataFrame(rules), **loan),
+        calculator.calculate_amortization("By Loan Term", adjustment_rules=rules, **loan))
+
+
+def test_rule_ending_before_it_starts_adds_nothing():
+    rules = [{"Amount": -500, "From": "2026-01-01", "Until": "2025-01-01", "Period": "monthly"}]
+    loan = {"loan_amount": 150000, "loan_term": 15, "first_payment_date": "2025-01-15"}
+    calculator = LoanCalculator(6)
+    schedule_df = calculator.calculate_amortization("By Loan Term", adjustment_rules=rules, **loan)
+
+    assert (schedule_df["Balance Adjustment"] == 0).all()
+    pd.testing.assert_frame_equal(schedule_df[["Payment Due", "Balance"]],
+                                  calculator.calculate_amortization("By Loan Term", **loan)[["Payment Due", "Balance"]])
+
+
+@pytest.mark.parametrize("rules, message", [
+    ([{"Amount": -100, "From": "2025-01-01", "Until": "2026-01-01"}], "must contain"),
+    ([{"Amount": -100, "From": "2025-01-01", "Until": "2026-01-01", "Period": "daily"}], "Invalid period type"),
+])
+def test_invalid_rules(rules, message):
+    with pytest.raises(ValueError, match=message):
+        LoanCalculator(5).calculate_amortization("By Loan Term", loan_amount=100000, loan_term=10,
+                                                 first_payment_date="2025-01-15", adjustment_rules=rules)
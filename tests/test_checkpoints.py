@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import model
+from checkpoints import CheckpointCache, ScheduleRun, schedule_checkpoints
+from metrics import engine_runs
+from model import LoanCalculator
+
+LOAN = {"type": "By Loan Term", "loan_amount": 300000, "loan_term": 30, "first_payment_date": "2025-01-15",
+        "payment_frequency": "weekly", "loan_term_mode": "adjusted"}
+
+
+def adjustments(*events):
+    return pd.DataFrame({"Event Date": pd.to_datetime([date for date, _ in events]),
+                         "Adjustment Amount": [amount for _, amount in events]})
+
+
+BASE = adjustments(("2026-05-01", -5000), ("2031-08-01", -2500.5), ("2040-02-01", 10000))
+
+
+def resumes():
+    return sum(value for _, labels, value in engine_runs.samples() if labels["path"] == "checkpoint_resume")
+
+
+def cold(monkeypatch, rate, **loan):
+    """
+    The schedule computed without any checkpoint to resume from.
+    """
+    with monkeypatch.context() as patch:
+        patch.setattr(model, "schedule_checkpoints", CheckpointCache(0))
+        return LoanCalculator(rate).calculate_amortization(**loan)
+
+
+@pytest.fixture(autouse=True)
+def empty_checkpoints():
+    schedule_checkpoints.clear()
+    yield
+    schedule_checkpoints.clear()
+
+
+@pytest.mark.parametrize("edited", [
+    # One adjustment added late (resumes from a late checkpoint) or in the first weeks (before any checkpoint)
+    adjustments(("2026-05-01", -5000), ("2031-08-01", -2500.5), ("2036-03-01", -7000), ("2040-02-01", 10000)),
+    adjustments(("2025-02-01", -1000), ("2026-05-01", -5000), ("2031-08-01", -2500.5), ("2040-02-01", 10000)),
+    # The same amount as a float, which the schedule rounds differently
+    adjustments(("2026-05-01", -5000), ("2031-08-01", -2500.5), ("2040-02-01", 10000.0)),
+    adjustments(("2026-05-01", -5000), ("2031-08-01", -2500.5)),
+])
+def test_resumed_schedule_equals_cold_schedule(monkeypatch, edited):
+    LoanCalculator(5.5).calculate_amortization(**LOAN, adjustment_df=BASE)
+    resumed = LoanCalculator(5.5).calculate_amortization(**LOAN, adjustment_df=edited)
+
+    pd.testing.assert_frame_equal(resumed, cold(monkeypatch, 5.5, **LOAN, adjustment_df=edited))
+
+
+def test_edit_after_the_first_checkpoint_resumes():
+    LoanCalculator(5.5).calculate_amortization(**LOAN, adjustment_df=BASE)
+    before = resumes()
+    LoanCalculator(5.5).calculate_amortization(
+        **LOAN, adjustment_df=adjustments(("2026-05-01", -5000), ("2031-08-01", -2500.5), ("2040-02-01", 9000)))
+    assert resumes() == before + 1
+
+
+@pytest.mark.parametrize("rate, changes", [
+    (6, {}),
+    (5.5, {"first_payment_date": "2025-01-22"}),
+    (5.5, {"payment_frequency": "fortnightly"}),
+    (5.5, {"loan_term_mode": "fixed"}),
+])
+def test_other_loan_inputs_never_resume(monkeypatch, rate, changes):
+    LoanCalculator(5.5).calculate_amortization(**LOAN, adjustment_df=BASE)
+    before = resumes()
+    edited = {**LOAN, **changes, "adjustment_df": BASE}
+    schedule_df = LoanCalculator(rate).calculate_amortization(**edited)
+
+    assert resumes() == before
+    pd.testing.assert_frame_equal(schedule_df, cold(monkeypatch, rate, **edited))
+
+
+@pytest.mark.parametrize("edited_date", ["2028-03-01", "2036-03-01"])
+def test_sliced_and_full_requests_after_an_edit(monkeypatch, edited_date):
+    # An adjustment added before or after the sliced date, with full and sliced requests interleaved
+    sliced_date = pd.Timestamp("2032-01-01")
+    edited = adjustments(("2026-05-01", -5000), (edited_date, -3000), ("2031-08-01", -2500.5),
+                         ("2040-02-01", 10000))
+    calculator = LoanCalculator(5.5)
+    calculator.calculate_amortization(**LOAN, adjustment_df=BASE)
+    sliced = calculator.calculate_amortization(**LOAN, adjustment_df=edited, sliced_date=sliced_date)
+    full = calculator.calculate_amortization(**LOAN, adjustment_df=edited)
+
+    expected = cold(monkeypatch, 5.5, **LOAN, adjustment_df=edited)
+    pd.testing.assert_frame_equal(full, expected)
+    first_row = expected.index[pd.to_datetime(expected["Period"]) >= sliced_date][0]
+    pd.testing.assert_frame_equal(sliced, expected.iloc[first_row:].reset_index(drop=True))
+
+
+def test_eviction_keeps_the_most_recently_used_loans():
+    cache = CheckpointCache(max_size=2)
+    for key in "abc":
+        cache.put(key, ScheduleRun(None, None, {}))
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+    # "b" was just used, so "c" is the least recently used when "d" comes in
+    cache.put("d", ScheduleRun(None, None, {}))
+    assert cache.get("c") is None
+    assert cache.stats()["size"] == 2
+
+
+def test_calculator_respects_the_cache_size(monkeypatch):
+    cache = CheckpointCache(max_size=2)
+    monkeypatch.setattr(model, "schedule_checkpoints", cache)
+    for loan_amount in (100000, 200000, 300000):
+        LoanCalculator(5.5).calculate_amortization(**{**LOAN, "loan_amount": loan_amount}, adjustment_df=BASE)
+    assert cache.stats()["size"] == 2
+
+    monkeypatch.setattr(model, "schedule_checkpoints", CheckpointCache(max_size=0))
+    LoanCalculator(5.5).calculate_amortization(**LOAN, adjustment_df=BASE)
+    assert model.schedule_checkpoints.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("size", ["0", "3"])
+def test_cache_size_from_the_environment(size):
+    output = subprocess.run([sys.executable, "-c", "from checkpoints import schedule_checkpoints as c; "
+                             "print(c.max_size)"], env={**os.environ, "CHECKPOINT_CACHE_SIZE": size},
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == size
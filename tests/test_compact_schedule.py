@@ -0,0 +1,31 @@
+import json
+
+import pandas as pd
+import pytest
+
+from model import LoanCalculator, expand_compact_schedule
+
+LOANS = [
+    # Whole-number rate and repayment with a float adjustment early on, so later rows are all integral
+    (0, {"type": "By Repayment Amount", "loan_amount": 100000, "repayment_amount": 1000,
+         "first_payment_date": "2025-01-31", "loan_term_mode": "adjusted",
+         "adjustment_df": pd.DataFrame({"Event Date": pd.to_datetime(["2026-03-01"]),
+                                        "Adjustment Amount": [-1500.5]})}),
+    # A fractional first rate stage followed by a whole-number one
+    (5.5, {"type": "By Loan Term", "loan_amount": 200000, "loan_term": 10, "first_payment_date": "2025-01-31",
+           "loan_term_mode": "fixed", "interest_type": "Variable",
+           "variable_interest_configuration": {"Interest Rate": {0: 5.5, 1: 7},
+                                               "Length Period before next Adjustment": {0: 24}}}),
+]
+
+
+@pytest.mark.parametrize("rate, loan", LOANS)
+@pytest.mark.parametrize("first_period, last_period", [(None, None), (1, 12), (30, 60), (60, None)])
+def test_expand_matches_full_schedule(rate, loan, first_period, last_period):
+    calculator = LoanCalculator(rate)
+    full = calculator.calculate_amortization(**loan)
+    compact = json.loads(json.dumps(calculator.compact_schedule(**loan)))
+
+    expanded = expand_compact_schedule(compact, first_period, last_period)
+    expected = full.iloc[(first_period or 1) - 1:last_period].reset_index(drop=True)
+    pd.testing.assert_frame_equal(expanded, expected)
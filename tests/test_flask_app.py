@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from flask_app import app, schedule_cache
+
+REPAYMENT_LOAN = {"type": "By Repayment Amount", "loan_amount": 100000, "interest_rate": 0, "repayment_amount": 1000,
+                  "first_payment_date": "2025-01-31", "payment_frequency": "monthly", "interest_type": "Fixed",
+                  "loan_term_mode": "adjusted", "sliced_date": "2030-06-01"}
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize("payload", [
+    # A float adjustment and a fractional rate stage before the slice, whole numbers within it
+    {**REPAYMENT_LOAN, "adjustment_df": [{"Event Date": "2026-03-01", "Adjustment Amount": -1500.5}]},
+    {**REPAYMENT_LOAN, "interest_rate": 5.5, "interest_type": "Variable",
+     "interest_table": {"Interest Rate": {"0": 5.5, "1": 7}, "Length Period before next Adjustment": {"0": 24}}},
+])
+def test_sliced_only_matches_sliced_full_schedule(client, payload):
+    full = client.post("/calculate_amortization_schedule", json=payload).get_json()
+    sliced_only = client.post("/calculate_amortization_schedule", json={**payload, "sliced_only": True}).get_json()
+
+    assert "schedule_df" not in sliced_only
+    pd.testing.assert_frame_equal(pd.DataFrame(sliced_only["sliced_schedule_df"]),
+                                  pd.DataFrame(full["sliced_schedule_df"]))
+
+
+def test_empty_adjustment_list_on_a_cold_cache(client):
+    schedule_cache.clear()
+    payload = {**REPAYMENT_LOAN, "interest_rate": 4.5}
+    empty = client.post("/calculate_amortization_schedule", json={**payload, "adjustment_df": []})
+    assert empty.status_code == 200
+
+    schedule_cache.clear()
+    assert empty.get_json() == client.post("/calculate_amortization_schedule", json=payload).get_json()
@@ -0,0 +1,25 @@
+import os
+import statistics
+
+import pytest
+
+# Median cold import time allowed per entry point; IMPORT_BUDGET_MS overrides it on slower machines
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 2000))
+
+
+@pytest.fixture
+def import_times(monkeypatch):
+    # benchmark sets the cache sizes in os.environ for its own runs; keep that out of the other tests
+    monkeypatch.setattr(os, "environ", os.environ.copy())
+    from benchmark import import_times
+    return import_times
+
+
+@pytest.mark.parametrize("module", ["model", "flask_app"])
+def test_import_stays_lazy_and_within_budget(import_times, module):
+    runs = [import_times(module) for _ in range(3)]
+
+    imported = runs[0][1]
+    assert module in imported
+    assert not [name for name in imported if name == "plotly" or name.startswith("plotly.")]
+    assert statistics.median(milliseconds for milliseconds, _ in runs) <= IMPORT_BUDGET_MS
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from model import LoanCalculator
+
+# Whole-number rate and repayment: after the float adjustment every value in its row's columns is integral
+LOAN = {"type": "By Repayment Amount", "loan_amount": 100000, "repayment_amount": 1000,
+        "first_payment_date": "2025-01-31", "loan_term_mode": "adjusted",
+        "adjustment_df": pd.DataFrame({"Event Date": pd.to_datetime(["2025-03-01"]), "Adjustment Amount": [-1500.5]})}
+
+
+@pytest.mark.parametrize("sliced_date", [None, "2030-06-01"])
+def test_chunks_match_calculate_amortization(sliced_date):
+    calculator = LoanCalculator(0)
+    expected = calculator.calculate_amortization(**LOAN, sliced_date=sliced_date)
+    chunks = list(calculator.iter_schedule(chunk_size=7, sliced_date=sliced_date, **LOAN))
+
+    assert len(chunks) > 1
+    assert all(chunk.dtypes.equals(expected.dtypes) for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+def test_rows_match_calculate_amortization():
+    calculator = LoanCalculator(0)
+    expected = calculator.calculate_amortization(**LOAN)
+    rows = list(calculator.iter_schedule(**LOAN))
+
+    pd.testing.assert_frame_equal(pd.DataFrame(rows), expected)
+    # An integral amount in a float column is still a float, as in the JSON of the whole schedule
+    assert all(type(row[column]) is not int for row in rows for column in ("Payment Due", "Balance Adjustment"))
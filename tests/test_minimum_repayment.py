@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from model import LoanCalculator, minimum_repayment
+from payment_calendar import PERIODS_PER_YEAR
+
+RISING = {"Interest Rate": {0: 3, 1: 7.5}, "Length Period before next Adjustment": {0: 24}}
+FALLING = {"Interest Rate": {0: 6, 1: 4}, "Length Period before next Adjustment": {0: 60}}
+
+
+def pays_off(loan_amount, repayment, period_rates, max_periods=1_000_000):
+    """
+    Whether a level repayment clears loan_amount when period k charges period_rates(k).
+    """
+    balance = loan_amount
+    for period in range(max_periods):
+        interest = balance * period_rates(period)
+        if repayment <= interest:
+            return False
+        balance -= repayment - interest
+        if balance <= 0:
+            return True
+    return False
+
+
+def stage_rates(annual_rate, configuration, payment_frequency):
+    periods_per_year = PERIODS_PER_YEAR[payment_frequency]
+    if configuration is None:
+        return lambda period: annual_rate / 100 / periods_per_year
+    first_length = configuration["Length Period before next Adjustment"][0]
+    rates = configuration["Interest Rate"]
+    return lambda period: rates[0 if period < first_length else 1] / 100 / periods_per_year
+
+
+@pytest.mark.parametrize("annual_rate, configuration", [(5.5, None), (3, RISING), (6, FALLING)])
+@pytest.mark.parametrize("payment_frequency", ["monthly", "weekly"])
+def test_minimum_is_the_smallest_whole_repayment_that_pays_off(annual_rate, configuration, payment_frequency):
+    calculator = LoanCalculator(annual_rate)
+    interest_type = "Variable" if configuration else "Fixed"
+    minimum = calculator.calculate_minimum_repayment(200000, payment_frequency, interest_type, configuration)
+
+    assert isinstance(minimum, int)
+    rates = stage_rates(annual_rate, configuration, payment_frequency)
+    assert pays_off(200000, minimum, rates)
+    assert not pays_off(200000, minimum - 1, rates)
+
+
+def test_fixed_rate_minimum_beats_the_interest_only_payment():
+    assert minimum_repayment(200000, 6) == np.floor(200000 * 0.005) + 1
+
+
+def test_vectorized_over_amounts_and_rates():
+    loan_amounts = np.array([[200000], [85000.5]])
+    annual_rates = np.array([3, 4.5, 0.25])
+    result = minimum_repayment(loan_amounts, annual_rates, "fortnightly", RISING)
+
+    assert result.shape == (2, 3)
+    for row, loan_amount in enumerate(loan_amounts[:, 0]):
+        for column, annual_rate in enumerate(annual_rates):
+            assert result[row, column] == minimum_repayment(loan_amount, annual_rate, "fortnightly", RISING)
+
+
+def test_invalid_frequency():
+    with pytest.raises(ValueError, match="Invalid payment frequency"):
+        minimum_repayment(100000, 5, "daily")
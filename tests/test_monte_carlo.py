@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import annuity
+from model import LoanCalculator
+from monte_carlo import amortize_rate_paths, mean_reverting_rate_paths
+
+
+def test_calm_paths_reproduce_the_fixed_schedule():
+    # Without shocks and with the long-term rate at today's rate, every path is the fixed-rate loan
+    result = LoanCalculator(5.5).simulate_variable_rate("By Loan Term", 300000, "2025-01-15", loan_term=25,
+                                                        n_paths=4, volatility=0, seed=1)
+    schedule_df = LoanCalculator(5.5).calculate_amortization("By Loan Term", loan_amount=300000, loan_term=25,
+                                                             first_payment_date="2025-01-15")
+
+    assert (result["rate_paths"] == 5.5).all()
+    np.testing.assert_allclose(result["total_interest"], schedule_df["Interest Due"].sum(),
+                               atol=0.01 * len(schedule_df))
+    np.testing.assert_allclose(result["peak_payment"], schedule_df["Payment Due"].max(), atol=0.01)
+    assert (result["payoff_date"] == np.datetime64(schedule_df["Period"].iloc[-1])).all()
+    assert (result["final_balance"] == 0).all()
+    assert result["summary"]["paid_off_share"] == 1
+
+
+def test_calm_repayment_paths_pay_off_with_the_schedule():
+    # A repayment the schedule pays off in full (its period count rounds up), so both settle on the same date
+    result = LoanCalculator(6).simulate_variable_rate("By Repayment Amount", 150000, "2025-03-31",
+                                                      repayment_amount=620, payment_frequency="fortnightly",
+                                                      n_paths=3, volatility=0)
+    schedule_df = LoanCalculator(6).calculate_amortization("By Repayment Amount", loan_amount=150000,
+                                                           repayment_amount=620, first_payment_date="2025-03-31",
+                                                           payment_frequency="fortnightly")
+
+    assert schedule_df["Balance"].iloc[-1] == 0
+    assert result["summary"]["payoff_date"]["p50"] == schedule_df["Period"].iloc[-1]
+    np.testing.assert_allclose(result["total_interest"], schedule_df["Interest Due"].sum(),
+                               atol=0.01 * len(schedule_df))
+
+
+def test_unaffordable_repayment_never_pays_off():
+    result = LoanCalculator(5).simulate_variable_rate("By Repayment Amount", 200000, "2025-01-15",
+                                                      repayment_amount=800, n_paths=50, max_years=10, seed=3)
+    assert np.isnat(result["payoff_date"]).all()
+    assert result["summary"]["paid_off_share"] == 0
+    assert set(result["summary"]["payoff_date"].values()) == {None}
+    assert (result["final_balance"] > 0).all()
+
+
+def test_seed_makes_runs_repeatable():
+    def run(seed):
+        return LoanCalculator(5.5).simulate_variable_rate("By Loan Term", 300000, "2025-01-15", loan_term=30,
+                                                          n_paths=200, seed=seed)
+
+    first, again, other = run(7), run(7), run(8)
+    np.testing.assert_array_equal(first["rate_paths"], again["rate_paths"])
+    assert first["summary"] == again["summary"]
+    assert not np.array_equal(first["rate_paths"], other["rate_paths"])
+
+
+def test_rates_stay_within_the_calculator_limits():
+    calculator = LoanCalculator(11.5, interest_rate_cap=12, interest_rate_minimum=4)
+    result = calculator.simulate_variable_rate("By Loan Term", 100000, "2025-01-15", loan_term=20, n_paths=500,
+                                               long_term_rate=3, volatility=4, seed=11)
+    rate_paths = result["rate_paths"]
+    assert rate_paths.min() == 4 and rate_paths.max() == 12
+    assert (rate_paths[:, 0] == 11.5).all()
+
+
+def test_rates_only_change_on_resets():
+    rate_paths = mean_reverting_rate_paths(5, n_paths=20, n_periods=50, periods_per_year=12, reset_periods=12,
+                                           seed=5)
+    assert rate_paths.shape == (20, 50)
+    for start in range(0, 50, 12):
+        block = rate_paths[:, start:start + 12]
+        assert (block == block[:, :1]).all()
+    assert not (rate_paths[:, 12] == rate_paths[:, 0]).all()
+
+
+def test_term_paths_match_period_by_period_amortization():
+    rate_paths = mean_reverting_rate_paths(5, n_paths=3, n_periods=120, periods_per_year=12, volatility=2, seed=2)
+    paths = amortize_rate_paths(80000, rate_paths, 12, loan_term_periods=120)
+
+    for path, annual_rates in enumerate(rate_paths):
+        balance, total_interest, peak_payment = 80000.0, 0.0, 0.0
+        for period, annual_rate in enumerate(annual_rates):
+            rate = annual_rate / 100 / 12
+            interest = balance * rate
+            payment = balance + interest if period == 119 else annuity.pmt(rate, 120 - period, balance)
+            balance -= payment - interest
+            total_interest += interest
+            peak_payment = max(peak_payment, payment)
+        assert paths["total_interest"][path] == pytest.approx(total_interest)
+        assert paths["peak_payment"][path] == pytest.approx(peak_payment)
+        assert paths["payoff_period"][path] == 120
+        assert paths["final_balance"][path] == 0
+
+
+@pytest.mark.parametrize("arguments, message", [
+    ({"type": "By Loan Term"}, "Loan term is required"),
+    ({"type": "By Loan Term", "loan_term": 1 / 24}, "whole, positive number"),
+    ({"type": "By Repayment Amount"}, "Repayment amount is required"),
+    ({"type": "By Balance"}, "Invalid type"),
+    ({"type": "By Loan Term", "loan_term": 10, "payment_frequency": "daily"}, "Invalid payment frequency"),
+    ({"type": "By Loan Term", "loan_term": 10, "n_paths": 0}, "must be positive"),
+    ({"type": "By Loan Term", "loan_term": 10, "reset_periods": 0}, "at least one period"),
+])
+def test_invalid_simulations(arguments, message):
+    with pytest.raises(ValueError, match=message):
+        LoanCalculator(5).simulate_variable_rate(loan_amount=100000, first_payment_date="2025-01-15", **arguments)
+
+
+def test_payoff_dates_follow_the_payment_calendar():
+    result = LoanCalculator(5).simulate_variable_rate("By Repayment Amount", 50000, "2025-01-31",
+                                                      repayment_amount=2000, n_paths=100, seed=4)
+    dates = pd.DatetimeIndex(result["payoff_date"])
+    assert not dates.isna().any()
+    # Monthly payments from a month end stay on month ends
+    assert dates.is_month_end.all()
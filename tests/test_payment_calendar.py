@@ -0,0 +1,34 @@
+import datetime
+
+import pandas as pd
+
+from model import LoanCalculator
+from payment_calendar import get_payment_calendar
+
+
+def test_calendar_dates_past_2262():
+    # datetime64[ns] ends on 2262-04-11; the calendar must keep counting past it
+    calendar = get_payment_calendar("2025-01-31", "monthly", 4000)
+    assert calendar.labels[3000] == "2275-01-31"
+    assert calendar.labels[3999] == "2358-04-30"
+    assert calendar.format_dates("%d-%m-%Y")[3999] == "30-04-2358"
+    assert calendar.first_period_on_or_after("2300-01-01") == 3300
+
+
+def test_schedule_past_2262_places_adjustments():
+    adjustment_df = pd.DataFrame({"Event Date": pd.to_datetime(["2250-01-01", "2270-03-05", "2300-06-01"]),
+                                  "Adjustment Amount": [-100, 500.5, -2000]})
+    schedule_df = LoanCalculator(3).calculate_amortization("By Repayment Amount", loan_amount=50000,
+                                                           repayment_amount=28.85, first_payment_date="2025-01-01",
+                                                           payment_frequency="weekly", adjustment_df=adjustment_df)
+
+    # Weekly payments step 7 days from the first payment date, as the baseline period loop does
+    first = datetime.date(2025, 1, 1)
+    expected = [str(first + datetime.timedelta(days=7 * k)) for k in range(len(schedule_df))]
+    assert schedule_df["Period"].tolist() == expected
+    assert len(schedule_df) == 15394
+
+    adjusted = schedule_df[schedule_df["Balance Adjustment"] != 0]
+    assert adjusted["No."].tolist() == [11741, 12794, 14372]
+    assert adjusted["Period"].tolist() == ["2250-01-02", "2270-03-09", "2300-06-06"]
+    assert adjusted["Balance Adjustment"].tolist() == [-100, 500.5, -2000]
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from model import LoanCalculator
+
+ADJUSTMENTS = pd.DataFrame({"Event Date": pd.to_datetime(["2027-03-01", "2030-06-10"]),
+                            "Adjustment Amount": [-10000, -5000.5]})
+VARIABLE = {"Interest Rate": {0: 5.5, 1: 6.25}, "Length Period before next Adjustment": {0: 36}}
+
+LOANS = {
+    "term adjusted": ("By Loan Term", {"loan_amount": 250000, "loan_term": 25, "loan_term_mode": "adjusted",
+                                       "adjustment_df": ADJUSTMENTS}),
+    "term variable": ("By Loan Term", {"loan_amount": 250000, "loan_term": 25, "interest_type": "Variable",
+                                       "variable_interest_configuration": VARIABLE}),
+    "repayment": ("By Repayment Amount", {"loan_amount": 120000, "repayment_amount": 450,
+                                          "payment_frequency": "fortnightly", "adjustment_df": ADJUSTMENTS}),
+}
+
+
+def schedule(type, loan):
+    return LoanCalculator(5.5).calculate_amortization(type, first_payment_date="2025-01-15", **loan)
+
+
+@pytest.mark.parametrize("name", LOANS)
+@pytest.mark.parametrize("date", ["2025-01-14", "2025-01-15", "2030-07-01", "2038-12-31", "2090-01-01"])
+def test_loan_state_matches_the_schedule(name, date):
+    type, loan = LOANS[name]
+    schedule_df = schedule(type, loan)
+    state = LoanCalculator(5.5).loan_state_at(type, date, first_payment_date="2025-01-15", **loan)
+
+    made = schedule_df[pd.to_datetime(schedule_df["Period"]) <= pd.Timestamp(date)]
+    assert state["payments_made"] == len(made)
+    if len(made):
+        last = made.iloc[-1]
+        assert state["last_payment_date"] == last["Period"]
+        assert state["balance"] == pytest.approx(last["Balance"], abs=0.01)
+        assert state["interest_rate"] == last["Interest Rate"]
+        # Totals of unrounded values against sums of rounded ones: a cent per row at most
+        assert state["cumulative_interest"] == pytest.approx(made["Interest Due"].sum(), abs=0.01 * len(made))
+        assert state["cumulative_adjustments"] == pytest.approx(made["Balance Adjustment"].sum(), abs=0.01)
+    else:
+        assert state["last_payment_date"] is None
+        assert state["balance"] == loan["loan_amount"]
+
+    if len(made) < len(schedule_df):
+        following = schedule_df.iloc[len(made)]
+        assert state["next_payment_date"] == following["Period"]
+        assert state["next_payment"] == pytest.approx(following["Payment Due"], abs=0.01)
+    else:
+        assert state["next_payment_date"] is None
+        assert state["remaining_periods"] == 0
+
+
+def test_point_query_shortcuts():
+    type, loan = LOANS["term adjusted"]
+    calculator = LoanCalculator(5.5)
+    state = calculator.loan_state_at(type, "2033-01-01", first_payment_date="2025-01-15", **loan)
+
+    arguments = {"first_payment_date": "2025-01-15", **loan}
+    assert calculator.balance_at(type, "2033-01-01", **arguments) == state["balance"]
+    assert calculator.remaining_term_at(type, "2033-01-01", **arguments) == state["remaining_periods"]
+    assert calculator.cumulative_interest_at(type, "2033-01-01", **arguments) == state["cumulative_interest"]
+
+
+@pytest.mark.parametrize("name", LOANS)
+def test_loan_summary_matches_the_schedule(name):
+    type, loan = LOANS[name]
+    schedule_df = schedule(type, loan)
+    summary = LoanCalculator(5.5).loan_summary(type, first_payment_date="2025-01-15", **loan)
+
+    assert summary["payments"] == len(schedule_df)
+    assert summary["payoff_date"] == (schedule_df["Period"].iloc[-1] if schedule_df["Balance"].iloc[-1] == 0
+                                      else None)
+    assert summary["final_balance"] == schedule_df["Balance"].iloc[-1]
+    assert summary["first_payment"] == schedule_df["Payment Due"].iloc[0]
+    assert summary["last_payment"] == schedule_df["Payment Due"].iloc[-1]
+    for total, column in [("total_interest", "Interest Due"), ("total_principal", "Principal Paid"),
+                          ("total_adjustments", "Balance Adjustment")]:
+        assert summary[total] == pytest.approx(schedule_df[column].sum(), abs=0.01 * len(schedule_df))
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from model import LoanCalculator
+
+
+def test_empty_adjustments_count_as_none():
+    loans = pd.DataFrame({"loan_id": ["a", "b"], "type": "By Loan Term", "loan_amount": [100000, 200000],
+                          "interest_rate": [5, 6], "loan_term": [30, 15], "first_payment_date": "2025-01-31"})
+    expected = LoanCalculator(0).calculate_portfolio(loans)
+
+    with_empty = loans.assign(adjustment_df=[[], pd.DataFrame()], adjustment_rules=[None, []])
+    pd.testing.assert_frame_equal(LoanCalculator(0).calculate_portfolio(with_empty), expected)
+
+
+def test_looped_loans_ignore_the_other_types_field():
+    # Variable rates and adjustments take the per-loan path; every row fills in both loan_term and repayment_amount
+    table = {"Interest Rate": {"0": 5.5, "1": 7}, "Length Period before next Adjustment": {"0": 24}}
+    adjustments = [{"Event Date": "2027-03-01", "Adjustment Amount": -5000}]
+    loans = pd.DataFrame({"loan_id": ["variable", "adjusted"], "type": ["By Loan Term", "By Repayment Amount"],
+                          "loan_amount": [100000, 50000], "interest_rate": [5.5, 4.5], "loan_term": [20, 10],
+                          "repayment_amount": [900, 600], "first_payment_date": "2025-01-31",
+                          "interest_type": ["Variable", "Fixed"], "interest_table": [table, None],
+                          "adjustment_df": [None, adjustments]})
+    portfolio_df = LoanCalculator(0).calculate_portfolio(loans)
+
+    variable = LoanCalculator(5.5).calculate_amortization(
+        type="By Loan Term", loan_amount=100000, loan_term=20, first_payment_date="2025-01-31",
+        interest_type="Variable", variable_interest_configuration=table)
+    adjusted = LoanCalculator(4.5).calculate_amortization(
+        type="By Repayment Amount", loan_amount=50000, repayment_amount=600, first_payment_date="2025-01-31",
+        adjustment_df=pd.DataFrame(adjustments))
+    for loan_id, expected in [("variable", variable), ("adjusted", adjusted)]:
+        loan_df = portfolio_df[portfolio_df["Loan ID"] == loan_id].drop(columns="Loan ID").reset_index(drop=True)
+        pd.testing.assert_frame_equal(loan_df, expected)
+
+
+def test_vectorized_loans_match_looping_over_them():
+    # Fixed-rate loans without adjustments take the closed-form path over all loans at once (0% loans are looped)
+    loans = pd.DataFrame({"type": ["By Loan Term", "By Repayment Amount", "By Loan Term", "By Repayment Amount"],
+                          "loan_amount": [300000, 75000, 120000.5, 40000], "interest_rate": [5.5, 6.1, 3, 0],
+                          "loan_term": [30, None, 7.5, None], "repayment_amount": [None, 520, None, 1000],
+                          "first_payment_date": ["2025-01-31", "2025-02-10", "2025-03-15", "2026-12-31"],
+                          "payment_frequency": ["monthly", "fortnightly", "weekly", "monthly"]},
+                         index=[10, 11, 12, 13])
+    portfolio_df = LoanCalculator(0).calculate_portfolio(loans)
+
+    assert list(portfolio_df["Loan ID"].unique()) == [10, 11, 12, 13]
+    for loan_id, loan in loans.iterrows():
+        term_field = "loan_term" if loan["type"] == "By Loan Term" else "repayment_amount"
+        expected = LoanCalculator(loan["interest_rate"]).calculate_amortization(
+            type=loan["type"], loan_amount=loan["loan_amount"], first_payment_date=loan["first_payment_date"],
+            payment_frequency=loan["payment_frequency"], **{term_field: loan[term_field]})
+        loan_df = portfolio_df[portfolio_df["Loan ID"] == loan_id].drop(columns="Loan ID").reset_index(drop=True)
+        # Loans share the portfolio's columns, so a loan whose own column would be integer comes back as float
+        pd.testing.assert_frame_equal(loan_df, expected, check_dtype=False)
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+from model import LoanCalculator
+from process_pool import SchedulePool
+
+LOANS = pd.DataFrame({
+    "type": ["By Loan Term", "By Repayment Amount", "By Loan Term", "By Loan Term", "By Repayment Amount"],
+    "loan_amount": [300000, 80000, 150000, 420000, 60000.5],
+    "interest_rate": [5.5, 4.25, 6, 3.9, 7],
+    "loan_term": [30, None, 15, 25, None],
+    "repayment_amount": [None, 700, None, None, 650],
+    "first_payment_date": ["2025-01-31", "2025-02-14", "2025-03-01", "2025-01-15", "2026-06-30"],
+    "payment_frequency": ["monthly", "fortnightly", "weekly", "monthly", "monthly"],
+    "adjustment_df": [None, None, [{"Event Date": "2027-01-10", "Adjustment Amount": -12000.5}], None, None],
+})
+
+
+def shared_memory_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.fixture(scope="module", params=[0, 10 ** 9], ids=["shared memory", "pickled"])
+def pool(request):
+    with SchedulePool(max_workers=2, chunk_size=2, shared_memory_threshold=request.param) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize("type, loan", [
+    ("By Loan Term", {"loan_amount": 300000, "loan_term": 30, "payment_frequency": "weekly"}),
+    ("By Repayment Amount", {"loan_amount": 90000, "repayment_amount": 800, "sliced_date": pd.Timestamp("2030-01-01"),
+                             "adjustment_df": pd.DataFrame({"Event Date": pd.to_datetime(["2026-05-05"]),
+                                                            "Adjustment Amount": [-3000]})}),
+    ("By Loan Term", {"loan_amount": 250000, "loan_term": 20, "interest_type": "Variable",
+                      "variable_interest_configuration": {"Interest Rate": {0: 5.5, 1: 6.75},
+                                                          "Length Period before next Adjustment": {0: 36}}}),
+])
+def test_schedule_matches_direct_calculation(pool, type, loan):
+    calculator = LoanCalculator(5.5)
+    blocks = shared_memory_blocks()
+
+    schedule_df = pool.calculate_amortization(calculator, type, first_payment_date="2025-01-31", **loan)
+
+    pd.testing.assert_frame_equal(schedule_df, calculator.calculate_amortization(
+        type, first_payment_date="2025-01-31", **loan))
+    assert shared_memory_blocks() <= blocks
+
+
+def test_portfolio_matches_direct_calculation(pool):
+    calculator = LoanCalculator(5)
+    portfolio_df = pool.calculate_portfolio(calculator, LOANS)
+
+    pd.testing.assert_frame_equal(portfolio_df, calculator.calculate_portfolio(LOANS))
+    assert list(portfolio_df["Loan ID"].unique()) == list(LOANS.index)
+
+
+def test_worker_errors_reach_the_caller(pool):
+    broken = LOANS.assign(payment_frequency=["monthly", "fortnightly", "daily", "monthly", "monthly"])
+    blocks = shared_memory_blocks()
+    with pytest.raises(ValueError, match="Invalid payment frequency"):
+        pool.calculate_portfolio(LoanCalculator(5), broken)
+    with pytest.raises(ValueError, match="Invalid type"):
+        pool.calculate_amortization(LoanCalculator(5), "By Balance", loan_amount=1000, first_payment_date="2025-01-31")
+    # Chunks that succeeded still released their blocks
+    assert shared_memory_blocks() <= blocks
+
+
+def test_empty_portfolio(pool):
+    with pytest.raises(ValueError, match="empty"):
+        pool.calculate_portfolio(LoanCalculator(5), LOANS.iloc[:0])
@@ -0,0 +1,124 @@
+import pytest
+
+import flask_app
+import schedule_cache
+from schedule_cache import ScheduleCache, request_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(schedule_cache, "time", clock)
+    return clock
+
+
+def test_hits_and_misses():
+    cache = ScheduleCache(max_size=4)
+    assert cache.get("a") is None
+    cache.put("a", b"schedule")
+    assert cache.get("a") == b"schedule"
+    assert cache.get("a") == b"schedule"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ScheduleCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = ScheduleCache(ttl_seconds=60)
+    cache.put("a", 1)
+    clock.now += 59.9
+    assert cache.get("a") == 1
+
+    # A hit does not extend the lifetime; putting the key again does
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+    cache.put("a", 2)
+    clock.now += 30
+    assert cache.get("a") == 2
+
+
+def test_no_ttl_keeps_entries(clock):
+    cache = ScheduleCache(ttl_seconds=None)
+    cache.put("a", 1)
+    clock.now += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_zero_size_disables_the_cache():
+    cache = ScheduleCache(max_size=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+LOAN = {"type": "By Loan Term", "loan_amount": 250000, "interest_rate": 5.5, "loan_term": 25,
+        "first_payment_date": "2025-01-15", "payment_frequency": "monthly", "interest_type": "Fixed",
+        "loan_term_mode": "adjusted",
+        "adjustment_df": [{"Event Date": "2027-03-01", "Adjustment Amount": -10000},
+                          {"Event Date": "2026-01-10", "Adjustment Amount": -2500.5}]}
+
+
+@pytest.mark.parametrize("equivalent", [
+    {**LOAN, "adjustment_df": LOAN["adjustment_df"][::-1]},
+    {**LOAN, "first_payment_date": "2025-01-15T00:00:00"},
+    {**LOAN, "repayment_amount": 1200},
+    {**LOAN, "interest_table": {"Interest Rate": {"0": 7}}},
+])
+def test_equivalent_payloads_share_a_key(equivalent):
+    assert request_cache_key(equivalent) == request_cache_key(LOAN)
+
+
+@pytest.mark.parametrize("different", [
+    {**LOAN, "interest_rate": 5.5000001},
+    {**LOAN, "loan_amount": 250000.0},
+    {**LOAN, "sliced_date": "2030-01-01"},
+    {**LOAN, "type": "By Repayment Amount", "repayment_amount": 1200},
+    {**LOAN, "interest_type": "Variable", "interest_table": {"Interest Rate": {"0": 7}}},
+    {**LOAN, "adjustment_df": LOAN["adjustment_df"][:1]},
+])
+def test_different_payloads_get_different_keys(different):
+    assert request_cache_key(different) != request_cache_key(LOAN)
+
+
+def test_empty_adjustments_share_the_key_of_none():
+    without = {key: value for key, value in LOAN.items() if key != "adjustment_df"}
+    assert request_cache_key({**LOAN, "adjustment_df": []}) == request_cache_key(without)
+    assert request_cache_key({**LOAN, "adjustment_df": None}) == request_cache_key(without)
+
+
+def test_endpoint_answers_equivalent_payloads_from_the_cache():
+    client = flask_app.app.test_client()
+    cache = flask_app.schedule_cache
+    cache.clear()
+
+    cold = client.post("/calculate_amortization_schedule", json=LOAN)
+    hits = cache.stats()["hits"]
+    warm = client.post("/calculate_amortization_schedule", json={**LOAN, "adjustment_df": LOAN["adjustment_df"][::-1]})
+
+    assert cache.stats()["hits"] == hits + 1
+    assert warm.get_data() == cold.get_data()
+    assert client.get("/schedule_cache").get_json()["size"] == cache.stats()["size"]
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import LoanCalculator, rate_axis, sensitivity_grid
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return sensitivity_grid(300000, "2025-01-15", [0, 4, 5.5], [10, 15.5, 30], payment_frequency="fortnightly",
+                            horizon_date="2031-06-30", schedule_cells=[(5.5, 30)])
+
+
+def test_cells_match_their_schedules(grid):
+    for row, rate in enumerate(grid["interest_rates"]):
+        for column, term in enumerate(grid["loan_terms"]):
+            schedule_df = LoanCalculator(rate).calculate_amortization(
+                "By Loan Term", loan_amount=300000, loan_term=int(term) if term.is_integer() else term,
+                first_payment_date="2025-01-15", payment_frequency="fortnightly")
+
+            assert grid["payment"][row, column] == schedule_df["Payment Due"].iloc[0]
+            assert str(grid["payoff_date"][row, column]) == schedule_df["Period"].iloc[-1]
+            assert grid["total_interest"][row, column] == pytest.approx(schedule_df["Interest Due"].sum(),
+                                                                        abs=0.01 * len(schedule_df))
+            made = schedule_df[pd.to_datetime(schedule_df["Period"]) <= pd.Timestamp("2031-06-30")]
+            assert grid["balance_at_horizon"][row, column] == pytest.approx(made["Balance"].iloc[-1], abs=0.01)
+
+
+def test_schedule_cells(grid):
+    expected = LoanCalculator(5.5).calculate_amortization(
+        "By Loan Term", loan_amount=300000, loan_term=30, first_payment_date="2025-01-15",
+        payment_frequency="fortnightly")
+    assert list(grid["schedules"]) == [(5.5, 30)]
+    pd.testing.assert_frame_equal(grid["schedules"][(5.5, 30)], expected)
+
+
+def test_horizon_after_payoff_leaves_nothing():
+    short = sensitivity_grid(100000, "2025-01-15", [5], [1], horizon_date="2040-01-01")
+    assert short["balance_at_horizon"].tolist() == [[0]]
+    assert "balance_at_horizon" not in sensitivity_grid(100000, "2025-01-15", [5], [1])
+
+
+def test_calculate_sensitivity_centres_the_rate_axis():
+    result = LoanCalculator(1).calculate_sensitivity(200000, "2025-01-15", [15, 30], rate_spread_bp=150,
+                                                     rate_step_bp=50)
+    np.testing.assert_array_equal(result["interest_rates"], [0, 0.5, 1, 1.5, 2, 2.5])
+    assert result["payment"].shape == (6, 2)
+
+
+def test_rate_axis():
+    np.testing.assert_array_equal(rate_axis(5.5, 100, 25), [4.5, 4.75, 5, 5.25, 5.5, 5.75, 6, 6.25, 6.5])
+    with pytest.raises(ValueError):
+        rate_axis(5, 100, 0)
+
+
+@pytest.mark.parametrize("arguments, message", [
+    ({"loan_amount": 0}, "Loan amount"),
+    ({"annual_interest_rates": [-1, 5]}, "negative"),
+    ({"loan_terms": []}, "non-empty"),
+    ({"loan_terms": [10.01]}, "whole, positive number"),
+    ({"payment_frequency": "daily"}, "Invalid payment frequency"),
+])
+def test_invalid_grids(arguments, message):
+    arguments = {"loan_amount": 100000, "first_payment_date": "2025-01-15", "annual_interest_rates": [5],
+                 "loan_terms": [10], **arguments}
+    with pytest.raises(ValueError, match=message):
+        sensitivity_grid(**arguments)
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from flask_app import app, schedule_cache
+from model import LoanCalculator
+from payment_calendar import get_payment_calendar
+from wire_format import ARROW_MIMETYPE, JSON_MIMETYPE, MSGPACK_MIMETYPE, decode_schedule, encode_schedule
+
+COLUMNAR = [ARROW_MIMETYPE, MSGPACK_MIMETYPE]
+
+WEEKLY = {"type": "By Loan Term", "loan_amount": 300000, "interest_rate": 5.5, "loan_term": 30,
+          "first_payment_date": "2025-01-15", "payment_frequency": "weekly", "interest_type": "Fixed",
+          "loan_term_mode": "fixed", "sliced_date": "2035-03-01"}
+PAYLOADS = {
+    "full and sliced": WEEKLY,
+    "sliced only": {**WEEKLY, "sliced_only": True},
+    "no slice": {**WEEKLY, "sliced_date": None},
+    "slice after payoff": {**WEEKLY, "sliced_date": "2080-01-01"},
+    "repayment with adjustment": {**WEEKLY, "type": "By Repayment Amount", "repayment_amount": 2000,
+                                  "payment_frequency": "monthly", "loan_term_mode": "adjusted",
+                                  "adjustment_df": [{"Event Date": "2027-02-01", "Adjustment Amount": -20000.5}]},
+}
+
+
+def comparable(schedule_df):
+    """
+    Schedule columns in a form both encodings share: payment dates as datetime64[ns] and remarks as text.
+    """
+    if schedule_df is None or schedule_df.empty:
+        return schedule_df
+    schedule_df = schedule_df.copy()
+    if not pd.api.types.is_datetime64_any_dtype(schedule_df["Period"]):
+        schedule_df["Period"] = pd.to_datetime(schedule_df["Period"], format="%d-%m-%Y")
+    schedule_df["Period"] = schedule_df["Period"].astype("datetime64[ns]")
+    schedule_df["Remark"] = schedule_df["Remark"].astype(str).astype(object)
+    return schedule_df
+
+
+@pytest.fixture
+def post():
+    client = app.test_client()
+    schedule_cache.clear()
+
+    def post(payload, mimetype):
+        response = client.post("/calculate_amortization_schedule", json=payload, headers={"Accept": mimetype})
+        assert response.status_code == 200
+        assert response.mimetype == mimetype
+        return decode_schedule(response.get_data(), response.headers["Content-Type"])
+
+    return post
+
+
+@pytest.mark.parametrize("mimetype", COLUMNAR)
+@pytest.mark.parametrize("payload", PAYLOADS.values(), ids=PAYLOADS.keys())
+def test_columnar_responses_decode_like_json(post, payload, mimetype):
+    expected_full, expected_sliced = map(comparable, post(payload, JSON_MIMETYPE))
+    schedule_df, sliced_df = map(comparable, post(payload, mimetype))
+
+    if expected_full is None:
+        assert schedule_df is None
+    else:
+        # JSON objects come back with their keys sorted
+        pd.testing.assert_frame_equal(schedule_df, expected_full, check_like=True)
+    if expected_sliced.empty:
+        assert sliced_df.empty
+    else:
+        pd.testing.assert_frame_equal(sliced_df, expected_sliced, check_like=True)
+
+
+@pytest.mark.parametrize("mimetype", COLUMNAR + ["application/x-msgpack"])
+def test_schedule_round_trip(mimetype):
+    schedule_df = LoanCalculator(4.5).calculate_amortization("By Loan Term", loan_amount=120000, loan_term=10,
+                                                             first_payment_date="2025-01-31")
+    dates = get_payment_calendar("2025-01-31", "monthly", len(schedule_df)).dates
+
+    decoded, sliced_df = decode_schedule(encode_schedule(schedule_df, dates, mimetype, sliced_offset=12), mimetype)
+
+    expected = comparable(schedule_df.assign(Period=pd.to_datetime(schedule_df["Period"])))
+    pd.testing.assert_frame_equal(comparable(decoded), expected)
+    pd.testing.assert_frame_equal(comparable(sliced_df), expected.iloc[12:].reset_index(drop=True))
+
+
+def test_json_stays_the_default():
+    client = app.test_client()
+    for accept in ("*/*", "text/html", None):
+        headers = {"Accept": accept} if accept else {}
+        response = client.post("/calculate_amortization_schedule", json=WEEKLY, headers=headers)
+        assert response.mimetype == JSON_MIMETYPE
+
+
+def test_errors_are_json_whatever_the_accept_header():
+    response = app.test_client().post("/calculate_amortization_schedule", json={**WEEKLY, "type": "By Balance"},
+                                      headers={"Accept": ARROW_MIMETYPE})
+    assert response.mimetype == JSON_MIMETYPE
+    assert "error" in response.get_json()
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError, match="Unsupported schedule format"):
+        decode_schedule(b"", "text/csv")
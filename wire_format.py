@@ -0,0 +1,123 @@
+import json
+
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+JSON_MIMETYPE = "application/json"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+# Response formats of /calculate_amortization_schedule in order of preference, so Accept: */* still gets JSON
+SCHEDULE_MIMETYPES = [JSON_MIMETYPE, ARROW_MIMETYPE, MSGPACK_MIMETYPE, "application/x-msgpack"]
+
+
+def encode_schedule(schedule_df, dates, mimetype, sliced_offset=0, sliced_only=False):
+    """
+    Schedule DataFrame as a columnar response body in mimetype (Arrow IPC stream or MessagePack).
+
+    dates: the payment date of every row (datetime64[D]), sent in place of the 'Period' column
+    sliced_offset: row the sliced schedule starts at; the sliced schedule is not sent again
+    sliced_only: whether schedule_df holds only the sliced schedule (sliced_offset is then 0)
+
+    Numeric columns keep their dtype, 'Period' travels as dates and text columns as dictionary codes.
+    """
+    columns = _schedule_columns(schedule_df, dates)
+    if mimetype == ARROW_MIMETYPE:
+        return _encode_arrow(columns, sliced_offset, sliced_only)
+    if mimetype in (MSGPACK_MIMETYPE, "application/x-msgpack"):
+        return _encode_msgpack(columns, len(schedule_df), sliced_offset, sliced_only)
+    raise ValueError(f"Unsupported schedule format '{mimetype}'.")
+
+
+def decode_schedule(body, mimetype):
+    """
+    Response body of /calculate_amortization_schedule as (schedule_df, sliced_schedule_df), the DataFrames of
+    its 'schedule_df' and 'sliced_schedule_df' JSON arrays ('Period' as datetime64 rather than text).
+    schedule_df is None when the request asked for sliced_only.
+    """
+    mimetype = mimetype.split(";")[0].strip()
+    if mimetype == JSON_MIMETYPE:
+        data = json.loads(body)
+        schedule_df = pd.DataFrame(data["schedule_df"]) if "schedule_df" in data else None
+        return schedule_df, pd.DataFrame(data["sliced_schedule_df"])
+    if mimetype == ARROW_MIMETYPE:
+        schedule_df, sliced_offset, sliced_only = _decode_arrow(body)
+    elif mimetype in (MSGPACK_MIMETYPE, "application/x-msgpack"):
+        schedule_df, sliced_offset, sliced_only = _decode_msgpack(body)
+    else:
+        raise ValueError(f"Unsupported schedule format '{mimetype}'.")
+
+    if sliced_only:
+        return None, schedule_df
+    return schedule_df, schedule_df.iloc[sliced_offset:].reset_index(drop=True)
+
+
+def _schedule_columns(schedule_df, dates):
+    """
+    (name, values) of every schedule column: NumPy arrays for numbers and dates, lists of str for text.
+    """
+    columns = []
+    for name in schedule_df.columns:
+        if name == "Period":
+            columns.append((name, np.asarray(dates, dtype="datetime64[D]")))
+            continue
+        values = schedule_df[name]
+        if values.dtype.kind in "biuf":
+            columns.append((name, values.to_numpy()))
+        else:
+            columns.append((name, values.astype(str).tolist()))
+    return columns
+
+
+def _encode_arrow(columns, sliced_offset, sliced_only):
+    arrays = [pa.array(values, pa.string()).dictionary_encode() if isinstance(values, list) else pa.array(values)
+              for _, values in columns]
+    metadata = {"sliced_offset": str(sliced_offset), "sliced_only": str(int(sliced_only))}
+    table = pa.Table.from_arrays(arrays, names=[name for name, _ in columns], metadata=metadata)
+
+    # zstd-compressed buffers are about a fifth of the raw columns and decompress faster than they download
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _decode_arrow(body):
+    table = pa.ipc.open_stream(body).read_all()
+    metadata = table.schema.metadata or {}
+    schedule_df = table.to_pandas(date_as_object=False)
+    return schedule_df, int(metadata.get(b"sliced_offset", 0)), metadata.get(b"sliced_only") == b"1"
+
+
+def _encode_msgpack(columns, n_rows, sliced_offset, sliced_only):
+    # Every column is either a little-endian buffer with its NumPy dtype, or dictionary codes into its distinct
+    # values, so the client reads it without a per-value decode
+    packed = []
+    for name, values in columns:
+        if isinstance(values, list):
+            categories, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+            packed.append({"name": name, "categories": categories.tolist(),
+                           "codes": codes.astype("<i4").tobytes()})
+        else:
+            dtype = values.dtype.newbyteorder("<") if values.dtype.byteorder == ">" else values.dtype
+            packed.append({"name": name, "dtype": dtype.str, "data": values.astype(dtype).tobytes()})
+    return msgpack.packb({"n_rows": n_rows, "sliced_offset": sliced_offset, "sliced_only": sliced_only,
+                         "columns": packed})
+
+
+def _decode_msgpack(body):
+    data = msgpack.unpackb(body)
+    columns = {}
+    for column in data["columns"]:
+        if "categories" in column:
+            codes = np.frombuffer(column["codes"], dtype="<i4")
+            columns[column["name"]] = pd.Categorical.from_codes(codes, categories=column["categories"])
+        else:
+            values = np.frombuffer(column["data"], dtype=column["dtype"])
+            if values.dtype.kind == "M":
+                values = values.astype("datetime64[ms]")
+            columns[column["name"]] = values
+    schedule_df = pd.DataFrame(columns, index=pd.RangeIndex(data["n_rows"]))
+    return schedule_df, data["sliced_offset"], data["sliced_only"]